@@ -1,8 +1,11 @@
 from pymongo.errors import OperationFailure
 from raven.contrib.django.raven_compat.models import sentry_exception_handler
 
+from framework.mongo import handlers as mongo_handlers
 from framework.transactions import commands, messages, utils
 
+from website import settings
+
 from .api_globals import api_globals
 
 
@@ -12,7 +15,18 @@ class TokuTransactionsMiddleware(object):
     """TokuMX transaction middleware."""
 
     def process_request(self, request):
-        """Begin a transaction if one doesn't already exist."""
+        """Begin a transaction if one doesn't already exist. Requests made
+        with safe methods do not need one; see `TRANSACTIONS_SKIP_SAFE_METHODS`.
+        """
+        if settings.DB_POOL:
+            mongo_handlers.check_pool_health()
+        request._in_transaction = not (
+            settings.TRANSACTIONS_SKIP_SAFE_METHODS and
+            request.method in utils.SAFE_METHODS
+        )
+        if not request._in_transaction:
+            return
+        mongo_handlers.pin_request()
         try:
             commands.begin()
         except OperationFailure as err:
@@ -25,6 +39,9 @@ class TokuTransactionsMiddleware(object):
         if it exists.
         """
         sentry_exception_handler(request=request)
+        if not getattr(request, '_in_transaction', True):
+            commands.disconnect()
+            return None
         try:
             commands.rollback()
         except OperationFailure as err:
@@ -38,6 +55,13 @@ class TokuTransactionsMiddleware(object):
         """Commit transaction if it exists, rolling back in an
         exception occurs.
         """
+        opened = getattr(request, '_in_transaction', True)
+        resolver_match = getattr(request, 'resolver_match', None)
+        endpoint = resolver_match.url_name if resolver_match else request.path
+        utils.transaction_stats.record(endpoint, request.method, opened)
+        if not opened:
+            commands.disconnect()
+            return response
         try:
             commands.commit()
         except OperationFailure as err:
@@ -5,7 +5,9 @@ from rest_framework import generics, permissions as drf_permissions
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from framework.auth.core import Auth
+from framework.mongo import prefetch
 from website.models import Node, Pointer
+from website.project.permissions import PermissionResolver
 from api.users.serializers import ContributorSerializer
 from api.base.filters import ODMFilterMixin, ListFilterMixin
 from api.base.utils import get_object_or_404, waterbutler_url_for
@@ -131,6 +133,7 @@ class NodeContributorsList(generics.ListAPIView, ListFilterMixin, NodeMixin):
 
     def get_default_queryset(self):
         node = self.get_node()
+        prefetch([node], 'contributors')
         visible_contributors = node.visible_contributor_ids
         contributors = []
         for contributor in node.contributors:
@@ -163,7 +166,8 @@ class NodeRegistrationsList(generics.ListAPIView, NodeMixin):
             auth = Auth(None)
         else:
             auth = Auth(user)
-        registrations = [node for node in nodes if node.can_view(auth)]
+        resolver = PermissionResolver(auth, nodes)
+        registrations = [node for node in nodes if resolver.can_view(node)]
         return registrations
 
 
@@ -190,7 +194,8 @@ class NodeChildrenList(generics.ListAPIView, NodeMixin):
             auth = Auth(None)
         else:
             auth = Auth(user)
-        children = [node for node in nodes if node.can_view(auth) and node.primary]
+        resolver = PermissionResolver(auth, nodes)
+        children = [node for node in nodes if node.primary and resolver.can_view(node)]
         return children
 
 
@@ -1,7 +1,14 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import time
+import atexit
+import base64
+import hashlib
+import logging
 import functools
+import threading
+from collections import Counter
 from datetime import datetime
 
 from framework.mongo import database
@@ -9,25 +16,74 @@ from framework.sessions import session
 
 from flask import request
 
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
 
 collection = database['pagecounters']
 
+# Size of the filters recording the pages visited in a session. A filter is
+# rotated once VISITED_FILTER_MAX_FILL of its bits are set, after about 1000
+# distinct pages with these defaults; until then, a new page has a ~2% chance
+# of not being counted as unique.
+VISITED_FILTER_BITS = 8192
+VISITED_FILTER_HASHES = 4
+VISITED_FILTER_MAX_FILL = 0.4
+
+
+def get_activity_buckets(db=None):
+    """Collection of monthly activity counters, one document per user and
+    month ::
+
+        {
+            '_id': '<user>:2015/06', 'user': <user>, 'month': '2015/06',
+            'total': 12,
+            'date': {'01': {'total': 3}, ...},
+            'action': {'project_created': {'total': 1, 'date': {'01': 1}}, ...},
+        }
+
+    Old buckets can be archived or dropped (see `remove_activity_buckets`)
+    without changing users' totals, which are kept in `useractivitycounters`.
+    """
+    db = db or database
+    return db['useractivitybuckets']
+
+
+def ensure_activity_indices(db=None):
+    get_activity_buckets(db).ensure_index([('user', 1), ('month', 1)])
+
 
 def increment_user_activity_counters(user_id, action, date, db=None):
+    """Count an action by a user in its monthly bucket and in the user's
+    totals. Both documents have a bounded size, so writes do not grow with
+    the user's history.
+    """
     db = db or database  # default to local proxy
-    collection = database['useractivitycounters']
-    date = date.strftime('%Y/%m/%d')
-    query = {
-        '$inc': {
-            'total': 1,
-            'date.{0}.total'.format(date): 1,
-            'action.{0}.total'.format(action): 1,
-            'action.{0}.date.{1}'.format(action, date): 1,
-        }
-    }
-    collection.update(
+    month, day = date.strftime('%Y/%m'), date.strftime('%d')
+    get_activity_buckets(db).update(
+        {'_id': '{0}:{1}'.format(user_id, month)},
+        {
+            '$set': {'user': user_id, 'month': month},
+            '$inc': {
+                'total': 1,
+                'date.{0}.total'.format(day): 1,
+                'action.{0}.total'.format(action): 1,
+                'action.{0}.date.{1}'.format(action, day): 1,
+            },
+        },
+        upsert=True,
+        manipulate=False,
+    )
+    db['useractivitycounters'].update(
         {'_id': user_id},
-        query,
+        {
+            '$inc': {
+                'total': 1,
+                'action.{0}.total'.format(action): 1,
+            }
+        },
         upsert=True,
         manipulate=False,
     )
@@ -36,7 +92,7 @@ def increment_user_activity_counters(user_id, action, date, db=None):
 
 def get_total_activity_count(user_id, db=None):
     db = db or database
-    collection = database['useractivitycounters']
+    collection = db['useractivitycounters']
     result = collection.find_one(
         {'_id': user_id}, {'total': 1}
     )
@@ -45,6 +101,29 @@ def get_total_activity_count(user_id, db=None):
     return 0
 
 
+def get_monthly_activity(user_id, start=None, end=None, db=None):
+    """Return the activity buckets of a user, oldest first.
+
+    :param str start: First month to include, as ``'YYYY/MM'``
+    :param str end: Last month to include, as ``'YYYY/MM'``
+    """
+    query = {'user': user_id}
+    if start or end:
+        query['month'] = {}
+        if start:
+            query['month']['$gte'] = start
+        if end:
+            query['month']['$lte'] = end
+    return list(get_activity_buckets(db).find(query).sort('month', 1))
+
+
+def remove_activity_buckets(before, db=None):
+    """Remove the activity buckets of every user for months before
+    ``before`` (``'YYYY/MM'``). Totals are not affected.
+    """
+    get_activity_buckets(db).remove({'month': {'$lt': before}})
+
+
 def clean_page(page):
     return page.replace(
         '.', '_'
@@ -72,6 +151,214 @@ def build_page(rex, kwargs):
         return None
 
 
+class VisitedPages(object):
+    """Bloom filter of the pages visited in a session. Its size is bounded, so
+    the session does not grow with the number of pages visited; in exchange,
+    a page may be reported as visited when it was not.
+
+    Once `VISITED_FILTER_MAX_FILL` of its bits are set, the filter is kept as
+    the previous generation and a new one is started, so that false positives
+    stay rare however many pages a session visits. Pages recorded only in an
+    older generation are forgotten and count as unique again.
+
+    :param str data: Serialized filter, as returned by `dump`
+    """
+
+    def __init__(self, data=None, bits=VISITED_FILTER_BITS, hashes=VISITED_FILTER_HASHES):
+        self.hashes = hashes
+        self.size = bits // 8
+        self.previous = None
+        if data:
+            parts = data.split(':')
+            self.bits = bytearray(base64.b64decode(parts[0]))
+            if len(parts) > 1:
+                self.previous = bytearray(base64.b64decode(parts[1]))
+        else:
+            self.bits = bytearray(self.size)
+        self._set = sum(bin(byte).count('1') for byte in self.bits)
+
+    @classmethod
+    def load(cls, value):
+        """Load a filter stored in session data. Lists of pages stored by
+        older versions are converted.
+        """
+        if isinstance(value, list):
+            visited = cls()
+            for page in value:
+                visited.add(page)
+            return visited
+        return cls(value)
+
+    def dump(self):
+        data = base64.b64encode(bytes(self.bits))
+        if self.previous is not None:
+            data += ':' + base64.b64encode(bytes(self.previous))
+        return data
+
+    def _positions(self, page, bits):
+        if isinstance(page, unicode):
+            page = page.encode('utf-8')
+        digest = hashlib.md5(page).hexdigest()
+        first, second = int(digest[:16], 16), int(digest[16:], 16)
+        size = len(bits) * 8
+        for index in range(self.hashes):
+            yield (first + index * second) % size
+
+    def _contains(self, bits, page):
+        return all(
+            bits[position // 8] & (1 << position % 8)
+            for position in self._positions(page, bits)
+        )
+
+    def __contains__(self, page):
+        return self._contains(self.bits, page) or (
+            self.previous is not None and self._contains(self.previous, page)
+        )
+
+    def _rotate(self):
+        self.previous = self.bits
+        self.bits = bytearray(self.size)
+        self._set = 0
+
+    def add(self, page):
+        """Record a visit to ``page``.
+
+        :return: True if ``page`` had not been visited
+        """
+        if page in self:
+            return False
+        if self._set >= len(self.bits) * 8 * VISITED_FILTER_MAX_FILL:
+            self._rotate()
+        for position in self._positions(page, self.bits):
+            mask = 1 << position % 8
+            if not self.bits[position // 8] & mask:
+                self.bits[position // 8] |= mask
+                self._set += 1
+        return True
+
+
+class CounterBuffer(object):
+    """Accumulates page counter increments in memory and writes them with
+    one upsert per page, so that popular pages are not updated on every
+    request.
+
+    Pending increments are written once `ANALYTICS_FLUSH_SIZE` pages are
+    pending, and otherwise by a background thread every
+    `ANALYTICS_FLUSH_INTERVAL` seconds and when the process exits. Counters
+    read from the database may therefore lag by that much;
+    `get_basic_counters` includes the increments pending in the current
+    process, but not those of other processes. At most one interval of
+    increments is lost when a process is killed. Counters are only ever
+    incremented, so the order in which processes flush does not matter.
+    Failed writes are logged, not raised into the request that triggered
+    them, and retried on the next flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.time()
+        self._flusher = None
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(pages) for _, pages in self._pending.values())
+
+    def add(self, collection, page, increments):
+        """Buffer ``increments`` to the ``page`` document of ``collection``,
+        writing pending increments if a flush is due.
+
+        :param dict increments: Mapping of field names to amounts
+        """
+        self._buffer(collection, page, increments)
+        self._start_flusher()
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """Write pending increments if `ANALYTICS_FLUSH_SIZE` pages are
+        pending or `ANALYTICS_FLUSH_INTERVAL` seconds have passed since the
+        last flush, logging failures.
+
+        :return: Number of pages written
+        """
+        pending = len(self)
+        due = pending and (
+            pending >= settings.ANALYTICS_FLUSH_SIZE or
+            time.time() - self._last_flush >= settings.ANALYTICS_FLUSH_INTERVAL
+        )
+        if not due:
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception('Could not write page counters; will retry')
+            return 0
+
+    def _start_flusher(self):
+        """Start the thread flushing increments of idle processes, once per
+        process; threads do not survive forking worker processes.
+        """
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run_flusher)
+            self._flusher.daemon = True
+        self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(settings.ANALYTICS_FLUSH_INTERVAL)
+            self.flush_if_due()
+
+    def _buffer(self, collection, page, increments):
+        with self._lock:
+            _, pages = self._pending.setdefault(collection.full_name, (collection, {}))
+            pages.setdefault(page, Counter()).update(increments)
+
+    def get_pending(self, collection, page):
+        """Return the increments to ``page`` not yet written by this process.
+        """
+        with self._lock:
+            _, pages = self._pending.get(collection.full_name, (None, {}))
+            return dict(pages.get(page, {}))
+
+    def flush(self):
+        """Write all pending increments.
+
+        :return: Number of pages written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        updates = [
+            (collection, page, increments)
+            for collection, pages in pending.values()
+            for page, increments in pages.items()
+        ]
+        for index, (collection, page, increments) in enumerate(updates):
+            try:
+                collection.update({'_id': page}, {'$inc': dict(increments)}, True, False)
+            except Exception:
+                # Keep the increments not written yet for the next flush
+                for each in updates[index:]:
+                    self._buffer(*each)
+                raise
+        if updates:
+            logger.debug('Wrote counters for {0} pages'.format(len(updates)))
+        return len(updates)
+
+
+counter_buffer = CounterBuffer()
+
+
+@atexit.register
+def _flush_counters_at_exit():
+    try:
+        counter_buffer.flush()
+    except Exception:
+        logger.exception('Could not write page counters at exit')
+
+
 def update_counter(page, db=None):
     """Update counters for page.
 
@@ -89,32 +376,26 @@ def update_counter(page, db=None):
     d = {'$inc': {}}
 
     visited_by_date = session.data.get('visited_by_date')
-    if not visited_by_date:
-        visited_by_date = {'date': date, 'pages': []}
-
-    if date == visited_by_date['date']:
-        if page not in visited_by_date['pages']:
-            d['$inc']['date.%s.unique' % date] = 1
-            visited_by_date['pages'].append(page)
-            session.data['visited_by_date'] = visited_by_date
-    else:
-        visited_by_date['date'] = date
-        visited_by_date['pages'] = []
+    if not visited_by_date or visited_by_date['date'] != date:
+        visited_by_date = {'date': date, 'pages': None}
+
+    visited_today = VisitedPages.load(visited_by_date['pages'])
+    if visited_today.add(page):
         d['$inc']['date.%s.unique' % date] = 1
-        visited_by_date['pages'].append(page)
+        visited_by_date['pages'] = visited_today.dump()
         session.data['visited_by_date'] = visited_by_date
 
     d['$inc']['date.%s.total' % date] = 1
 
-    visited = session.data.get('visited')  # '/project/x/, project/y/'
-    if not visited:
-        visited = []
-    if page not in visited:
+    visited = VisitedPages.load(session.data.get('visited'))
+    if visited.add(page):
         d['$inc']['unique'] = 1
-        visited.append(page)
-        session.data['visited'] = visited
+        session.data['visited'] = visited.dump()
     d['$inc']['total'] = 1
-    collection.update({'_id': page}, d, True, False)
+    if settings.ANALYTICS_BUFFER_COUNTERS:
+        counter_buffer.add(collection, page, d['$inc'])
+    else:
+        collection.update({'_id': page}, d, True, False)
 
 
 def update_counters(rex, db=None):
@@ -146,11 +427,12 @@ def get_basic_counters(page, db=None):
         {'_id': clean_page(page)},
         {'total': 1, 'unique': 1}
     )
-    if result:
-        if 'unique' in result:
+    pending = counter_buffer.get_pending(collection, clean_page(page))
+    if result or pending:
+        if result and 'unique' in result:
             unique = result['unique']
-        if 'total' in result:
+        if result and 'total' in result:
             total = result['total']
-        return unique, total
+        return unique + pending.get('unique', 0), total + pending.get('total', 0)
     else:
         return None, None
@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 import re
 import logging
+import operator
 import urlparse
-import itertools
 import datetime as dt
 
-import bson
 import pytz
 import itsdangerous
 
@@ -175,6 +174,11 @@ class Auth(object):
 
 class User(GuidStoredObject, AddonModelMixin):
 
+    # Keep loaded users in the object cache; see `framework.mongo.cache`
+    _cached_across_requests = True
+    # Deep URL only depends on the primary key; see `framework.guid.cache`
+    _stable_deep_url = True
+
     # Node fields that trigger an update to the search engine on save
     SEARCH_UPDATE_FIELDS = {
         'fullname',
@@ -188,6 +192,9 @@ class User(GuidStoredObject, AddonModelMixin):
         'jobs',
         'schools',
         'social',
+        # Needed for the gravatar URL and flags in the contributor search
+        'username',
+        'is_registered',
     }
 
     # TODO: Add SEARCH_UPDATE_NODE_FIELDS, for fields that should trigger a
@@ -1018,6 +1025,10 @@ class User(GuidStoredObject, AddonModelMixin):
 
     def update_search(self):
         from website import search
+        from website.search import indexing
+        if indexing.is_async():
+            indexing.enqueue(indexing.USER, self._id)
+            return
         try:
             search.search.update_user(self)
         except search.exceptions.SearchUnavailableError as e:
@@ -1079,31 +1090,37 @@ class User(GuidStoredObject, AddonModelMixin):
         watched_node_ids = set([config.node._id for config in self.watched])
         return node._id in watched_node_ids
 
-    def get_recent_log_ids(self, since=None):
-        '''Return a generator of recent logs' ids.
+    def get_recent_logs_query(self, since=None):
+        '''Return a query for the logs of watched nodes, or ``None`` if the
+        user is not watching any nodes.
 
         :param since: A datetime specifying the oldest time to retrieve logs
-        from. If ``None``, defaults to 60 days before today. Must be a tz-aware
-        datetime because PyMongo's generation times are tz-aware.
-
-        :rtype: generator of log ids (strings)
+        from. If ``None``, defaults to 60 days before today.
         '''
-        log_ids = []
         # Default since to 60 days before today if since is None
         # timezone aware utcnow
         utcnow = dt.datetime.utcnow().replace(tzinfo=pytz.utc)
         since_date = since or (utcnow - dt.timedelta(days=60))
-        for config in self.watched:
-            # Extract the timestamps for each log from the log_id (fast!)
-            # The first 4 bytes of Mongo's ObjectId encodes time
-            # This prevents having to load each Log Object and access their
-            # date fields
-            node_log_ids = [log_id for log_id in config.node.logs._to_primary_keys()
-                                   if bson.ObjectId(log_id).generation_time > since_date and
-                                   log_id not in log_ids]
-            # Log ids in reverse chronological order
-            log_ids = _merge_into_reversed(log_ids, node_log_ids)
-        return (l_id for l_id in log_ids)
+        queries = [config.node.get_logs_query() for config in self.watched]
+        if not queries:
+            return None
+        return reduce(operator.or_, queries) & Q('date', 'gt', since_date)
+
+    def get_recent_log_ids(self, since=None):
+        '''Return a generator of recent logs' ids, newest first.
+
+        :param since: A datetime specifying the oldest time to retrieve logs
+        from. If ``None``, defaults to 60 days before today. Must be a tz-aware
+        datetime.
+
+        :rtype: generator of log ids (strings)
+        '''
+        # TODO: Remove circular import
+        from website.project.model import NodeLog
+        query = self.get_recent_logs_query(since=since)
+        if query is None:
+            return (l_id for l_id in [])
+        return (log._id for log in NodeLog.find(query).sort('-date', '-_id'))
 
     def get_daily_digest_log_ids(self):
         '''Return a generator of log ids generated in the past day
@@ -1275,10 +1292,13 @@ class User(GuidStoredObject, AddonModelMixin):
 
     def n_projects_in_common(self, other_user):
         """Returns number of "shared projects" (projects that both users are contributors for)"""
-        return len(self.get_projects_in_common(other_user, primary_keys=True))
+        if other_user == self:
+            return len(self.get_projects_in_common(other_user, primary_keys=True))
+        return self.n_projects_in_common_with([other_user._id])[other_user._id]
 
-
-def _merge_into_reversed(*iterables):
-    '''Merge multiple sorted inputs into a single output in reverse order.
-    '''
-    return sorted(itertools.chain(*iterables), reverse=True)
+    def n_projects_in_common_with(self, user_ids):
+        """Returns a dictionary mapping each of ``user_ids`` to the number of
+        "shared projects" with this user, read from the co-contributor index.
+        """
+        from website.project import cocontributors  # TODO: Remove circular import
+        return cocontributors.get_counts(self._id, user_ids)
@@ -14,6 +14,7 @@ from framework import forms, status
 from framework.flask import redirect  # VOL-aware redirect
 from framework.auth import exceptions
 from framework.exceptions import HTTPError
+from framework.transactions.handlers import auto_transaction
 from framework.auth import (logout, get_user, DuplicateEmailError)
 from framework.auth.decorators import collect_auth, must_be_logged_in
 from framework.auth.forms import (
@@ -153,6 +154,7 @@ def auth_logout(redirect_url=None):
     return resp
 
 
+@auto_transaction
 def confirm_email_get(**kwargs):
     """View for email confirmation links.
     Authenticates and redirects to user settings page if confirmation is
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Cache of GUID referents shared by the requests of a process.
+
+Resolving a GUID loads its `Guid`, then its referent. The referent of a GUID
+(its primary key and collection) does not change once the GUID is written, so
+each process keeps the mappings of `GUID_CACHE_SIZE` recently used GUIDs.
+GUIDs that do not exist are remembered separately, up to
+`GUID_CACHE_MISS_SIZE` of them for `GUID_CACHE_MISS_TTL` seconds, since other
+processes may create them; lookups of random ids cannot evict the mappings of
+existing GUIDs. Saving a `Guid` in this process evicts its entry; changes that
+other processes make to existing GUIDs are not seen.
+
+The entries of GUIDs whose referent sets ``_stable_deep_url`` (nodes and
+users, whose deep URLs only depend on their primary keys) also keep the deep
+URL, so that resolving a popular GUID needs no query, even without the object
+cache (see `framework.mongo.cache`). Other referents, whose deep URLs can
+change, are loaded on every lookup. The GUIDs
+a web worker resolved most are recorded when it exits (see `save_hot`), and
+the next worker loads their mappings before its first request (see `warm`).
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+from framework.mongo import database
+from framework.mongo import StoredObject
+
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
+HOT_GUIDS_KEY = 'hot'
+
+
+def get_collection():
+    return database['guidcache']
+
+
+class GuidCache(object):
+    """LRU of the referents of GUIDs, by GUID. Each entry holds the referent
+    as a (primary key, collection name) tuple, the number of lookups, and the
+    deep URL of the referent if it was set with `set_deep_url`.
+    Missing GUIDs are kept in a separate LRU, with the time they were cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._missing = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _fetch(self, guid_ids):
+        from framework.guid.model import Guid
+
+        found = Guid._storage[0].store.find(
+            {'_id': {'$in': list(guid_ids)}},
+            {'referent': True},
+        )
+        referents = dict.fromkeys(guid_ids)
+        for each in found:
+            referents[each['_id']] = tuple(each.get('referent') or (None, None))
+        return referents
+
+    def _put(self, guid_id, referent, count=1):
+        if not settings.GUID_CACHE_SIZE:
+            return
+        with self._lock:
+            if referent is None:
+                self._missing.pop(guid_id, None)
+                self._missing[guid_id] = time.time()
+                while len(self._missing) > settings.GUID_CACHE_MISS_SIZE:
+                    self._missing.popitem(last=False)
+                return
+            self._entries.pop(guid_id, None)
+            self._entries[guid_id] = [referent, count, None]
+            while len(self._entries) > settings.GUID_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def get_referent_key(self, guid_id):
+        """Return the referent of ``guid_id`` as a (primary key, collection
+        name) tuple, ``(None, None)`` if the GUID has no referent, or ``None``
+        if the GUID does not exist.
+        """
+        with self._lock:
+            entry = self._entries.pop(guid_id, None)
+            if entry is not None:
+                entry[1] += 1
+                self._entries[guid_id] = entry
+                self.hits += 1
+                return entry[0]
+            cached_at = self._missing.get(guid_id)
+            if cached_at is not None and time.time() - cached_at <= settings.GUID_CACHE_MISS_TTL:
+                self.hits += 1
+                return None
+            self.misses += 1
+        referent = self._fetch([guid_id])[guid_id]
+        self._put(guid_id, referent)
+        return referent
+
+    def get_deep_url(self, guid_id):
+        """Return the cached deep URL of the referent of ``guid_id``, or
+        ``None``. Does not count as a lookup.
+        """
+        with self._lock:
+            entry = self._entries.get(guid_id)
+            return entry[2] if entry is not None else None
+
+    def set_deep_url(self, guid_id, deep_url):
+        """Keep ``deep_url`` with the cached referent of ``guid_id``. Only
+        use for referents whose deep URL cannot change.
+        """
+        with self._lock:
+            entry = self._entries.get(guid_id)
+            if entry is not None:
+                entry[2] = deep_url
+
+    def evict(self, guid_ids):
+        with self._lock:
+            for guid_id in guid_ids:
+                self._entries.pop(guid_id, None)
+                self._missing.pop(guid_id, None)
+
+    def warm(self, guid_ids):
+        """Cache the referents of existing ``guid_ids`` with one query."""
+        referents = self._fetch(guid_ids)
+        found = [guid_id for guid_id in guid_ids if referents[guid_id] is not None]
+        for guid_id in found:
+            self._put(guid_id, referents[guid_id], count=0)
+        return len(found)
+
+    def get_hot(self, count):
+        """Return the cached GUIDs looked up most, most first."""
+        with self._lock:
+            entries = [
+                (entry[1], guid_id)
+                for guid_id, entry in self._entries.items()
+                if entry[1]
+            ]
+        return [guid_id for _, guid_id in sorted(entries, reverse=True)[:count]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._missing.clear()
+
+    def to_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'missing': len(self._missing),
+                'hit_rate': float(self.hits) / lookups if lookups else 0,
+            }
+
+
+guid_cache = GuidCache()
+
+
+def load_referent(referent_key):
+    """Load the object a (primary key, collection name) tuple refers to, as
+    returned by `GuidCache.get_referent_key`.
+    """
+    if referent_key is None or referent_key[0] is None:
+        return None
+    key, name = referent_key
+    return StoredObject.get_collection(name).load(key)
+
+
+def save_hot():
+    """Record the `GUID_CACHE_WARM_SIZE` GUIDs this process looked up most,
+    merged with those recorded by other processes.
+    """
+    hot = guid_cache.get_hot(settings.GUID_CACHE_WARM_SIZE)
+    if not hot:
+        return
+    get_collection().update(
+        {'_id': HOT_GUIDS_KEY},
+        {'$push': {'guids': {'$each': hot, '$slice': -settings.GUID_CACHE_WARM_SIZE}}},
+        upsert=True,
+        manipulate=False,
+    )
+
+
+def warm():
+    """Cache the referents of the GUIDs recorded by `save_hot`."""
+    if not settings.GUID_CACHE_SIZE:
+        return 0
+    recorded = get_collection().find_one({'_id': HOT_GUIDS_KEY}) or {}
+    guid_ids = list(OrderedDict.fromkeys(recorded.get('guids', [])))
+    if not guid_ids:
+        return 0
+    count = guid_cache.warm(guid_ids)
+    logger.debug('Warmed the GUID cache with {0} GUIDs'.format(count))
+    return count
+
+
+def _save_hot_logging_errors():
+    try:
+        save_hot()
+    except Exception:
+        logger.exception('Could not record hot GUIDs')
+
+
+_started = []
+
+
+def start():
+    """Warm the cache, and record the hot GUIDs of this process when it
+    exits. Only run by processes that serve requests (see `handlers`), so
+    that scripts and task workers neither load nor record hot GUIDs.
+    """
+    with guid_cache._lock:
+        if _started:
+            return
+        _started.append(True)
+    try:
+        warm()
+    except Exception:
+        logger.exception('Could not warm the GUID cache')
+    atexit.register(_save_hot_logging_errors)
+
+
+def guid_cache_before_request():
+    if not _started:
+        start()
+
+
+handlers = {
+    'before_request': guid_cache_before_request,
+}
@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 import random
+import logging
+import threading
+import collections
 
 from modularodm import fields
 
-from framework.mongo import StoredObject
+from framework.mongo import StoredObject, insert_many
+from framework.guid.cache import guid_cache
+from framework.mongo.utils import get_unused_keys
 
 from modularodm.storage.base import KeyExistsException
 
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
 ALPHABET = '23456789abcdefghjkmnpqrstuvwxyz'
+GUID_LENGTH = 5
+# Number of distinct GUIDs; `generate_guid` never repeats a character
+KEYSPACE_SIZE = reduce(
+    lambda total, size: total * size,
+    range(len(ALPHABET) - GUID_LENGTH + 1, len(ALPHABET) + 1),
+)
 
 
 class BlacklistGuid(StoredObject):
@@ -23,6 +39,180 @@ class Guid(StoredObject):
     def __repr__(self):
         return '<id:{0}, referent:({1}, {2})>'.format(self._id, self.referent._primary_key, self.referent._name)
 
+    def save(self, *args, **kwargs):
+        ret = super(Guid, self).save(*args, **kwargs)
+        guid_cache.evict([self._id])
+        return ret
+
+
+def generate_guid():
+    return ''.join(random.sample(ALPHABET, GUID_LENGTH))
+
+
+class GuidAllocator(object):
+    """Per-process pool of GUIDs that were neither blacklisted nor taken when
+    they were reserved. Ids are reserved in blocks of `GUID_BLOCK_SIZE`, with
+    one query per block for the blacklist and one for existing GUIDs, instead
+    of loading the blacklist and attempting an insert for each new GUID.
+
+    Once fewer than `GUID_BLOCK_REFILL_AT` ids are left, the next block is
+    reserved in a background thread. Reserved ids are not locked against
+    other processes: if another process uses an id first, inserting its
+    `Guid` fails and the caller takes the next id. Such collisions are
+    counted with the candidates rejected while reserving; see `get_stats`,
+    which is logged after each block is reserved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = collections.deque()
+        self._refilling = False
+        self.generated = 0
+        self.rejected = 0
+        self.allocated = 0
+        self.collisions = 0
+
+    def _generate(self):
+        with self._lock:
+            self.generated += 1
+        return generate_guid()
+
+    def _reserve(self, count):
+        """Return ``count`` unused ids, counting the candidates rejected."""
+        generated = self.generated
+        keys = get_unused_keys(self._generate, count, Guid, BlacklistGuid)
+        with self._lock:
+            self.rejected += self.generated - generated - len(keys)
+        return keys
+
+    def refill(self):
+        """Reserve a block of ids."""
+        try:
+            keys = self._reserve(settings.GUID_BLOCK_SIZE)
+            with self._lock:
+                self._ids.extend(keys)
+            logger.info('Reserved {0} GUIDs; {1}'.format(len(keys), self.get_stats()))
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _refill_in_background(self):
+        with self._lock:
+            if self._refilling or len(self._ids) >= settings.GUID_BLOCK_REFILL_AT:
+                return
+            self._refilling = True
+        thread = threading.Thread(target=self._refill_logging_errors)
+        thread.daemon = True
+        thread.start()
+
+    def _refill_logging_errors(self):
+        try:
+            self.refill()
+        except Exception:
+            logger.exception('Could not reserve a block of GUIDs')
+
+    def take(self, count=1):
+        """Return ``count`` reserved ids. Ids missing from the pool are
+        reserved right away.
+        """
+        with self._lock:
+            ids = [self._ids.popleft() for _ in range(min(count, len(self._ids)))]
+        if len(ids) < count:
+            ids.extend(self._reserve(count - len(ids)))
+        with self._lock:
+            self.allocated += len(ids)
+        if settings.GUID_BLOCK_SIZE:
+            self._refill_in_background()
+        return ids
+
+    def record_collision(self):
+        with self._lock:
+            self.collisions += 1
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def get_stats(self, keyspace=False):
+        """Return allocation counts and the share of candidate ids found taken
+        or blacklisted.
+
+        :param bool keyspace: Also count the GUIDs and blacklisted ids in use,
+            and their share of the keyspace; this counts both collections, so
+            keep it out of requests
+        """
+        with self._lock:
+            attempts = self.generated + self.collisions
+            stats = {
+                'pooled': len(self._ids),
+                'allocated': self.allocated,
+                'rejected': self.rejected,
+                'collisions': self.collisions,
+                'collision_rate': float(self.rejected + self.collisions) / attempts if attempts else 0,
+            }
+        if keyspace:
+            used = Guid.find().count() + BlacklistGuid.find().count()
+            stats['keyspace_used'] = used
+            stats['keyspace_utilization'] = float(used) / KEYSPACE_SIZE
+        return stats
+
+
+guid_allocator = GuidAllocator()
+
+
+def ensure_guids(objects):
+    """Provision GUIDs for many new objects with one insert, as
+    `GuidStoredObject._ensure_guid` does for one. Objects without primary keys
+    are given GUIDs from `guid_allocator`.
+
+    :raises: KeyExistsException if another process inserted the GUID of an
+        object with a primary key, for a different referent
+    """
+    objects = list(objects)
+    keyed = [obj._primary_key for obj in objects if obj._primary_key]
+    existing = set()
+    if keyed:
+        existing = set(
+            each['_id']
+            for each in Guid._storage[0].store.find({'_id': {'$in': keyed}}, {'_id': True})
+        )
+    pending = [obj for obj in objects if obj._primary_key not in existing]
+    unkeyed = [obj for obj in pending if not obj._primary_key]
+    while True:
+        for obj, guid_id in zip(unkeyed, guid_allocator.take(len(unkeyed))):
+            obj._primary_key = guid_id
+        try:
+            insert_many([
+                Guid(_id=obj._primary_key, referent=(obj._primary_key, obj._name))
+                for obj in pending
+            ])
+            guid_cache.evict([obj._primary_key for obj in pending])
+            return objects
+        except KeyExistsException:
+            guid_allocator.record_collision()
+        # Keep the GUIDs inserted before the collision, and give new ids to
+        # the objects whose ids were taken by another process
+        stored = dict(
+            (each['_id'], tuple(each.get('referent') or ()))
+            for each in Guid._storage[0].store.find(
+                {'_id': {'$in': [obj._primary_key for obj in pending]}},
+            )
+        )
+        reserved = set(id(obj) for obj in unkeyed)
+        for obj in pending:
+            referent = stored.get(obj._primary_key, (obj._primary_key, obj._name))
+            if referent != (obj._primary_key, obj._name) and id(obj) not in reserved:
+                raise KeyExistsException(
+                    'GUID {0} already refers to {1}'.format(obj._primary_key, referent)
+                )
+        unkeyed = [
+            obj for obj in unkeyed
+            if stored.get(obj._primary_key, (obj._primary_key, obj._name)) != (obj._primary_key, obj._name)
+        ]
+        pending = [obj for obj in pending if obj._primary_key not in stored] + unkeyed
+        for obj in unkeyed:
+            obj._primary_key = None
+
 
 class GuidStoredObject(StoredObject):
     """Subclass of `StoredObject` that provisions a `Guid` for each new instance
@@ -55,24 +245,17 @@ class GuidStoredObject(StoredObject):
             )
             guid.save()
 
-        # Else create GUID optimistically
+        # Else create GUID with a reserved id, retrying if another process
+        # took the id first
         else:
             while True:
-                # Create GUID
-                guid_id = ''.join(random.sample(ALPHABET, 5))
-
-                # Check GUID against blacklist
-                blacklist_guid = BlacklistGuid.load(guid_id)
-                if not blacklist_guid:
-                    try:
-                        guid = Guid(_id=guid_id)
-                        guid.save()
-                        break
-                    except KeyExistsException:
-                        pass
-
-            guid.referent = (guid._primary_key, self._name)
-            guid.save()
+                guid_id = guid_allocator.take()[0]
+                try:
+                    guid = Guid(_id=guid_id, referent=(guid_id, self._name))
+                    guid.save()
+                    break
+                except KeyExistsException:
+                    guid_allocator.record_collision()
 
             # Set primary key to GUID key
             self._primary_key = guid._primary_key
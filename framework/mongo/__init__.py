@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import copy
+from weakref import WeakKeyDictionary
+
 from flask import request
+from modularodm.query import QueryBase
+from modularodm.storage import MongoStorage
 from modularodm.storedobject import StoredObject as GenericStoredObject
 from modularodm.ext.concurrency import with_proxies, proxied_members
 
 from bson import ObjectId
-from .handlers import client, database, set_up_storage
+from .handlers import client, database, set_up_storage, pool_stats
+from .utils import get_partial_update, insert_many, load_many, prefetch
+from . import cache as object_cache
 
 
 from api.base.api_globals import api_globals
@@ -31,10 +38,111 @@ def get_cache_key():
             return dummy_request
 
 
+# Active unit of work per request; see `framework.mongo.unit_of_work`
+active_units = WeakKeyDictionary()
+
+
 @with_proxies(proxied_members, get_cache_key)
 class StoredObject(GenericStoredObject):
-    pass
 
+    def save(self, *args, **kwargs):
+        unit = active_units.get(get_cache_key())
+        if unit is not None and unit.defer(self, *args, **kwargs):
+            return []
+        # Forced saves (e.g. of back-references) write the whole document;
+        # see `update_one`
+        forced = getattr(self, '_saving_forced', False)
+        self._saving_forced = args[0] if args else kwargs.get('force', False)
+        try:
+            return super(StoredObject, self).save(*args, **kwargs)
+        finally:
+            self._saving_forced = forced
+
+    @classmethod
+    def _set_cache(cls, key, obj, data=None):
+        """Keep a copy of the storage data an object was loaded or saved
+        with. modular-odm caches data that shares mutable values with the
+        object, e.g. its back-references, so that changing them in place
+        would also change the data partial updates are computed against.
+        """
+        super(StoredObject, cls)._set_cache(key, obj, copy.deepcopy(data))
+
+    @classmethod
+    def load(cls, key=None, data=None, _is_loaded=True):
+        """Read objects of models that set ``_cached_across_requests`` through
+        the object cache; see `framework.mongo.cache`.
+        """
+        cache = object_cache.get_cache(cls)
+        if cache is not None and key is not None and data is None and object_cache.can_read():
+            key = cls._check_pk_type(key)
+            if cls._load_from_cache(key) is None:
+                storage_key = cls._pk_to_storage(key)
+                data = cache.load(
+                    storage_key,
+                    lambda: cls._storage[0].get(cls._primary_name, storage_key),
+                )
+                if data is None:
+                    return None
+        return super(StoredObject, cls).load(key, data=data, _is_loaded=_is_loaded)
+
+    @classmethod
+    def _get_cached_keys(cls, which):
+        """Return the storage keys of the objects selected by ``which`` (an
+        object, primary key or query) if the model is cached, else ``[]``.
+        """
+        if object_cache.get_cache(cls) is None:
+            return []
+        if isinstance(which, GenericStoredObject):
+            return [which._storage_key]
+        if which is None or isinstance(which, QueryBase):
+            return list(cls.find(which).get_keys())
+        return [cls._pk_to_storage(which)]
+
+    @classmethod
+    def _invalidate_cached(cls, keys):
+        cache = object_cache.get_cache(cls)
+        for key in keys:
+            cache.invalidate(key)
+
+    @classmethod
+    def update_one(cls, which, data=None, storage_data=None, saved=False, inmem=False):
+        """Write only the changes made to an object when saving it, rather
+        than its whole document; see `get_partial_update`. Other updates,
+        forced saves, and objects whose stored data is unknown, are written
+        in full.
+        """
+        keys = cls._get_cached_keys(which)
+        stored = None
+        if saved and isinstance(which, GenericStoredObject) and not cls.queue.active \
+                and not getattr(which, '_saving_forced', False) \
+                and len(cls._storage) == 1 and isinstance(cls._storage[0], MongoStorage):
+            stored = which._get_cached_data(which._stored_key)
+        if stored is None:
+            super(StoredObject, cls).update_one(
+                which, data=data, storage_data=storage_data, saved=saved, inmem=inmem
+            )
+        else:
+            update = get_partial_update(stored, storage_data)
+            if update:
+                cls._storage[0].store.update(
+                    {cls._primary_name: which._storage_key},
+                    update,
+                    upsert=False,
+                    multi=False,
+                )
+        cls._invalidate_cached(keys)
+
+    @classmethod
+    def update(cls, query, data=None, storage_data=None):
+        keys = cls._get_cached_keys(query)
+        super(StoredObject, cls).update(query, data=data, storage_data=storage_data)
+        cls._invalidate_cached(keys)
+
+    @classmethod
+    def remove_one(cls, which, rm=True):
+        keys = cls._get_cached_keys(which)
+        super(StoredObject, cls).remove_one(which, rm=rm)
+        cls._invalidate_cached(keys)
 
 __all__ = [
     'StoredObject',
@@ -42,4 +150,8 @@ __all__ = [
     'client',
     'database',
     'set_up_storage',
+    'pool_stats',
+    'load_many',
+    'prefetch',
+    'insert_many',
 ]
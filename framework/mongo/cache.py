@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""Cache of stored objects shared by the requests of a process.
+
+The identity map of `StoredObject` only lasts for one request, so each
+request reads the logged-in user and popular nodes again. Models that set
+``_cached_across_requests`` are also kept, as storage data, in a per-process
+LRU of `OBJECT_CACHE_SIZE` entries per model, each trusted for at most
+`OBJECT_CACHE_TTL` seconds.
+
+Each cached object has a version token in a backend shared by all processes
+(see `OBJECT_CACHE_BACKEND`); saving or removing an object replaces its
+token, so that every process treats its entry as stale. Tokens are replaced
+again once the request commits its transaction, since other processes may
+have cached the uncommitted data in the meantime. Without a shared backend,
+tokens are local to the process and changes made by other processes are
+only seen after `OBJECT_CACHE_TTL` seconds, so the cache is off unless a
+shared backend is configured or `OBJECT_CACHE_ENABLED` is set.
+
+Only requests that do not write read from the cache (see `can_read`), so
+that changes, and the partial updates computed from loaded documents, always
+start from the database. Writes made directly to collections are not
+tracked; call `invalidate` after them.
+"""
+
+import copy
+import time
+import uuid
+import importlib
+import threading
+from collections import OrderedDict
+
+from flask import g, has_request_context
+
+from api.base.api_globals import api_globals
+
+from website import settings
+
+
+class LocalBackend(object):
+    """In-process stand-in for a shared cache such as memcached. Shared
+    backends only need the same `get` and `set` methods.
+
+    :param int size: Maximum number of keys
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._values = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = value
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+
+class ObjectCache(object):
+    """LRU of the storage data of one model's objects, by primary key.
+
+    :param str name: Name of the model's collection
+    :param backend: Backend holding version tokens
+    """
+
+    def __init__(self, name, backend):
+        self.name = name
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _version_key(self, key):
+        return 'osf:objectcache:{0}:{1}'.format(self.name, key)
+
+    def _new_version(self, key):
+        version = uuid.uuid4().hex
+        self.backend.set(self._version_key(key), version)
+        return version
+
+    def _get_version(self, key):
+        return self.backend.get(self._version_key(key))
+
+    def get(self, key):
+        """Return a copy of the cached data of ``key`` if it is fresh, else
+        ``None``.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            data, version, cached_at = entry
+            if time.time() - cached_at <= settings.OBJECT_CACHE_TTL and self._get_version(key) == version:
+                with self._lock:
+                    self._entries[key] = entry
+                    self.hits += 1
+                return copy.deepcopy(data)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def load(self, key, fetch):
+        """Return the data of ``key``, calling ``fetch`` to read it from the
+        database on a miss.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        # Read the version first, so that a save made while fetching leaves
+        # the entry stale
+        version = self._get_version(key) or self._new_version(key)
+        data = fetch()
+        if data is not None:
+            with self._lock:
+                self._entries[key] = (copy.deepcopy(data), version, time.time())
+                while len(self._entries) > settings.OBJECT_CACHE_SIZE:
+                    self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.invalidations += 1
+        self._new_version(key)
+        try:
+            g._object_cache_invalidations.add((self.name, key))
+        except (AttributeError, RuntimeError):
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def to_dict(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'hit_rate': float(self.hits) / requests if requests else 0,
+            }
+
+
+_caches = {}
+_backend = {}
+
+
+def get_backend():
+    if 'backend' not in _backend:
+        if settings.OBJECT_CACHE_BACKEND:
+            module_name, factory_name = settings.OBJECT_CACHE_BACKEND.rsplit('.', 1)
+            factory = getattr(importlib.import_module(module_name), factory_name)
+            _backend['backend'] = factory()
+        else:
+            _backend['backend'] = LocalBackend(settings.OBJECT_CACHE_SIZE * 10)
+    return _backend['backend']
+
+
+def is_enabled():
+    """Whether objects are cached; by default, only if a shared backend is
+    configured.
+    """
+    if settings.OBJECT_CACHE_ENABLED is None:
+        return bool(settings.OBJECT_CACHE_BACKEND)
+    return settings.OBJECT_CACHE_ENABLED
+
+
+def can_read():
+    """Whether the current request may load objects from the cache: only
+    requests that do not open a transaction. Tasks and scripts always load
+    objects from the database.
+    """
+    from framework.transactions.handlers import needs_transaction
+
+    if has_request_context():
+        return not needs_transaction()
+    django_request = getattr(api_globals, 'request', None)
+    if django_request is not None:
+        return not getattr(django_request, '_in_transaction', True)
+    return False
+
+
+def get_cache(schema):
+    """Return the cache of ``schema``, or ``None`` if it is not cached."""
+    if not (is_enabled() and getattr(schema, '_cached_across_requests', False)):
+        return None
+    name = schema._name
+    if name not in _caches:
+        _caches[name] = ObjectCache(name, get_backend())
+    return _caches[name]
+
+
+def get_stats():
+    """Return hit and miss counts and rates by collection."""
+    return {name: cache.to_dict() for name, cache in _caches.items()}
+
+
+def invalidate(schema, keys):
+    """Invalidate the cached objects of ``schema`` with primary keys ``keys``,
+    e.g. after updating their collection directly.
+    """
+    cache = get_cache(schema)
+    if cache is None:
+        return
+    for key in keys:
+        cache.invalidate(schema._pk_to_storage(key))
+
+
+def clear():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def object_cache_before_request():
+    g._object_cache_invalidations = set()
+
+
+def object_cache_teardown_request(error=None):
+    for name, key in getattr(g, '_object_cache_invalidations', ()):
+        _caches[name]._new_version(key)
+
+
+handlers = {
+    'before_request': object_cache_before_request,
+    'teardown_request': object_cache_teardown_request,
+}
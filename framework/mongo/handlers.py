@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import time
 import logging
+import threading
 
 import pymongo
+from pymongo.errors import ConnectionFailure
 from flask import g
 from werkzeug.local import LocalProxy
 
@@ -15,7 +18,13 @@ logger = logging.getLogger(__name__)
 def get_mongo_client():
     """Create MongoDB client and authenticate database.
     """
-    client = pymongo.MongoClient(settings.DB_HOST, settings.DB_PORT)
+    client = pymongo.MongoClient(
+        settings.DB_HOST,
+        settings.DB_PORT,
+        max_pool_size=settings.DB_MAX_POOL_SIZE,
+        connectTimeoutMS=settings.DB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.DB_SOCKET_TIMEOUT_MS,
+    )
 
     db = client[settings.DB_NAME]
 
@@ -25,15 +34,142 @@ def get_mongo_client():
     return client
 
 
+class PoolStats(object):
+    """Process-wide counters for the pooled MongoDB client.
+
+    * checkouts: sockets pinned to a request or transaction
+    * checkins: pinned sockets returned to the pool
+    * waits: checkouts made while every pooled socket was already pinned
+    * timeouts: health checks that failed because the server timed out
+    * health_check_failures: failed health checks of any kind
+    * resets: times the pool was discarded after a failed health check
+    """
+    FIELDS = ('checkouts', 'checkins', 'waits', 'timeouts', 'health_check_failures', 'resets')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            if self.in_use >= settings.DB_MAX_POOL_SIZE:
+                self.waits += 1
+            self.in_use += 1
+
+    def checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def increment(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_dict(self):
+        with self._lock:
+            ret = {field: getattr(self, field) for field in self.FIELDS}
+            ret['in_use'] = self.in_use
+            ret['max_pool_size'] = settings.DB_MAX_POOL_SIZE
+            return ret
+
+
+pool_stats = PoolStats()
+
+# Depth of socket pins held by the current thread; see `pin_request`
+_pins = threading.local()
+_health = {'checked': time.time()}
+_health_lock = threading.Lock()
+
+
+def check_pool_health(client=None, force=False):
+    """Ping the server at most once per `DB_POOL_HEALTH_CHECK_INTERVAL`
+    seconds. If the ping fails, drop every pooled socket so that the next
+    operation reconnects instead of reusing a dead connection.
+
+    :return: False if the check failed, else True
+    """
+    client = client or _mongo_client
+    now = time.time()
+    if not force and now - _health['checked'] < settings.DB_POOL_HEALTH_CHECK_INTERVAL:
+        return True
+    with _health_lock:
+        _health['checked'] = now
+    try:
+        client.admin.command('ping')
+    except ConnectionFailure as error:
+        pool_stats.increment('health_check_failures')
+        if 'timed out' in str(error):
+            pool_stats.increment('timeouts')
+        logger.error('MongoDB health check failed; resetting connection pool: {0}'.format(error))
+        client.disconnect()
+        pool_stats.increment('resets')
+        return False
+    return True
+
+
+def pin_request(client=None):
+    """Pin a pooled socket to the current thread until `unpin_request` is
+    called. TokuMX transactions are bound to a connection, so
+    begin/commit/rollback and everything between them must use the same
+    socket. Pins nest; only the outermost pin counts against the pool.
+    """
+    if not settings.DB_POOL:
+        return
+    client = client or _get_current_client()
+    depth = getattr(_pins, 'depth', 0)
+    if not depth:
+        client.start_request()
+        pool_stats.checkout()
+    _pins.depth = depth + 1
+
+
+def unpin_request(client=None):
+    """Release a pin taken by `pin_request`. No-op if nothing is pinned.
+    """
+    if not settings.DB_POOL:
+        return
+    depth = getattr(_pins, 'depth', 0)
+    if not depth:
+        return
+    _pins.depth = depth - 1
+    if depth == 1:
+        client = client or _get_current_client()
+        client.end_request()
+        pool_stats.checkin()
+
+
+def release_request(client=None):
+    """Release every pin held by the current thread.
+    """
+    while getattr(_pins, 'depth', 0):
+        unpin_request(client)
+
+
 def connection_before_request():
-    """Attach MongoDB client to `g`.
+    """Attach MongoDB client to `g`. In pooled mode, this is the shared
+    process-wide client; otherwise a new client is created per request.
     """
-    g._mongo_client = get_mongo_client()
+    if settings.DB_POOL:
+        check_pool_health()
+        g._mongo_client = _mongo_client
+    else:
+        g._mongo_client = get_mongo_client()
 
 
 def connection_teardown_request(error=None):
-    """Close MongoDB client if attached to `g`.
+    """Return pinned sockets to the pool, or close the per-request MongoDB
+    client if not using the pool.
     """
+    if settings.DB_POOL:
+        release_request()
+        return
     try:
         g._mongo_client.close()
     except AttributeError:
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Collapse repeated saves of the same objects into one write each.
+
+Saving a node often saves it (and its parent, contributors and their
+backrefs) several times over: adding contributors, logs and addons each save
+independently. While a `UnitOfWork` is active, saving an object that is
+already stored only marks it as dirty; the unit saves each dirty object once
+when it exits, in the order they were first saved. New objects are still
+inserted immediately so that they can be referenced.
+
+Because writes are deferred, queries made inside a unit do not see changes
+to objects saved inside it, and `save` returns no changed fields for
+deferred objects; only use a unit around code that does not depend on
+either. Hooks that run after a save (e.g. search updates) run when the
+object is written.
+"""
+
+import logging
+import functools
+from collections import OrderedDict
+
+from framework.exceptions import HTTPError
+from framework.mongo import active_units, get_cache_key
+
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWork(object):
+    """Defer saves of stored objects until the unit exits ::
+
+        with UnitOfWork() as unit:
+            node.add_contributors(contributors, auth=auth)
+            node.save()
+
+    A unit entered while another is active in the same request joins it.
+    Pending saves are discarded if the block raises, except for client
+    errors (`HTTPError` below 500), which are committed like other requests.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()
+        self._joined = False
+        self.flushing = False
+        # Number of objects deferred, and of saves skipped because the object
+        # was already pending
+        self.deferred = 0
+        self.collapsed = 0
+
+    def __enter__(self):
+        key = get_cache_key()
+        if key in active_units:
+            self._joined = True
+            return active_units[key]
+        active_units[key] = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._joined:
+            return
+        try:
+            if exc_type is None or (issubclass(exc_type, HTTPError) and exc_val.code < 500):
+                self.flush()
+            else:
+                self.discard()
+        finally:
+            active_units.pop(get_cache_key(), None)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def defer(self, obj, force=False):
+        """Mark ``obj`` as dirty instead of saving it.
+
+        :return: False if ``obj`` must be saved now
+        """
+        key = id(obj)
+        if self.flushing or not obj._is_loaded:
+            # Saved now, so no longer pending
+            self._pending.pop(key, None)
+            return False
+        if key in self._pending:
+            self.collapsed += 1
+            force = force or self._pending[key][1]
+        else:
+            self.deferred += 1
+        self._pending[key] = (obj, force)
+        return True
+
+    def flush(self):
+        """Save every dirty object once, in the order they were first saved.
+        Saves made by hooks while flushing are not deferred.
+        """
+        self.flushing = True
+        try:
+            while self._pending:
+                _, (obj, force) = self._pending.popitem(last=False)
+                obj.save(force=force)
+        finally:
+            self.flushing = False
+        if self.collapsed:
+            logger.debug('Saved {0} objects; skipped {1} redundant saves'.format(
+                self.deferred, self.collapsed
+            ))
+
+    def discard(self):
+        self._pending.clear()
+
+
+def get_active_unit():
+    """Return the unit of work active in the current request, or ``None``."""
+    return active_units.get(get_cache_key())
+
+
+def unit_of_work(func):
+    """Decorator that runs ``func`` in a `UnitOfWork`."""
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        with UnitOfWork():
+            return func(*args, **kwargs)
+    return wrapped
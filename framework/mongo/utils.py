@@ -3,10 +3,19 @@
 import re
 import httplib as http
 
+import collections
+
 import pymongo
+from modularodm import Q, signals
 from modularodm.exceptions import ValidationValueError
+from modularodm.fields import AbstractForeignField
+from modularodm.fields.foreign import BaseForeignField
+from modularodm.fields.lists import AbstractForeignList, ForeignList
+from modularodm.storage import MongoStorage
+from modularodm.storage.base import KeyExistsException
 
 from framework.exceptions import HTTPError
+from framework.mongo import cache as object_cache
 
 # MongoDB forbids field names that begin with "$" or contain ".". These
 # utilities map to and from Mongo field names.
@@ -33,6 +42,267 @@ def from_mongo(item):
     return item
 
 
+def _is_path_safe(key):
+    return isinstance(key, basestring) and key and '.' not in key and not key.startswith('$')
+
+
+def _diff_list(path, old, new, update):
+    if new[:len(old)] == old:
+        update['$push'][path] = {'$each': new[len(old):]}
+        return
+    removed = [value for value in old if value not in new]
+    if removed and [value for value in old if value not in removed] == new:
+        update['$pull'][path] = {'$in': removed}
+        return
+    update['$set'][path] = new
+
+
+def _diff(path, old, new, update):
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict) and all(_is_path_safe(key) for key in set(old) | set(new)):
+        for key in new:
+            sub_path = '{0}.{1}'.format(path, key)
+            if key in old:
+                _diff(sub_path, old[key], new[key], update)
+            else:
+                update['$set'][sub_path] = new[key]
+        for key in set(old) - set(new):
+            update['$unset']['{0}.{1}'.format(path, key)] = True
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(path, old, new, update)
+    else:
+        update['$set'][path] = new
+
+
+def get_partial_update(old, new):
+    """Build a MongoDB update that turns document ``old`` into ``new`` by
+    touching only what changed: values are set or unset at the deepest
+    changed key, items appended to a list are pushed and items removed from
+    it are pulled. Lists changed in other ways are replaced. Fields missing
+    from ``new`` are left untouched, as with a full ``$set``.
+
+    :param dict old: Document as last read or written
+    :param dict new: Document to write
+    :return: Update document, empty if nothing changed
+    """
+    update = {'$set': {}, '$unset': {}, '$push': {}, '$pull': {}}
+    for key, value in new.items():
+        if key == '_id':
+            continue
+        if key in old:
+            _diff(key, old[key], value, update)
+        else:
+            update['$set'][key] = value
+    return {
+        operator: changes
+        for operator, changes in update.items()
+        if changes
+    }
+
+
+def load_many(schema, keys):
+    """Load the objects of ``schema`` with primary keys ``keys`` with one
+    query for those not already loaded in this request.
+
+    :return: List of objects in the order of ``keys``; ``None`` for missing
+        objects, as with ``schema.load``
+    """
+    keys = list(keys)
+    missing = list(set(key for key in keys if schema._load_from_cache(key) is None))
+    loaded = {}
+    if missing:
+        loaded = {
+            each._primary_key: each
+            for each in schema.find(Q(schema._primary_name, 'in', missing))
+        }
+    return [
+        loaded.get(key) or schema._load_from_cache(key)
+        for key in keys
+    ]
+
+
+def _get_references(obj, name):
+    """Return (schema, key) pairs of the objects referenced by foreign field
+    or back-reference ``name`` of ``obj``, without loading them.
+    """
+    field = obj._fields.get(name)
+    if isinstance(field, BaseForeignField):
+        key = field._get_underlying_data(obj)
+        if key is None:
+            return []
+        if isinstance(field, AbstractForeignField):
+            return [(field.get_schema_class(key[1]), key[0])]
+        return [(field.base_class, key)]
+    try:
+        value = getattr(obj, name)
+    except AttributeError:
+        return []
+    if isinstance(value, AbstractForeignList):
+        return [
+            (obj.get_collection(schema_name), key)
+            for key, schema_name in value._to_data()
+        ]
+    if isinstance(value, ForeignList):
+        return [(value._base_class, key) for key in value._to_primary_keys()]
+    return []
+
+
+def prefetch(objects, *paths):
+    """Load the objects referenced by ``objects`` through each of ``paths``
+    with one query per model, so that following the references afterwards
+    does not query the database once per object. ::
+
+        prefetch(nodes, 'contributors', 'nodes.contributors', 'logs.user')
+
+    A path is a dot-separated chain of foreign fields or back-references
+    (e.g. ``'node__contributed'``); objects without a step are skipped, and
+    pointers resolve steps that are not their own fields through their node.
+
+    :return: ``objects``
+    """
+    objects = [each for each in objects if each is not None]
+    steps = collections.OrderedDict()
+    for path in paths:
+        name, _, rest = path.partition('.')
+        steps.setdefault(name, [])
+        if rest:
+            steps[name].append(rest)
+    for name, rest in steps.items():
+        keys_by_schema = collections.OrderedDict()
+        for obj in objects:
+            for schema, key in _get_references(obj, name):
+                keys_by_schema.setdefault(schema, []).append(key)
+        related = []
+        for schema, keys in keys_by_schema.items():
+            related.extend(load_many(schema, keys))
+        if rest:
+            prefetch(related, *rest)
+    return objects
+
+
+def get_unused_keys(generate, count, *schemas):
+    """Return ``count`` distinct keys made by calling ``generate`` that are
+    not primary keys of any of ``schemas``. Each batch of candidates is
+    checked with one query per schema.
+    """
+    keys = []
+    while len(keys) < count:
+        candidates = set(generate() for _ in range(count - len(keys))) - set(keys)
+        for schema in schemas:
+            taken = schema._storage[0].store.find(
+                {schema._primary_name: {'$in': list(candidates)}},
+                {schema._primary_name: True},
+            )
+            candidates -= set(each[schema._primary_name] for each in taken)
+        keys.extend(candidates)
+    return keys
+
+
+def _prepare_insert(obj):
+    """Run the checks `save` makes before inserting ``obj``.
+
+    :return: Storage data of ``obj``
+    """
+    for field in obj._fields.values():
+        if hasattr(field, 'on_before_save'):
+            field.on_before_save(obj)
+    signals.before_save.send(obj.__class__, instance=obj)
+    storage_data = obj.to_storage()
+    for name, field in obj._fields.items():
+        field.do_validate(getattr(obj, name), obj)
+    obj.validate_record()
+    storage_data[obj._primary_name] = obj._storage_key
+    return storage_data
+
+
+def _add_backref(obj, path, parent_key):
+    """Record back-reference ``path`` to ``parent_key`` on the loaded object
+    ``obj`` and in its cached storage data, without saving it.
+    """
+    backref_key, parent_name, field_name = path
+    stored = obj._get_cached_data(obj._stored_key)
+    targets = [obj._StoredObject__backrefs]
+    if stored is not None:
+        targets.append(stored.setdefault('__backrefs', {}))
+    for backrefs in targets:
+        refs = backrefs.setdefault(backref_key, {}).setdefault(parent_name, {}).setdefault(field_name, [])
+        if parent_key not in refs:
+            refs.append(parent_key)
+
+
+def _update_backrefs(objects):
+    """Add the back-references of newly inserted ``objects`` with one update
+    per referenced model, back-reference and referencing object, rather than
+    one save per referenced object.
+    """
+    updates = collections.OrderedDict()
+    for obj in objects:
+        for name, field in obj._fields.items():
+            instance = getattr(field, '_field_instance', field)
+            backref_key = getattr(instance, '_backref_field_name', None)
+            if not backref_key:
+                continue
+            path = (backref_key, obj._name, name)
+            for schema, key in _get_references(obj, name):
+                if key is None:
+                    continue
+                keys = updates.setdefault((schema, path, obj._primary_key), [])
+                if key not in keys:
+                    keys.append(key)
+    for (schema, path, parent_key), keys in updates.items():
+        storage_keys = [schema._pk_to_storage(key) for key in keys]
+        schema._storage[0].store.update(
+            {schema._primary_name: {'$in': storage_keys}},
+            {'$addToSet': {'.'.join(('__backrefs', ) + path): parent_key}},
+            multi=True,
+        )
+        for key in keys:
+            loaded = schema._load_from_cache(key)
+            if loaded is not None:
+                _add_backref(loaded, path, parent_key)
+        object_cache.invalidate(schema, keys)
+
+
+def insert_many(objects):
+    """Insert new objects with one write per model, then add the
+    back-references they imply with one update per referenced model and
+    field. Saving each object instead writes every referenced object once
+    per reference, e.g. each log of a node whose log list is copied.
+
+    Objects must have primary keys. Like `save`, field and record validators
+    and ``before_save`` receivers run, but ``save`` receivers and overrides of
+    `save` do not; callers apply any side effects of those themselves.
+    Models that are not stored in MongoDB, or whose write queue is active,
+    are saved one at a time.
+
+    :raises: KeyExistsException if any primary key is taken
+    :return: ``objects``
+    """
+    by_schema = collections.OrderedDict()
+    for obj in objects:
+        by_schema.setdefault(obj.__class__, []).append(obj)
+    inserted = []
+    for schema, group in by_schema.items():
+        storage = schema._storage[0] if len(schema._storage) == 1 else None
+        if schema.queue.active or not isinstance(storage, MongoStorage):
+            for obj in group:
+                obj.save()
+            continue
+        documents = [_prepare_insert(obj) for obj in group]
+        try:
+            storage.store.insert(documents, manipulate=False)
+        except pymongo.errors.DuplicateKeyError:
+            raise KeyExistsException
+        for obj, data in zip(group, documents):
+            obj._stored_key = obj._primary_key
+            obj._is_loaded = True
+            schema._set_cache(obj._primary_key, obj, data)
+        inserted.extend(group)
+    _update_backrefs(inserted)
+    return objects
+
+
 sanitize_pattern = re.compile(r'<\/?[^>]+>')
 def sanitized(value):
     if value != sanitize_pattern.sub('', value):
@@ -7,6 +7,7 @@ import bson.objectid
 import httplib as http
 
 import itsdangerous
+import pymongo
 
 from werkzeug.local import LocalProxy
 from weakref import WeakKeyDictionary
@@ -15,9 +16,37 @@ from framework.flask import redirect
 
 from website import settings
 
+from modularodm import storage
+
 from .model import Session
 
 
+_session_client = {}
+
+
+def get_session_database():
+    """Return the database holding sessions, `SESSION_DB_NAME` on
+    `SESSION_DB_HOST`, creating its client on first use.
+    """
+    if 'client' not in _session_client:
+        _session_client['client'] = pymongo.MongoClient(
+            settings.SESSION_DB_HOST or settings.DB_HOST,
+            settings.SESSION_DB_PORT or settings.DB_PORT,
+            max_pool_size=settings.DB_MAX_POOL_SIZE,
+        )
+    return _session_client['client'][settings.SESSION_DB_NAME]
+
+
+def set_up_storage(storage_class=storage.MongoStorage, db=None):
+    """Store sessions in ``db`` through ``storage_class``, which may be any
+    modular-odm storage backend. Defaults to `get_session_database`.
+    """
+    db = db or get_session_database()
+    Session.set_storage(storage_class(db=db, collection=Session._name))
+    for index in Session.__indices__:
+        db[Session._name].ensure_index(**index)
+
+
 def add_key_to_url(url, scheme, key):
     """Redirects the user to the requests URL with the given key appended
     to the query parameters.
@@ -172,7 +201,7 @@ def before_request():
     if cookie:
         try:
             session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
-            session = Session.load(session_id) or Session(_id=session_id)
+            session = Session.load_cached(session_id) or Session(_id=session_id)
             set_session(session)
             return
         except:
@@ -180,7 +209,9 @@ def before_request():
 
 
 def after_request(response):
-    if session.data.get('auth_user_id'):
-        session.save()
+    # Write only if the session changed (e.g. on logout) or its expiry is due
+    # to be extended
+    if session._is_loaded or session.data.get('auth_user_id'):
+        session.save_if_changed()
 
     return response
@@ -1,18 +1,122 @@
 # -*- coding: utf-8 -*-
 
+import time
+import datetime
+import threading
+from collections import OrderedDict
+
+import pymongo
 from bson import ObjectId
 from modularodm import fields
 
 from framework.mongo import StoredObject
 
+from website import settings
+
+
+class SessionCache(object):
+    """In-process LRU of recently used sessions, holding their storage data.
+    Entries expire after `SESSION_CACHE_TTL` seconds so that changes made by
+    other processes are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, session_id):
+        """Return the storage data of a cached session, or ``None``."""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return None
+            data, cached_at = entry
+            if time.time() - cached_at > settings.SESSION_CACHE_TTL:
+                return None
+            self._entries[session_id] = entry
+            return data
+
+    def put(self, session):
+        if not settings.SESSION_CACHE_SIZE:
+            return
+        with self._lock:
+            self._entries.pop(session._id, None)
+            self._entries[session._id] = (session.to_storage(), time.time())
+            while len(self._entries) > settings.SESSION_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def evict(self, session_ids):
+        with self._lock:
+            for session_id in session_ids:
+                self._entries.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+session_cache = SessionCache()
+
 
 class Session(StoredObject):
 
     _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
     date_created = fields.DateTimeField(auto_now_add=True)
-    date_modified = fields.DateTimeField(auto_now=True)
+    # Set on save; MongoDB removes sessions not modified for `SESSION_TIMEOUT`
+    date_modified = fields.DateTimeField(default=datetime.datetime.utcnow)
     data = fields.DictionaryField()
 
+    __indices__ = [
+        {
+            'key_or_list': [
+                ('date_modified', pymongo.ASCENDING),
+            ],
+            'expireAfterSeconds': settings.SESSION_TIMEOUT,
+        },
+    ]
+
     @property
     def is_authenticated(self):
         return 'auth_user_id' in self.data
+
+    @classmethod
+    def load_cached(cls, session_id):
+        """Load a session, using the in-process cache if possible.
+        """
+        data = session_cache.get(session_id)
+        if data is not None:
+            return cls.load(session_id, data=data)
+        session = cls.load(session_id)
+        if session is not None:
+            session_cache.put(session)
+        return session
+
+    @property
+    def is_dirty(self):
+        """Whether `data` changed since the session was loaded or saved."""
+        if not self._is_loaded:
+            return True
+        stored = self._get_cached_data(self._stored_key)
+        return stored is None or stored.get('data') != self.data
+
+    def save_if_changed(self):
+        """Save only if `data` changed or the expiry of the session is due to
+        be extended; see `SESSION_REFRESH_INTERVAL`.
+
+        :return: True if the session was saved
+        """
+        refresh_after = datetime.timedelta(seconds=settings.SESSION_REFRESH_INTERVAL)
+        is_stale = (
+            self.date_modified is None or
+            datetime.datetime.utcnow() - self.date_modified > refresh_after
+        )
+        if not (self.is_dirty or is_stale):
+            return False
+        self.save()
+        return True
+
+    def save(self, *args, **kwargs):
+        self.date_modified = datetime.datetime.utcnow()
+        ret = super(Session, self).save(*args, **kwargs)
+        session_cache.put(self)
+        return ret
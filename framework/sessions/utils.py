@@ -1,6 +1,6 @@
 from modularodm import Q
 
-from .model import Session
+from .model import Session, session_cache
 
 
 def remove_sessions_for_user(user):
@@ -8,4 +8,6 @@ def remove_sessions_for_user(user):
 
     :param User user:
     """
-    Session.remove(Q('data.auth_user_id', 'eq', user._id))
+    query = Q('data.auth_user_id', 'eq', user._id)
+    session_cache.evict([each._id for each in Session.find(query)])
+    Session.remove(query)
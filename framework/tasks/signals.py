@@ -6,6 +6,7 @@ imported by Celery and is not used elsewhere in the application.
 from celery import signals
 from modularodm import storage
 
+from framework import analytics
 from framework.mongo import set_up_storage, StoredObject
 
 from website import models
@@ -24,3 +25,10 @@ def attach_models(*args, **kwargs):
     """Attach models to database collections on worker initialization.
     """
     set_up_storage(models.MODELS, storage.MongoStorage)
+
+
+@signals.worker_process_shutdown.connect
+def flush_counters(*args, **kwargs):
+    """Write buffered page counters before the worker process exits.
+    """
+    analytics.counter_buffer.flush()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 from framework.mongo import database as proxy_database
+from framework.mongo import handlers as mongo_handlers
 from website import settings as osfsettings
 
 logger = logging.getLogger(__name__)
@@ -27,6 +28,12 @@ def show_live(database=None):
 
 
 def disconnect(database=None):
+    """Release the connection used by the current request. The pooled client
+    is shared by the whole process, so only its pinned socket is released.
+    """
+    if osfsettings.DB_POOL:
+        mongo_handlers.release_request()
+        return
     database = database or proxy_database
     try:
         database.connection.close()
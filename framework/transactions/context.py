@@ -1,16 +1,29 @@
 # -*- coding: utf-8 -*-
 
+import time
+import random
 import logging
 import functools
+import threading
 
+from flask import has_request_context
 from pymongo.errors import OperationFailure
 
+from framework.exceptions import HTTPError
+from framework.mongo import StoredObject
 from framework.mongo import database as proxy_database
+from framework.mongo import handlers as mongo_handlers
 from framework.transactions import commands, messages, utils
+from framework.transactions.handlers import LOCK_ERROR_CODE, NO_AUTO_TRANSACTION_ATTR
+
+from website import settings
 
 
 logger = logging.getLogger(__name__)
 
+# Callbacks of the `retry_on_conflict` attempts in progress, innermost last
+_pending = threading.local()
+
 
 class TokuTransaction(object):
     """Transaction context manager. Begin transaction on enter; rollback or
@@ -20,19 +33,30 @@ class TokuTransaction(object):
     def __init__(self, database=None):
         self.database = database or proxy_database
         self.pending = False
+        # Whether this context began the transaction, rather than joining one
+        self.began = False
 
     def __enter__(self):
+        mongo_handlers.pin_request()
         try:
             commands.begin(self.database)
             self.pending = True
+            self.began = True
         except OperationFailure as error:
             message = utils.get_error_message(error)
             if messages.TRANSACTION_EXISTS_ERROR not in message:
+                mongo_handlers.unpin_request()
                 raise
             logger.warn('Transaction already in progress')
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._finish(exc_type, exc_val, exc_tb)
+        finally:
+            mongo_handlers.unpin_request()
+
+    def _finish(self, exc_type, exc_val, exc_tb):
         if self.pending:
             if exc_type:
                 commands.rollback(self.database)
@@ -60,3 +84,102 @@ def transaction(database=None):
                 return func(*args, **kwargs)
         return wrapped
     return wrapper
+
+
+def get_retry_delay(attempt):
+    """Seconds to wait before retry number ``attempt`` (from 0): a random
+    delay of up to `TRANSACTION_RETRY_BASE_DELAY` * 2 ** ``attempt``, capped
+    at `TRANSACTION_RETRY_MAX_DELAY`, so that conflicting requests do not
+    retry in lockstep.
+    """
+    ceiling = min(
+        settings.TRANSACTION_RETRY_MAX_DELAY,
+        settings.TRANSACTION_RETRY_BASE_DELAY * 2 ** attempt,
+    )
+    return random.uniform(0, ceiling)
+
+
+def on_commit(func, *args, **kwargs):
+    """Call ``func`` with the given arguments once the innermost
+    `retry_on_conflict` transaction has committed, or right away outside of
+    one. Use for side effects outside of the database, such as sending mail
+    or pushing status messages, which an attempt that is rolled back and run
+    again must not repeat.
+    """
+    stack = getattr(_pending, 'callbacks', None)
+    if not stack:
+        return func(*args, **kwargs)
+    stack[-1].append(functools.partial(func, *args, **kwargs))
+
+
+def retry_on_conflict(max_retries=None, database=None):
+    """Decorator factory. Run the decorated function in its own transaction
+    and, if TokuMX does not grant it a lock because a concurrent transaction
+    holds it, roll back and run the function again after a backoff; see
+    `get_retry_delay`. Only use on views and tasks that can safely run more
+    than once, i.e. that have no side effects outside of the database other
+    than those deferred with `on_commit`, which run once the attempt commits.
+
+    Views decorated this way do not run in the per-request transaction. If
+    every attempt conflicts, views respond with a 400, as for requests that
+    are not retried, and other functions raise the lock error.
+
+    :param int max_retries: Defaults to `TRANSACTION_RETRY_MAX`
+    """
+    def wrapper(func):
+        endpoint = '{0}.{1}'.format(func.__module__, func.__name__)
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            retries = settings.TRANSACTION_RETRY_MAX if max_retries is None else max_retries
+            attempt = 0
+            while True:
+                txn = TokuTransaction(database)
+                callbacks = []
+                client_error = None
+                stack = _pending.__dict__.setdefault('callbacks', [])
+                stack.append(callbacks)
+                try:
+                    try:
+                        with txn:
+                            try:
+                                result = func(*args, **kwargs)
+                            except HTTPError as error:
+                                # Commit, as for requests that are not retried
+                                if error.code >= 500:
+                                    raise
+                                client_error = error
+                    finally:
+                        stack.pop()
+                except OperationFailure as error:
+                    # A conflict in an enclosing transaction cannot be retried
+                    # from here
+                    if not (txn.began and utils.is_lock_error(error)):
+                        raise
+                    utils.conflict_stats.increment(endpoint, 'conflicts')
+                    if attempt >= retries:
+                        utils.conflict_stats.increment(endpoint, 'give_ups')
+                        logger.warn('Gave up on {0} after {1} lock conflicts'.format(endpoint, attempt + 1))
+                        if has_request_context():
+                            raise HTTPError(LOCK_ERROR_CODE)
+                        raise
+                else:
+                    # Callbacks of attempts that were rolled back are dropped;
+                    # those of attempts that joined an enclosing transaction
+                    # wait for it to commit
+                    if not txn.began and stack:
+                        stack[-1].extend(callbacks)
+                    else:
+                        for callback in callbacks:
+                            callback()
+                    if client_error is not None:
+                        raise client_error
+                    return result
+                utils.conflict_stats.increment(endpoint, 'retries')
+                # Objects cached during the failed attempt may be stale
+                StoredObject._clear_caches()
+                time.sleep(get_retry_delay(attempt))
+                attempt += 1
+        setattr(wrapped, NO_AUTO_TRANSACTION_ATTR, True)
+        return wrapped
+    return wrapper
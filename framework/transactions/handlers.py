@@ -6,6 +6,7 @@ import logging
 from flask import request, current_app
 from pymongo.errors import OperationFailure
 
+from framework.mongo import handlers as mongo_handlers
 from framework.transactions import utils, commands, messages
 
 from website import settings
@@ -13,6 +14,8 @@ from website import settings
 
 LOCK_ERROR_CODE = httplib.BAD_REQUEST
 NO_AUTO_TRANSACTION_ATTR = '_no_auto_transaction'
+READ_ONLY_ATTR = '_read_only'
+AUTO_TRANSACTION_ATTR = '_auto_transaction'
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,22 @@ def no_auto_transaction(func):
     return func
 
 
+def read_only(func):
+    """Declare that a view does not write, so that its requests never open a
+    transaction, whatever their method.
+    """
+    setattr(func, READ_ONLY_ATTR, True)
+    return func
+
+
+def auto_transaction(func):
+    """Declare that a view writes on safe methods (e.g. GET), so that its
+    requests always open a transaction.
+    """
+    setattr(func, AUTO_TRANSACTION_ATTR, True)
+    return func
+
+
 def view_has_annotation(attr):
     try:
         endpoint = request.url_rule.endpoint
@@ -31,11 +50,31 @@ def view_has_annotation(attr):
     return getattr(view, attr, False)
 
 
+def needs_transaction():
+    """Whether the current request runs in a transaction. Views may opt out
+    with `no_auto_transaction` or `read_only`; requests made with safe
+    methods skip transactions unless their view is marked `auto_transaction`.
+    """
+    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR) or view_has_annotation(READ_ONLY_ATTR):
+        return False
+    if view_has_annotation(AUTO_TRANSACTION_ATTR):
+        return True
+    try:
+        method = request.method
+    except RuntimeError:
+        return True
+    return not (settings.TRANSACTIONS_SKIP_SAFE_METHODS and method in utils.SAFE_METHODS)
+
+
 def transaction_before_request():
     """Setup transaction before handling the request.
     """
-    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
+    opened = needs_transaction()
+    endpoint = request.url_rule.endpoint if request.url_rule else None
+    utils.transaction_stats.record(endpoint, request.method, opened)
+    if not opened:
         return None
+    mongo_handlers.pin_request()
     try:
         commands.rollback()
         logger.error('Transaction already in progress; rolling back.')
@@ -51,7 +90,7 @@ def transaction_after_request(response):
     uncaught exception occurred, else commit. If the commit fails due to a lock
     error, rollback and return error response.
     """
-    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
+    if not needs_transaction():
         return response
     if response.status_code >= 500:
         commands.rollback()
@@ -59,8 +98,10 @@ def transaction_after_request(response):
         try:
             commands.commit()
         except OperationFailure as error:
-            message = utils.get_error_message(error)
-            if 'lock not granted' in message.lower():
+            if utils.is_lock_error(error):
+                endpoint = request.url_rule.endpoint if request.url_rule else None
+                utils.conflict_stats.increment(endpoint, 'conflicts')
+                utils.conflict_stats.increment(endpoint, 'give_ups')
                 commands.rollback()
                 return utils.handle_error(LOCK_ERROR_CODE)
             raise
@@ -72,7 +113,7 @@ def transaction_teardown_request(error=None):
     reached in debug mode, since uncaught errors are raised for use in the
     Werkzeug debugger.
     """
-    if view_has_annotation(NO_AUTO_TRANSACTION_ATTR):
+    if not needs_transaction():
         return None
     if error is not None:
         if not settings.DEBUG_MODE:
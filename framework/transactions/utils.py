@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import logging
+import threading
+import collections
+
 from flask import make_response
 
 from framework.exceptions import HTTPError
@@ -8,6 +12,71 @@ from framework.routing import JSONRenderer, render_mako_string
 from website.util import is_json_request
 
 
+logger = logging.getLogger(__name__)
+
+# Requests made with these methods do not open a transaction unless their
+# view asks for one; see `TRANSACTIONS_SKIP_SAFE_METHODS`
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class EndpointStats(object):
+    """Process-wide counters by endpoint.
+
+    :param tuple fields: Names of the counters kept for each endpoint
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._lock = threading.Lock()
+        self._counts = collections.defaultdict(collections.Counter)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def increment(self, endpoint, field):
+        with self._lock:
+            self._counts[endpoint][field] += 1
+            return self._counts[endpoint][field]
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                endpoint: {field: counts[field] for field in self.fields}
+                for endpoint, counts in self._counts.iteritems()
+            }
+
+
+class TransactionStats(EndpointStats):
+    """Count of requests that opened a transaction and that skipped one, by
+    endpoint. An endpoint that opens transactions for safe methods is likely
+    a view that writes on GET; one that opens them without writing may be
+    declared `read_only`.
+    """
+
+    def __init__(self):
+        super(TransactionStats, self).__init__(('opened', 'skipped'))
+
+    def record(self, endpoint, method, opened):
+        count = self.increment(endpoint, 'opened' if opened else 'skipped')
+        if opened:
+            logger.debug('{0} {1} opened a transaction ({2} so far)'.format(method, endpoint, count))
+
+
+transaction_stats = TransactionStats()
+
+# Lock conflicts, retries after a conflict and requests or tasks that gave up
+# after too many conflicts, by endpoint; see `context.retry_on_conflict`
+conflict_stats = EndpointStats(('conflicts', 'retries', 'give_ups'))
+
+
+def is_lock_error(error):
+    """Whether ``error`` is TokuMX failing to grant a lock to the current
+    transaction because a concurrent transaction holds it.
+    """
+    return 'lock not granted' in get_error_message(error).lower()
+
+
 def get_error_message(error):
     """Retrieve error message from error, if available.
 
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Build the co-contributor index from the contributor lists of all nodes.
+Later contributor changes keep it up to date.
+"""
+
+import sys
+import logging
+
+from website import models
+from website.app import init_app
+from website.project import cocontributors
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_targets():
+    return models.Node._storage[0].store.find(
+        {'contributors.1': {'$exists': True}},
+        {'contributors': True},
+    )
+
+
+def main(dry_run=True):
+    targets = get_targets()
+    logger.info('Indexing co-contributors of {0} nodes'.format(targets.count()))
+    if not dry_run:
+        cocontributors.rebuild(targets)
+    logger.info('Indexed co-contributors of {0} users'.format(cocontributors.get_collection().count()))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    init_app(set_backends=True, routes=False)
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    main(dry_run=dry_run)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Backfill `node_id` and `root_id` on NodeLog. Forks and registrations list
+the logs of the node they were copied from, so nodes are visited oldest first
+and a log is attributed to the first node that lists it.
+"""
+
+import sys
+import logging
+
+from modularodm import Q
+
+from website import models
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_targets():
+    return models.NodeLog.find(Q('node_id', 'eq', None))
+
+
+def migrate_node(node, dry_run=True):
+    log_ids = node.logs._to_primary_keys()
+    if not log_ids:
+        return 0
+    collection = models.NodeLog._storage[0].store
+    query = {'_id': {'$in': log_ids}, 'node_id': None}
+    count = collection.find(query).count()
+    if count:
+        logger.info('Setting `node_id` of {0} logs to {1}'.format(count, node._id))
+    if not dry_run:
+        collection.update(
+            query,
+            {'$set': {'node_id': node._id, 'root_id': node.root._id}},
+            multi=True,
+        )
+    return count
+
+
+def main(dry_run=True):
+    count = 0
+    for node in models.Node.find().sort('date_created'):
+        count += migrate_node(node, dry_run=dry_run)
+    if not dry_run:
+        models.NodeLog._clear_caches()
+    logger.info('Migrated {0} logs'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    init_app(set_backends=True, routes=False)
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    main(dry_run=dry_run)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Backfill the `ancestor_ids` and `root_id` fields on Node, top-level nodes
+first so that each component can reuse the ancestry of its parent.
+"""
+
+import sys
+import logging
+
+from modularodm import Q
+
+from website import models
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_targets():
+    return models.Node.find(Q('root_id', 'eq', None))
+
+
+def migrate_node(node, dry_run=True):
+    ancestor_ids, root_id = node.get_ancestry()
+    logger.info('Setting ancestry of node {0} to {1} (root {2})'.format(node._id, ancestor_ids, root_id))
+    if not dry_run:
+        node.ancestor_ids = ancestor_ids
+        node.root_id = root_id
+        node.save()
+
+
+def main(dry_run=True):
+    count = 0
+    # Sort by depth so that parents are migrated before their children
+    targets = sorted(get_targets(), key=lambda node: len(node.get_ancestry()[0]))
+    for node in targets:
+        migrate_node(node, dry_run=dry_run)
+        count += 1
+    logger.info('Migrated {0} nodes'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    init_app(set_backends=True, routes=False)
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    main(dry_run=dry_run)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Backfill the stored `date_modified` field on Node from the date of each
+node's most recent log.
+"""
+
+import sys
+import logging
+
+from modularodm import Q
+
+from website import models
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_targets():
+    return models.Node.find(Q('date_modified', 'eq', None))
+
+
+def main(dry_run=True):
+    count = 0
+    for node in get_targets():
+        date_modified = node.get_last_log_date()
+        logger.info('Setting `date_modified` of node {0} to {1}'.format(node._id, date_modified))
+        if not dry_run:
+            node.date_modified = date_modified
+            node.save()
+        count += 1
+    logger.info('Migrated {0} nodes'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    init_app(set_backends=True, routes=False)
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    main(dry_run=dry_run)
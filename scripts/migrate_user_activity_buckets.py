@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Move the daily counts in `useractivitycounters` into monthly buckets in
+`useractivitybuckets`, leaving only each user's totals. Counts recorded
+while the migration runs already go to the buckets.
+
+Migrated buckets are marked, so that the script can be run again, e.g. after
+being interrupted, without counting any day twice.
+"""
+
+import sys
+import logging
+import collections
+
+from pymongo.errors import DuplicateKeyError
+
+from framework.mongo import database
+from framework import analytics
+from website.app import init_app
+from scripts import utils as scripts_utils
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_targets():
+    return database['useractivitycounters'].find({'date': {'$exists': True}})
+
+
+def get_bucket_increments(counter):
+    """Return a dictionary mapping each month to the increments of its
+    bucket, from a counter document with daily counts.
+    """
+    buckets = collections.defaultdict(collections.Counter)
+    for date, counts in (counter.get('date') or {}).iteritems():
+        month, day = date.rsplit('/', 1)
+        buckets[month]['total'] += counts.get('total', 0)
+        buckets[month]['date.{0}.total'.format(day)] += counts.get('total', 0)
+    for action, counts in (counter.get('action') or {}).iteritems():
+        for date, count in (counts.get('date') or {}).iteritems():
+            month, day = date.rsplit('/', 1)
+            buckets[month]['action.{0}.total'.format(action)] += count
+            buckets[month]['action.{0}.date.{1}'.format(action, day)] += count
+    return buckets
+
+
+def migrate_counter(counter):
+    user_id = counter['_id']
+    for month, increments in get_bucket_increments(counter).iteritems():
+        try:
+            # Buckets already migrated do not match, and the upsert fails
+            analytics.get_activity_buckets().update(
+                {'_id': '{0}:{1}'.format(user_id, month), 'migrated': {'$ne': True}},
+                {
+                    '$set': {'user': user_id, 'month': month, 'migrated': True},
+                    '$inc': dict(increments),
+                },
+                upsert=True,
+                manipulate=False,
+            )
+        except DuplicateKeyError:
+            logger.info('Skipping migrated bucket {0} of user {1}'.format(month, user_id))
+    unset = {'date': True}
+    for action in counter.get('action') or {}:
+        unset['action.{0}.date'.format(action)] = True
+    database['useractivitycounters'].update({'_id': user_id}, {'$unset': unset})
+
+
+def main(dry_run=True):
+    targets = get_targets()
+    logger.info('Migrating activity counters of {0} users'.format(targets.count()))
+    if dry_run:
+        return
+    for counter in targets:
+        migrate_counter(counter)
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    init_app(set_backends=True, routes=False)
+    if not dry_run:
+        scripts_utils.add_file_logger(logger, __file__)
+    main(dry_run=dry_run)
@@ -0,0 +1,38 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, UserFactory
+
+from framework.auth import Auth
+
+from website.models import Node
+from website.project import cocontributors
+from scripts.migrate_cocontributors import main
+
+
+class TestMigrateCocontributors(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateCocontributors, self).setUp()
+        self.user = UserFactory()
+        self.other = UserFactory()
+        for _ in range(2):
+            project = ProjectFactory(creator=self.user)
+            project.add_contributor(self.other, auth=Auth(self.user), save=True)
+        cocontributors.get_collection().remove()
+
+    def tearDown(self):
+        super(TestMigrateCocontributors, self).tearDown()
+        Node.remove()
+        cocontributors.get_collection().remove()
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(cocontributors.get_collection().count(), 0)
+
+    def test_migrate(self):
+        main(dry_run=False)
+        counts = cocontributors.get_counts(self.user._id, [self.other._id])
+        assert_equal(counts, {self.other._id: 2})
+        counts = cocontributors.get_counts(self.other._id, [self.user._id])
+        assert_equal(counts, {self.user._id: 2})
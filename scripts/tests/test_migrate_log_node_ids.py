@@ -0,0 +1,38 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+from framework.auth import Auth
+
+from website.models import Node, NodeLog
+from scripts.migrate_log_node_ids import get_targets, main
+
+
+class TestMigrateLogNodeIds(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateLogNodeIds, self).setUp()
+        self.project = ProjectFactory()
+        self.fork = self.project.fork_node(Auth(self.project.creator))
+        NodeLog._storage[0].store.update(
+            {}, {'$unset': {'node_id': True, 'root_id': True}}, multi=True
+        )
+        NodeLog._clear_caches()
+
+    def tearDown(self):
+        super(TestMigrateLogNodeIds, self).tearDown()
+        Node.remove()
+        NodeLog.remove()
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(get_targets().count(), 2)
+
+    def test_migrate(self):
+        main(dry_run=False)
+        assert_equal(get_targets().count(), 0)
+        project_log = NodeLog.load(self.project.logs[0]._id)
+        assert_equal(project_log.node_id, self.project._id)
+        fork_log = NodeLog.load(self.fork.logs[-1]._id)
+        assert_equal(fork_log.node_id, self.fork._id)
@@ -0,0 +1,38 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, NodeFactory
+
+from website.models import Node
+from scripts.migrate_node_ancestors import get_targets, main
+
+
+class TestMigrateNodeAncestors(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeAncestors, self).setUp()
+        self.project = ProjectFactory()
+        self.component = NodeFactory(parent=self.project)
+        self.subcomponent = NodeFactory(parent=self.component)
+        # Simulate nodes created before the ancestry fields existed
+        Node._storage[0].store.update({}, {'$unset': {'ancestor_ids': True, 'root_id': True}}, multi=True)
+        Node._clear_caches()
+
+    def tearDown(self):
+        super(TestMigrateNodeAncestors, self).tearDown()
+        Node.remove()
+
+    def test_get_targets(self):
+        assert_equal(get_targets().count(), 3)
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(get_targets().count(), 3)
+
+    def test_migrate(self):
+        main(dry_run=False)
+        assert_equal(get_targets().count(), 0)
+        subcomponent = Node.load(self.subcomponent._id)
+        assert_equal(subcomponent.ancestor_ids, [self.component._id, self.project._id])
+        assert_equal(subcomponent.root_id, self.project._id)
+        assert_equal(Node.load(self.project._id).root_id, self.project._id)
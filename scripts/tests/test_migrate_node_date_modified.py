@@ -0,0 +1,30 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+from website.models import Node
+from scripts.migrate_node_date_modified import get_targets, main
+
+
+class TestMigrateNodeDateModified(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeDateModified, self).setUp()
+        self.project = ProjectFactory()
+        Node._storage[0].store.update({}, {'$unset': {'date_modified': True}}, multi=True)
+        Node._clear_caches()
+
+    def tearDown(self):
+        super(TestMigrateNodeDateModified, self).tearDown()
+        Node.remove()
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(get_targets().count(), 1)
+
+    def test_migrate(self):
+        main(dry_run=False)
+        assert_equal(get_targets().count(), 0)
+        project = Node.load(self.project._id)
+        assert_equal(project.date_modified, project.logs[-1].date)
@@ -0,0 +1,74 @@
+import datetime as dt
+
+import mock
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+
+from framework import analytics
+from scripts.migrate_user_activity_buckets import get_targets, main, migrate_counter
+
+
+class TestMigrateUserActivityBuckets(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateUserActivityBuckets, self).setUp()
+        self.collection = self.db['useractivitycounters']
+        self.collection.insert({
+            '_id': 'abc12',
+            'total': 3,
+            'date': {
+                '2015/05/31': {'total': 1},
+                '2015/06/01': {'total': 2},
+            },
+            'action': {
+                'project_created': {
+                    'total': 3,
+                    'date': {'2015/05/31': 1, '2015/06/01': 2},
+                },
+            },
+        })
+
+    def tearDown(self):
+        super(TestMigrateUserActivityBuckets, self).tearDown()
+        self.collection.remove()
+        analytics.get_activity_buckets().remove()
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(get_targets().count(), 1)
+        assert_equal(analytics.get_activity_buckets().count(), 0)
+
+    def test_migrate(self):
+        main(dry_run=False)
+        assert_equal(get_targets().count(), 0)
+        assert_equal(
+            self.collection.find_one({'_id': 'abc12'}),
+            {'_id': 'abc12', 'total': 3, 'action': {'project_created': {'total': 3}}},
+        )
+        buckets = analytics.get_monthly_activity('abc12')
+        assert_equal([bucket['month'] for bucket in buckets], ['2015/05', '2015/06'])
+        assert_equal(buckets[1]['total'], 2)
+        assert_equal(buckets[1]['date'], {'01': {'total': 2}})
+        assert_equal(buckets[1]['action'], {'project_created': {'total': 2, 'date': {'01': 2}}})
+        assert_equal(analytics.get_total_activity_count('abc12'), 3)
+
+    def test_migrate_again_after_interruption(self):
+        counter = self.collection.find_one({'_id': 'abc12'})
+        # Interrupted after moving the counts, before removing the daily keys
+        with mock.patch('scripts.migrate_user_activity_buckets.database'):
+            migrate_counter(counter)
+        assert_equal(get_targets().count(), 1)
+        main(dry_run=False)
+        main(dry_run=False)
+        assert_equal(get_targets().count(), 0)
+        buckets = analytics.get_monthly_activity('abc12')
+        assert_equal([bucket['total'] for bucket in buckets], [1, 2])
+        assert_equal(buckets[1]['action'], {'project_created': {'total': 2, 'date': {'01': 2}}})
+
+    def test_migrate_keeps_counts_recorded_meanwhile(self):
+        analytics.increment_user_activity_counters('abc12', 'project_created', dt.datetime(2015, 6, 2))
+        main(dry_run=False)
+        buckets = analytics.get_monthly_activity('abc12')
+        assert_equal(buckets[1]['total'], 3)
+        assert_equal(buckets[1]['date'], {'01': {'total': 2}, '02': {'total': 1}})
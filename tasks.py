@@ -315,19 +315,24 @@ def elasticsearch():
         print("Your system is not recognized, you will have to start elasticsearch manually")
 
 @task
-def migrate_search(delete=False, index=settings.ELASTIC_INDEX):
-    """Migrate the search-enabled models."""
+def migrate_search(delete=False, index=settings.ELASTIC_INDEX, processes=None, chunk_size=500, resume=False):
+    """Migrate the search-enabled models into a new version of the index,
+    using one worker process per CPU unless ``processes`` is given.
+    """
     from website.search_migration.migrate import migrate
-    migrate(delete, index=index)
+    migrate(
+        delete, index=index,
+        processes=int(processes) if processes else None,
+        chunk_size=int(chunk_size),
+        resume=resume,
+    )
 
 @task
-def rebuild_search():
-    """Delete and recreate the index for elasticsearch"""
-    run("curl -s -XDELETE {uri}/{index}*".format(uri=settings.ELASTIC_URI,
-                                             index=settings.ELASTIC_INDEX))
-    run("curl -s -XPUT {uri}/{index}".format(uri=settings.ELASTIC_URI,
-                                          index=settings.ELASTIC_INDEX))
-    migrate_search()
+def rebuild_search(processes=None, resume=False):
+    """Rebuild the index for elasticsearch into a new version and swap the
+    alias once it is complete, deleting the previous version.
+    """
+    migrate_search(delete=True, processes=processes, resume=resume)
 
 
 @task
@@ -618,14 +623,6 @@ def analytics():
         module.main()
 
 
-@task
-def clear_sessions(months=1, dry_run=False):
-    from website.app import init_app
-    init_app(routes=False, set_backends=True)
-    from scripts import clear_sessions
-    clear_sessions.clear_sessions_relative(months=months, dry_run=dry_run)
-
-
 # Release tasks
 
 @task
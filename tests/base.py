@@ -22,9 +22,11 @@ from modularodm import storage
 
 from api.base.wsgi import application as django_app
 from framework.mongo import set_up_storage
+from framework.mongo import cache as object_cache
 from framework.auth import User
 from framework.sessions.model import Session
-from framework.guid.model import Guid
+from framework.guid.model import Guid, guid_allocator
+from framework.guid.cache import guid_cache
 from framework.mongo import client as client_proxy
 from framework.mongo import database as database_proxy
 from framework.transactions import commands, messages, utils
@@ -116,6 +118,23 @@ class DbTestCase(unittest.TestCase):
 
         cls._original_bcrypt_log_rounds = settings.BCRYPT_LOG_ROUNDS
         settings.BCRYPT_LOG_ROUNDS = 1
+        # Index search documents synchronously
+        cls._original_search_index_async = settings.SEARCH_INDEX_ASYNC
+        settings.SEARCH_INDEX_ASYNC = False
+        # Write page counters immediately
+        cls._original_analytics_buffer_counters = settings.ANALYTICS_BUFFER_COUNTERS
+        settings.ANALYTICS_BUFFER_COUNTERS = False
+        # Cache users and nodes, with the in-process backend, as in production
+        cls._original_object_cache_enabled = settings.OBJECT_CACHE_ENABLED
+        settings.OBJECT_CACHE_ENABLED = True
+        object_cache.clear()
+        # GUIDs reserved for earlier test cases may be in use in this one;
+        # taking them collides and is retried, as across processes
+        guid_allocator.clear()
+        # Many tests write GUIDs to the database directly
+        cls._original_guid_cache_size = settings.GUID_CACHE_SIZE
+        settings.GUID_CACHE_SIZE = 0
+        guid_cache.clear()
 
         teardown_database(database=database_proxy._get_current_object())
         # TODO: With `database` as a `LocalProxy`, we should be able to simply
@@ -127,6 +146,11 @@ class DbTestCase(unittest.TestCase):
         )
         cls.db = database_proxy
 
+    def setUp(self):
+        super(DbTestCase, self).setUp()
+        # Objects of earlier tests may share primary keys with new ones
+        object_cache.clear()
+
     @classmethod
     def tearDownClass(cls):
         super(DbTestCase, cls).tearDownClass()
@@ -139,6 +163,10 @@ class DbTestCase(unittest.TestCase):
         settings.PIWIK_HOST = cls._original_piwik_host
         settings.ENABLE_EMAIL_SUBSCRIPTIONS = cls._original_enable_email_subscriptions
         settings.BCRYPT_LOG_ROUNDS = cls._original_bcrypt_log_rounds
+        settings.SEARCH_INDEX_ASYNC = cls._original_search_index_async
+        settings.ANALYTICS_BUFFER_COUNTERS = cls._original_analytics_buffer_counters
+        settings.OBJECT_CACHE_ENABLED = cls._original_object_cache_enabled
+        settings.GUID_CACHE_SIZE = cls._original_guid_cache_size
 
 
 class AppTestCase(unittest.TestCase):
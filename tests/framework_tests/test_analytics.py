@@ -5,6 +5,7 @@ Unit tests for analytics logic in framework/analytics/__init__.py
 
 import unittest
 
+import mock
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
@@ -16,6 +17,8 @@ from framework.sessions import session
 from tests.base import OsfTestCase
 from tests.factories import UserFactory, ProjectFactory
 
+from website.app import ensure_indices
+
 
 class TestAnalytics(OsfTestCase):
 
@@ -31,6 +34,12 @@ class TestAnalytics(OsfTestCase):
         assert_equal(analytics.get_total_activity_count(user._id, db=self.db), 1)
         assert_equal(analytics.get_total_activity_count(user._id, db=self.db), user.get_activity_points(db=self.db))
 
+    def test_activity_index_created_at_startup(self):
+        analytics.get_activity_buckets().drop()
+        ensure_indices()
+        keys = [index['key'] for index in analytics.get_activity_buckets().index_information().values()]
+        assert_in([('user', 1), ('month', 1)], keys)
+
     def test_increment_user_activity_counters(self):
         user = UserFactory()
         date = datetime.utcnow()
@@ -39,6 +48,80 @@ class TestAnalytics(OsfTestCase):
         analytics.increment_user_activity_counters(user._id, 'project_created', date, db=self.db)
         assert_equal(user.get_activity_points(db=self.db), 1)
 
+    def test_activity_is_bucketed_by_month(self):
+        user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', datetime(2015, 5, 31), db=self.db)
+        analytics.increment_user_activity_counters(user._id, 'project_created', datetime(2015, 6, 1), db=self.db)
+        analytics.increment_user_activity_counters(user._id, 'node_forked', datetime(2015, 6, 1), db=self.db)
+
+        buckets = analytics.get_monthly_activity(user._id, db=self.db)
+        assert_equal([bucket['month'] for bucket in buckets], ['2015/05', '2015/06'])
+        assert_equal(buckets[1]['total'], 2)
+        assert_equal(buckets[1]['date'], {'01': {'total': 2}})
+        assert_equal(buckets[1]['action']['node_forked'], {'total': 1, 'date': {'01': 1}})
+
+        counter = self.db['useractivitycounters'].find_one({'_id': user._id})
+        assert_not_in('date', counter)
+        assert_equal(counter['action']['project_created'], {'total': 2})
+
+    def test_remove_activity_buckets(self):
+        user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', datetime(2015, 5, 31), db=self.db)
+        analytics.increment_user_activity_counters(user._id, 'project_created', datetime(2015, 6, 1), db=self.db)
+        analytics.remove_activity_buckets('2015/06', db=self.db)
+
+        buckets = analytics.get_monthly_activity(user._id, db=self.db)
+        assert_equal([bucket['month'] for bucket in buckets], ['2015/06'])
+        assert_equal(user.get_activity_points(db=self.db), 2)
+
+
+class TestVisitedPages(unittest.TestCase):
+
+    def test_add(self):
+        visited = analytics.VisitedPages()
+        assert_true(visited.add('node:abc12'))
+        assert_false(visited.add('node:abc12'))
+        assert_in('node:abc12', visited)
+        assert_not_in('node:def34', visited)
+
+    def test_dump_and_load(self):
+        visited = analytics.VisitedPages()
+        visited.add(u'download:abc12:\u2603')
+        loaded = analytics.VisitedPages.load(visited.dump())
+        assert_in(u'download:abc12:\u2603', loaded)
+
+    def test_size_is_bounded(self):
+        visited = analytics.VisitedPages()
+        size = len(visited.dump())
+        for index in range(5000):
+            visited.add('node:{0}'.format(index))
+        assert_true(len(visited.dump()) <= 2 * size + 1)
+
+    def test_rotation_keeps_false_positives_rare(self):
+        visited = analytics.VisitedPages()
+        for index in range(5000):
+            visited.add('node:{0}'.format(index))
+        false_positives = sum(
+            'other:{0}'.format(index) in visited
+            for index in range(1000)
+        )
+        assert_less(false_positives, 100)
+        # Recent pages are still remembered
+        assert_in('node:4999', visited)
+
+    def test_load_rotated(self):
+        visited = analytics.VisitedPages()
+        for index in range(2000):
+            visited.add('node:{0}'.format(index))
+        loaded = analytics.VisitedPages.load(visited.dump())
+        assert_in('node:1999', loaded)
+        assert_false(loaded.add('node:1999'))
+
+    def test_load_list(self):
+        visited = analytics.VisitedPages.load(['node:abc12', 'node:def34'])
+        assert_in('node:abc12', visited)
+        assert_in('node:def34', visited)
+
 
 class UpdateCountersTestCase(OsfTestCase):
 
@@ -75,9 +158,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}'.format(self.node, self.fid)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=self.fid)
 
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
@@ -96,14 +176,29 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid)
-
-        session.data['visited'].append(page)
         download_file_version_(node=self.node, fid=self.fid, vid=self.vid)
 
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
         assert_equal(count, (1, 2))
 
+    def test_update_counters_unique_per_day(self):
+        page = 'node:' + str(self.node._id)
+        analytics.update_counter(page, db=self.db)
+        session.data['visited_by_date']['date'] = '2015/01/01'
+        analytics.update_counter(page, db=self.db)
+
+        date = datetime.utcnow().strftime('%Y/%m/%d')
+        result = self.db['pagecounters'].find_one({'_id': page})
+        assert_equal(result['unique'], 1)
+        assert_equal(result['total'], 2)
+        assert_equal(result['date'][date], {'unique': 2, 'total': 2})
+
+    def test_update_counters_converts_visited_list(self):
+        page = 'node:' + str(self.node._id)
+        session.data['visited'] = [page]
+        analytics.update_counter(page, db=self.db)
+        assert_equal(analytics.get_basic_counters(page, db=self.db), (0, 1))
+
     def test_get_basic_counters(self):
         page = 'node:' + str(self.node._id)
 
@@ -133,9 +228,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (None, None))
 
-        page = 'download:{0}:{1}'.format(self.node, fid1)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=fid1)
         download_file_(node=self.node, fid=fid2)
 
@@ -143,3 +235,87 @@ class TestUpdateCounters(UpdateCountersTestCase):
         assert_equal(count, (1, 2))
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (1, 1))
+
+
+@mock.patch('framework.analytics.settings.ANALYTICS_BUFFER_COUNTERS', True)
+@mock.patch('framework.analytics.settings.ANALYTICS_FLUSH_INTERVAL', 3600)
+@mock.patch('framework.analytics.settings.ANALYTICS_FLUSH_SIZE', 3)
+class TestCounterBuffer(UpdateCountersTestCase):
+
+    def setUp(self):
+        super(TestCounterBuffer, self).setUp()
+        analytics.counter_buffer.flush()
+        self.collection = self.db['pagecounters']
+
+    def tearDown(self):
+        analytics.counter_buffer.flush()
+        super(TestCounterBuffer, self).tearDown()
+
+    def test_updates_are_buffered(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        analytics.update_counter('node:abc12', db=self.db)
+        assert_is_none(self.collection.find_one({'_id': 'node:abc12'}))
+        # Pending increments are visible to this process
+        assert_equal(analytics.get_basic_counters('node:abc12', db=self.db), (1, 2))
+
+    def test_flush_writes_one_update_per_page(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        analytics.update_counter('node:abc12', db=self.db)
+        analytics.update_counter('node:def34', db=self.db)
+        assert_equal(analytics.counter_buffer.flush(), 2)
+        assert_equal(len(analytics.counter_buffer), 0)
+        result = self.collection.find_one({'_id': 'node:abc12'})
+        assert_equal(result['unique'], 1)
+        assert_equal(result['total'], 2)
+        assert_equal(analytics.get_basic_counters('node:abc12', db=self.db), (1, 2))
+
+    def test_flush_at_size(self):
+        for index in range(3):
+            analytics.update_counter('node:{0}'.format(index), db=self.db)
+        assert_equal(len(analytics.counter_buffer), 0)
+        assert_equal(self.collection.find().count(), 3)
+
+    def test_flush_after_interval(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        with mock.patch('framework.analytics.time.time', return_value=2 ** 40):
+            analytics.update_counter('node:def34', db=self.db)
+        assert_equal(self.collection.find().count(), 2)
+
+    def test_failed_flush_keeps_increments(self):
+        collection = mock.Mock(full_name='test.pagecounters')
+        collection.update.side_effect = Exception('not primary')
+        analytics.counter_buffer.add(collection, 'node:abc12', {'total': 1})
+        with assert_raises(Exception):
+            analytics.counter_buffer.flush()
+        assert_equal(analytics.counter_buffer.get_pending(collection, 'node:abc12'), {'total': 1})
+        collection.update.side_effect = None
+        analytics.counter_buffer.flush()
+        collection.update.assert_called_with({'_id': 'node:abc12'}, {'$inc': {'total': 1}}, True, False)
+
+    def test_failed_flush_in_request_is_logged(self):
+        collection = mock.Mock(full_name='test.pagecounters')
+        collection.update.side_effect = Exception('not primary')
+        with mock.patch('framework.analytics.settings.ANALYTICS_FLUSH_SIZE', 1):
+            with mock.patch.object(analytics.logger, 'exception') as mock_log:
+                analytics.counter_buffer.add(collection, 'node:abc12', {'total': 1})
+        assert_true(mock_log.called)
+        assert_equal(analytics.counter_buffer.get_pending(collection, 'node:abc12'), {'total': 1})
+        collection.update.side_effect = None
+        analytics.counter_buffer.flush()
+
+    def test_idle_buffer_is_flushed_after_interval(self):
+        analytics.update_counter('node:abc12', db=self.db)
+        # What the background thread does every interval
+        assert_equal(analytics.counter_buffer.flush_if_due(), 0)
+        with mock.patch('framework.analytics.time.time', return_value=2 ** 40):
+            assert_equal(analytics.counter_buffer.flush_if_due(), 1)
+        assert_equal(self.collection.find().count(), 1)
+
+    def test_flusher_thread_started_once(self):
+        buffer = analytics.CounterBuffer()
+        with mock.patch('framework.analytics.threading.Thread') as mock_thread:
+            mock_thread.return_value.is_alive.return_value = True
+            buffer._start_flusher()
+            buffer._start_flusher()
+        assert_equal(mock_thread.call_count, 1)
+        assert_true(mock_thread.return_value.daemon)
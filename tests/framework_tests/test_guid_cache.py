@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the GUID cache in framework/guid/cache.py"""
+
+import mock
+from nose.tools import *  # flake8: noqa  (PEP8 asserts)
+
+from framework.guid import cache
+from framework.guid.cache import guid_cache
+
+from tests.base import OsfTestCase
+from tests.factories import CommentFactory, NodeFactory
+
+from website import settings
+from website.models import Guid
+
+
+class TestGuidCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestGuidCache, self).setUp()
+        settings.GUID_CACHE_SIZE = 10
+        self.node = NodeFactory()
+        guid_cache.clear()
+        self.store = Guid._storage[0].store
+
+    def tearDown(self):
+        super(TestGuidCache, self).tearDown()
+        settings.GUID_CACHE_SIZE = 0
+        guid_cache.clear()
+
+    def test_second_lookup_skips_database(self):
+        guid_cache.get_referent_key(self.node._id)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            referent_key = guid_cache.get_referent_key(self.node._id)
+        assert_false(mock_fetch.called)
+        assert_equal(referent_key, (self.node._id, 'node'))
+        assert_equal(cache.load_referent(referent_key), self.node)
+
+    def test_missing_guid_is_cached(self):
+        assert_is_none(guid_cache.get_referent_key('nope1'))
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            assert_is_none(guid_cache.get_referent_key('nope1'))
+        assert_false(mock_fetch.called)
+
+    def test_missing_guid_expires(self):
+        guid_cache.get_referent_key('nope1')
+        self.store.insert({'_id': 'nope1', 'referent': [self.node._id, 'node']})
+        with mock.patch('framework.guid.cache.time.time', return_value=2 ** 40):
+            assert_equal(guid_cache.get_referent_key('nope1'), (self.node._id, 'node'))
+
+    def test_save_evicts(self):
+        guid_cache.get_referent_key(self.node._id)
+        guid = Guid.load(self.node._id)
+        guid.referent = None
+        guid.save()
+        assert_equal(guid_cache.get_referent_key(self.node._id), (None, None))
+
+    def test_deep_url_is_kept_until_save(self):
+        guid_cache.get_referent_key(self.node._id)
+        guid_cache.set_deep_url(self.node._id, self.node.deep_url)
+        assert_equal(guid_cache.get_deep_url(self.node._id), self.node.deep_url)
+        Guid.load(self.node._id).save()
+        assert_is_none(guid_cache.get_deep_url(self.node._id))
+
+    def test_size_is_bounded(self):
+        settings.GUID_CACHE_SIZE = 1
+        other = NodeFactory()
+        guid_cache.get_referent_key(self.node._id)
+        guid_cache.get_referent_key(other._id)
+        assert_equal(guid_cache.to_dict()['size'], 1)
+
+    def test_missing_guids_do_not_evict_existing(self):
+        settings.GUID_CACHE_SIZE = 1
+        guid_cache.get_referent_key(self.node._id)
+        with mock.patch.object(settings, 'GUID_CACHE_MISS_SIZE', 2):
+            for guid_id in ('nope1', 'nope2', 'nope3'):
+                assert_is_none(guid_cache.get_referent_key(guid_id))
+        stats = guid_cache.to_dict()
+        assert_equal(stats['size'], 1)
+        assert_equal(stats['missing'], 2)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            guid_cache.get_referent_key(self.node._id)
+        assert_false(mock_fetch.called)
+
+    def test_warm_from_hot_guids(self):
+        guid_cache.get_referent_key(self.node._id)
+        guid_cache.get_referent_key(self.node._id)
+        cache.save_hot()
+        guid_cache.clear()
+        assert_equal(cache.warm(), 1)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            guid_cache.get_referent_key(self.node._id)
+        assert_false(mock_fetch.called)
+
+    @mock.patch('framework.guid.cache._started', [])
+    @mock.patch('framework.guid.cache.atexit.register')
+    @mock.patch('framework.guid.cache.warm')
+    def test_started_once_by_requests(self, mock_warm, mock_register):
+        cache.guid_cache_before_request()
+        cache.guid_cache_before_request()
+        assert_equal(mock_warm.call_count, 1)
+        mock_register.assert_called_once_with(cache._save_hot_logging_errors)
+
+
+class TestResolveGuidCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestResolveGuidCache, self).setUp()
+        settings.GUID_CACHE_SIZE = 10
+        self.node = NodeFactory(is_public=True)
+        guid_cache.clear()
+
+    def tearDown(self):
+        super(TestResolveGuidCache, self).tearDown()
+        settings.GUID_CACHE_SIZE = 0
+        guid_cache.clear()
+
+    def test_hot_guid_skips_database(self):
+        url = '/{0}/'.format(self.node._id)
+        self.app.get(url)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            res = self.app.get(url)
+        assert_equal(res.status_code, 200)
+        assert_false(mock_fetch.called)
+
+    def test_hot_guid_skips_loading_referent(self):
+        url = '/{0}/'.format(self.node._id)
+        self.app.get(url)
+        with mock.patch('website.views.load_referent') as mock_load:
+            res = self.app.get(url)
+        assert_equal(res.status_code, 200)
+        assert_false(mock_load.called)
+
+    def test_missing_guid_is_not_found(self):
+        self.app.get('/nope1/', expect_errors=True)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            res = self.app.get('/nope1/', expect_errors=True)
+        assert_equal(res.status_code, 404)
+        assert_false(mock_fetch.called)
+
+    def test_resolve_target(self):
+        comment = CommentFactory(node=self.node, user=self.node.creator)
+        url = self.node.api_url_for('list_comments', target=comment._id)
+        self.app.get(url, auth=self.node.creator.auth)
+        with mock.patch.object(guid_cache, '_fetch') as mock_fetch:
+            res = self.app.get(url, auth=self.node.creator.auth)
+        assert_false(mock_fetch.called)
+        assert_equal(len(res.json['comments']), 0)
+
+    def test_resolve_missing_target(self):
+        url = self.node.api_url_for('list_comments', target='nope1')
+        res = self.app.get(url, auth=self.node.creator.auth, expect_errors=True)
+        assert_equal(res.status_code, 400)
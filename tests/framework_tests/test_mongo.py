@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the pooled MongoDB client in framework/mongo/handlers.py"""
+
+import unittest
+
+import mock
+from nose.tools import *  # flake8: noqa  (PEP8 asserts)
+from pymongo.errors import AutoReconnect
+
+from framework.mongo import handlers
+
+from website import settings
+
+
+class TestPooledClient(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPooledClient, self).setUp()
+        self._original_db_pool = settings.DB_POOL
+        settings.DB_POOL = True
+        handlers.pool_stats.reset()
+        self.client = mock.Mock()
+
+    def tearDown(self):
+        super(TestPooledClient, self).tearDown()
+        handlers.release_request(self.client)
+        settings.DB_POOL = self._original_db_pool
+
+    def test_pin_and_unpin(self):
+        handlers.pin_request(self.client)
+        self.client.start_request.assert_called_once_with()
+        handlers.unpin_request(self.client)
+        self.client.end_request.assert_called_once_with()
+        stats = handlers.pool_stats.to_dict()
+        assert_equal(stats['checkouts'], 1)
+        assert_equal(stats['checkins'], 1)
+        assert_equal(stats['in_use'], 0)
+
+    def test_nested_pins_share_socket(self):
+        handlers.pin_request(self.client)
+        handlers.pin_request(self.client)
+        handlers.unpin_request(self.client)
+        assert_false(self.client.end_request.called)
+        handlers.unpin_request(self.client)
+        assert_equal(self.client.start_request.call_count, 1)
+        assert_equal(self.client.end_request.call_count, 1)
+
+    def test_unpin_without_pin_is_noop(self):
+        handlers.unpin_request(self.client)
+        assert_false(self.client.end_request.called)
+        assert_equal(handlers.pool_stats.checkins, 0)
+
+    def test_release_request(self):
+        handlers.pin_request(self.client)
+        handlers.pin_request(self.client)
+        handlers.release_request(self.client)
+        assert_equal(self.client.end_request.call_count, 1)
+        assert_equal(handlers.pool_stats.in_use, 0)
+
+    def test_no_pin_without_pool(self):
+        settings.DB_POOL = False
+        handlers.pin_request(self.client)
+        assert_false(self.client.start_request.called)
+
+    def test_health_check_resets_pool_on_failure(self):
+        self.client.admin.command.side_effect = AutoReconnect('timed out')
+        assert_false(handlers.check_pool_health(self.client, force=True))
+        self.client.disconnect.assert_called_once_with()
+        stats = handlers.pool_stats.to_dict()
+        assert_equal(stats['health_check_failures'], 1)
+        assert_equal(stats['timeouts'], 1)
+        assert_equal(stats['resets'], 1)
+
+    def test_health_check_is_throttled(self):
+        assert_true(handlers.check_pool_health(self.client, force=True))
+        assert_true(handlers.check_pool_health(self.client))
+        assert_equal(self.client.admin.command.call_count, 1)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for framework/mongo/utils.py, partial saves of stored objects
+and bulk loading and inserting"""
+
+import unittest
+
+import mock
+from nose.tools import *  # flake8: noqa  (PEP8 asserts)
+
+from framework.auth import Auth
+from modularodm.storage.base import KeyExistsException
+
+from framework.mongo.utils import (
+    get_partial_update, get_unused_keys, insert_many, load_many, prefetch
+)
+
+from tests.base import OsfTestCase
+from tests.factories import NodeFactory, ProjectFactory, UserFactory
+
+from website.models import Node, Pointer, User
+
+
+class TestGetPartialUpdate(unittest.TestCase):
+
+    def test_unchanged(self):
+        doc = {'_id': 'abc12', 'title': 'Ham', 'tags': ['a']}
+        assert_equal(get_partial_update(doc, dict(doc)), {})
+
+    def test_set_changed_field(self):
+        assert_equal(
+            get_partial_update({'title': 'Ham', 'is_public': False}, {'title': 'Eggs', 'is_public': False}),
+            {'$set': {'title': 'Eggs'}},
+        )
+
+    def test_push_appended_items(self):
+        assert_equal(
+            get_partial_update({'logs': ['a', 'b']}, {'logs': ['a', 'b', 'c', 'd']}),
+            {'$push': {'logs': {'$each': ['c', 'd']}}},
+        )
+
+    def test_pull_removed_items(self):
+        assert_equal(
+            get_partial_update({'logs': ['a', 'b', 'c']}, {'logs': ['a', 'c']}),
+            {'$pull': {'logs': {'$in': ['b']}}},
+        )
+
+    def test_set_reordered_list(self):
+        assert_equal(
+            get_partial_update({'contributors': ['a', 'b']}, {'contributors': ['b', 'a']}),
+            {'$set': {'contributors': ['b', 'a']}},
+        )
+
+    def test_nested_dict(self):
+        old = {'permissions': {'abc12': ['read'], 'def34': ['read', 'write']}}
+        new = {'permissions': {'abc12': ['read', 'write'], 'ghi56': ['read']}}
+        assert_equal(
+            get_partial_update(old, new),
+            {
+                '$push': {'permissions.abc12': {'$each': ['write']}},
+                '$set': {'permissions.ghi56': ['read']},
+                '$unset': {'permissions.def34': True},
+            },
+        )
+
+    def test_dict_with_unsafe_keys_is_replaced(self):
+        assert_equal(
+            get_partial_update({'data': {'a.b': 1}}, {'data': {'a.b': 2}}),
+            {'$set': {'data': {'a.b': 2}}},
+        )
+
+    def test_new_field(self):
+        assert_equal(get_partial_update({}, {'title': 'Ham'}), {'$set': {'title': 'Ham'}})
+
+
+class TestPartialSave(OsfTestCase):
+
+    def setUp(self):
+        super(TestPartialSave, self).setUp()
+        self.project = ProjectFactory()
+        self.collection = Node._storage[0].store
+
+    def test_save_writes_only_changes(self):
+        self.project.title = 'Changed'
+        with mock.patch.object(self.collection, 'update', wraps=self.collection.update) as mock_update:
+            self.project.save()
+        mock_update.assert_called_once_with(
+            {'_id': self.project._id},
+            {'$set': {'title': 'Changed'}},
+            upsert=False,
+            multi=False,
+        )
+        assert_equal(self.collection.find_one({'_id': self.project._id})['title'], 'Changed')
+
+    def test_save_appends_contributor(self):
+        user = UserFactory()
+        self.project.add_contributor(user, auth=Auth(self.project.creator), save=True)
+        stored = self.collection.find_one({'_id': self.project._id})
+        assert_equal(stored['contributors'], [self.project.creator._id, user._id])
+        assert_equal(stored['permissions'][user._id], self.project.permissions[user._id])
+
+    def test_save_keeps_every_backref(self):
+        user = UserFactory()
+        other = ProjectFactory()
+        for project in (self.project, other):
+            project.add_contributor(user, auth=Auth(project.creator), save=True)
+        User._clear_caches()
+        Node._clear_caches()
+        user = User.load(user._id)
+        assert_equal(
+            set(user.node__contributed._to_primary_keys()),
+            set([self.project._id, other._id]),
+        )
+
+    def test_forced_save_writes_whole_document(self):
+        with mock.patch.object(self.collection, 'update', wraps=self.collection.update) as mock_update:
+            self.project.save(force=True)
+        update = mock_update.call_args[0][1]
+        assert_equal(update['$set']['title'], self.project.title)
+        assert_in('contributors', update['$set'])
+
+    def test_save_keeps_concurrent_appends(self):
+        self.collection.update({'_id': self.project._id}, {'$push': {'system_tags': 'other'}})
+        self.project.system_tags.append('mine')
+        self.project.save()
+        stored = self.collection.find_one({'_id': self.project._id})
+        assert_equal(stored['system_tags'], ['other', 'mine'])
+
+
+class TestBulkLoading(OsfTestCase):
+
+    def setUp(self):
+        super(TestBulkLoading, self).setUp()
+        self.project = ProjectFactory()
+        self.contributors = [UserFactory() for _ in range(3)]
+        for user in self.contributors:
+            self.project.add_contributor(user, auth=Auth(self.project.creator))
+        self.component = NodeFactory(parent=self.project, creator=self.contributors[0])
+        self.project.save()
+        self.user_ids = [user._id for user in self.contributors]
+        Node._clear_caches()
+        User._clear_caches()
+
+    def test_load_many_keeps_order(self):
+        keys = list(reversed(self.user_ids))
+        assert_equal([user._id for user in load_many(User, keys)], keys)
+
+    def test_load_many_missing_key(self):
+        assert_equal(load_many(User, [self.user_ids[0], 'nope'])[1], None)
+
+    def test_load_many_single_query(self):
+        with mock.patch.object(User, 'find', wraps=User.find) as mock_find:
+            load_many(User, self.user_ids)
+            load_many(User, self.user_ids)
+        assert_equal(mock_find.call_count, 1)
+
+    def test_prefetch_contributors(self):
+        project = Node.load(self.project._id)
+        prefetch([project], 'contributors')
+        with mock.patch.object(User._storage[0], 'get') as mock_get:
+            ids = [user._id for user in project.contributors]
+        assert_false(mock_get.called)
+        assert_equal(ids, [self.project.creator._id] + self.user_ids)
+
+    def test_prefetch_nested_path(self):
+        project = Node.load(self.project._id)
+        prefetch([project], 'nodes.contributors')
+        with mock.patch.object(Node._storage[0], 'get') as mock_node_get:
+            with mock.patch.object(User._storage[0], 'get') as mock_user_get:
+                child = project.nodes[0]
+                creator_id = child.contributors[0]._id
+        assert_false(mock_node_get.called)
+        assert_false(mock_user_get.called)
+        assert_equal(creator_id, self.contributors[0]._id)
+
+    def test_prefetch_backref(self):
+        user = User.load(self.user_ids[0])
+        prefetch([user], 'node__contributed')
+        assert_is_not_none(Node._load_from_cache(self.project._id))
+        assert_is_not_none(Node._load_from_cache(self.component._id))
+
+    def test_prefetch_skips_unknown_path(self):
+        assert_equal(prefetch([self.project, None], 'nope'), [self.project])
+
+
+class TestBulkInsert(OsfTestCase):
+
+    def setUp(self):
+        super(TestBulkInsert, self).setUp()
+        self.project = ProjectFactory()
+
+    def test_insert_many(self):
+        pointers = [Pointer(_id='abc1{0}'.format(i), node=self.project) for i in range(2)]
+        with mock.patch.object(Pointer, 'save') as mock_save:
+            insert_many(pointers)
+        assert_false(mock_save.called)
+        for pointer in pointers:
+            assert_true(pointer._is_loaded)
+            assert_is(Pointer.load(pointer._id), pointer)
+            assert_true(Pointer._storage[0].store.find_one({'_id': pointer._id}))
+
+    def test_insert_many_adds_backrefs(self):
+        pointer = Pointer(_id='abc12', node=self.project)
+        insert_many([pointer])
+        stored = Node._storage[0].store.find_one({'_id': self.project._id})
+        assert_equal(stored['__backrefs']['_pointed']['pointer']['node'], ['abc12'])
+        assert_equal(list(self.project.pointed), [pointer])
+        # The backref is not lost when the project is saved again
+        self.project.title = 'Changed'
+        self.project.save()
+        stored = Node._storage[0].store.find_one({'_id': self.project._id})
+        assert_equal(stored['__backrefs']['_pointed']['pointer']['node'], ['abc12'])
+
+    def test_insert_many_duplicate_key(self):
+        Pointer(_id='abc12', node=self.project).save()
+        with assert_raises(KeyExistsException):
+            insert_many([Pointer(_id='abc12', node=self.project)])
+
+    def test_get_unused_keys(self):
+        Pointer(_id='taken', node=self.project).save()
+        candidates = iter(['taken', 'free1', 'free1', 'free2'])
+        keys = get_unused_keys(lambda: next(candidates), 2, Pointer)
+        assert_equal(sorted(keys), ['free1', 'free2'])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the object cache in framework/mongo/cache.py"""
+
+import unittest
+
+import mock
+from nose.tools import *  # flake8: noqa  (PEP8 asserts)
+
+from framework.mongo import cache
+
+from tests.base import OsfTestCase
+from tests.factories import UserFactory
+
+from website.models import Node, NodeLog, User
+
+
+class TestObjectCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestObjectCache, self).setUp()
+        self.user = UserFactory()
+        cache.clear()
+        User._clear_caches()
+        self.storage = User._storage[0]
+
+    def tearDown(self):
+        super(TestObjectCache, self).tearDown()
+        cache.clear()
+
+    def load_uncached(self, key):
+        # Drop the per-request identity map, as at the end of a request
+        User._clear_caches()
+        return User.load(key)
+
+    def test_second_load_skips_database(self):
+        self.load_uncached(self.user._id)
+        with mock.patch.object(self.storage, 'get') as mock_get:
+            user = self.load_uncached(self.user._id)
+        assert_false(mock_get.called)
+        assert_equal(user.fullname, self.user.fullname)
+        stats = cache.get_stats()['user']
+        assert_equal(stats['hits'], 1)
+        assert_equal(stats['misses'], 1)
+        assert_equal(stats['hit_rate'], 0.5)
+
+    def test_cached_data_is_copied(self):
+        self.load_uncached(self.user._id).emails.append('fake@example.com')
+        assert_not_in('fake@example.com', self.load_uncached(self.user._id).emails)
+
+    def test_save_invalidates(self):
+        user = self.load_uncached(self.user._id)
+        user.fullname = 'Changed Name'
+        user.save()
+        assert_equal(self.load_uncached(self.user._id).fullname, 'Changed Name')
+        assert_equal(cache.get_stats()['user']['invalidations'], 1)
+
+    def test_remove_invalidates(self):
+        self.load_uncached(self.user._id)
+        User.remove_one(self.user)
+        assert_is_none(self.load_uncached(self.user._id))
+
+    def test_version_change_invalidates(self):
+        self.load_uncached(self.user._id)
+        # A save in another process replaces the version token
+        cache.get_cache(User)._new_version(self.user._id)
+        with mock.patch.object(self.storage, 'get', wraps=self.storage.get) as mock_get:
+            self.load_uncached(self.user._id)
+        assert_true(mock_get.called)
+
+    def test_entries_expire(self):
+        self.load_uncached(self.user._id)
+        with mock.patch('framework.mongo.cache.time.time', return_value=2 ** 40):
+            with mock.patch.object(self.storage, 'get', wraps=self.storage.get) as mock_get:
+                self.load_uncached(self.user._id)
+        assert_true(mock_get.called)
+
+    def test_models_opt_in(self):
+        assert_is_not_none(cache.get_cache(Node))
+        assert_is_none(cache.get_cache(NodeLog))
+
+    @mock.patch('framework.mongo.cache.settings.OBJECT_CACHE_ENABLED', False)
+    def test_disabled(self):
+        assert_is_none(cache.get_cache(User))
+
+    @mock.patch('framework.mongo.cache.settings.OBJECT_CACHE_ENABLED', None)
+    def test_disabled_by_default_without_shared_backend(self):
+        with mock.patch('framework.mongo.cache.settings.OBJECT_CACHE_BACKEND', None):
+            assert_false(cache.is_enabled())
+        with mock.patch('framework.mongo.cache.settings.OBJECT_CACHE_BACKEND', 'pylibmc.Client'):
+            assert_true(cache.is_enabled())
+
+    def test_requests_that_write_skip_cache(self):
+        self.load_uncached(self.user._id)
+        with self.app.app.test_request_context(method='POST'):
+            with mock.patch.object(self.storage, 'get', wraps=self.storage.get) as mock_get:
+                self.load_uncached(self.user._id)
+        assert_true(mock_get.called)
+
+    def test_tasks_skip_cache(self):
+        self.load_uncached(self.user._id)
+        self.context.pop()
+        try:
+            with mock.patch.object(self.storage, 'get', wraps=self.storage.get) as mock_get:
+                self.load_uncached(self.user._id)
+        finally:
+            self.context.push()
+        assert_true(mock_get.called)
+
+    def test_invalidate(self):
+        self.load_uncached(self.user._id)
+        self.storage.store.update({'_id': self.user._id}, {'$set': {'fullname': 'Changed Name'}})
+        cache.invalidate(User, [self.user._id])
+        assert_equal(self.load_uncached(self.user._id).fullname, 'Changed Name')
+
+
+class TestLocalBackend(unittest.TestCase):
+
+    def test_size_is_bounded(self):
+        backend = cache.LocalBackend(size=2)
+        for key in ('a', 'b', 'c'):
+            backend.set(key, key)
+        assert_is_none(backend.get('a'))
+        assert_equal(backend.get('c'), 'c')
@@ -1,6 +1,10 @@
+import datetime
+
+import mock
 from nose.tools import *
 
 from framework.sessions import utils
+from framework.sessions.model import session_cache
 from tests import factories
 from tests.base import DbTestCase
 from website.models import User
@@ -34,3 +38,74 @@ class SessionUtilsTestCase(DbTestCase):
 
         utils.remove_sessions_for_user(self.user)
         assert_equal(1, Session.find().count())
+
+    def test_remove_session_for_user_evicts_cached_session(self):
+        session = factories.SessionFactory(user=self.user)
+        assert_is_not_none(session_cache.get(session._id))
+        utils.remove_sessions_for_user(self.user)
+        assert_is_none(session_cache.get(session._id))
+
+
+class TestSessionWrites(DbTestCase):
+
+    def setUp(self):
+        super(TestSessionWrites, self).setUp()
+        session_cache.clear()
+        self.session = Session(data={'auth_user_id': 'abc12'})
+        self.session.save()
+
+    def tearDown(self):
+        super(TestSessionWrites, self).tearDown()
+        session_cache.clear()
+        Session.remove()
+
+    def test_new_session_is_dirty(self):
+        assert_true(Session().is_dirty)
+
+    def test_unchanged_session_is_not_saved(self):
+        date_modified = self.session.date_modified
+        with mock.patch.object(Session, 'save') as mock_save:
+            assert_false(self.session.save_if_changed())
+        assert_false(mock_save.called)
+        assert_equal(self.session.date_modified, date_modified)
+
+    def test_changed_session_is_saved(self):
+        self.session.data['auth_user_username'] = 'fred@example.com'
+        assert_true(self.session.is_dirty)
+        assert_true(self.session.save_if_changed())
+        assert_false(self.session.is_dirty)
+        Session._clear_caches()
+        session_cache.clear()
+        stored = Session.load(self.session._id)
+        assert_equal(stored.data['auth_user_username'], 'fred@example.com')
+
+    def test_removed_key_is_saved(self):
+        del self.session.data['auth_user_id']
+        assert_true(self.session.save_if_changed())
+
+    def test_stale_session_is_refreshed(self):
+        self.session.date_modified = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        assert_true(self.session.save_if_changed())
+        age = datetime.datetime.utcnow() - self.session.date_modified
+        assert_less(age, datetime.timedelta(minutes=1))
+
+    def test_load_cached_skips_database(self):
+        Session._clear_caches()
+        with mock.patch.object(Session._storage[0], 'get') as mock_get:
+            session = Session.load_cached(self.session._id)
+        assert_false(mock_get.called)
+        assert_equal(session.data, {'auth_user_id': 'abc12'})
+
+    def test_load_cached_reads_database_after_ttl(self):
+        Session._clear_caches()
+        with mock.patch('framework.sessions.model.time.time', return_value=2 ** 40):
+            assert_is_none(session_cache.get(self.session._id))
+            session = Session.load_cached(self.session._id)
+        assert_equal(session._id, self.session._id)
+
+    @mock.patch('framework.sessions.model.settings.SESSION_CACHE_SIZE', 1)
+    def test_cache_evicts_least_recently_used(self):
+        other = Session()
+        other.save()
+        assert_is_none(session_cache.get(self.session._id))
+        assert_is_not_none(session_cache.get(other._id))
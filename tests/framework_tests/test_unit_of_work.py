@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for framework/mongo/unit_of_work.py"""
+
+import mock
+from nose.tools import *  # flake8: noqa  (PEP8 asserts)
+
+from framework.auth import Auth
+from framework.exceptions import HTTPError
+from framework.mongo.unit_of_work import UnitOfWork, get_active_unit, unit_of_work
+
+from tests.base import OsfTestCase
+from tests.factories import NodeFactory, ProjectFactory, UserFactory
+
+from website.models import Node
+
+
+class TestUnitOfWork(OsfTestCase):
+
+    def setUp(self):
+        super(TestUnitOfWork, self).setUp()
+        self.project = ProjectFactory()
+        self.auth = Auth(self.project.creator)
+
+    def get_stored_title(self):
+        return Node._storage[0].store.find_one({'_id': self.project._id})['title']
+
+    def test_saves_are_deferred_and_collapsed(self):
+        with mock.patch.object(Node, 'update_one', wraps=Node.update_one) as mock_update:
+            with UnitOfWork() as unit:
+                for title in ('one', 'two', 'three'):
+                    self.project.title = title
+                    self.project.save()
+                assert_not_equal(self.get_stored_title(), 'three')
+                assert_false(mock_update.called)
+            assert_equal(mock_update.call_count, 1)
+        assert_equal(unit.deferred, 1)
+        assert_equal(unit.collapsed, 2)
+        assert_equal(self.get_stored_title(), 'three')
+
+    def test_new_objects_are_inserted_immediately(self):
+        with UnitOfWork():
+            component = NodeFactory(parent=self.project)
+            assert_is_not_none(Node._storage[0].store.find_one({'_id': component._id}))
+        stored = Node._storage[0].store.find_one({'_id': self.project._id})
+        assert_in(component._id, stored['nodes'])
+
+    def test_save_hooks_run_on_flush(self):
+        user = UserFactory()
+        with UnitOfWork():
+            self.project.add_contributor(user, auth=self.auth, save=True)
+            self.project.save()
+            assert_equal(self.project.creator.n_projects_in_common(user), 0)
+        assert_equal(self.project.creator.n_projects_in_common(user), 1)
+        stored = Node._storage[0].store.find_one({'_id': self.project._id})
+        assert_in(user._id, stored['contributors'])
+
+    def test_positional_force_is_kept(self):
+        with UnitOfWork() as unit:
+            self.project.save(True)
+            self.project.save()
+            assert_equal(unit._pending.values(), [(self.project, True)])
+
+    def test_error_discards_pending_saves(self):
+        original = self.project.title
+        with assert_raises(ValueError):
+            with UnitOfWork():
+                self.project.title = 'changed'
+                self.project.save()
+                raise ValueError
+        assert_equal(self.get_stored_title(), original)
+
+    def test_client_error_flushes(self):
+        with assert_raises(HTTPError):
+            with UnitOfWork():
+                self.project.title = 'changed'
+                self.project.save()
+                raise HTTPError(400)
+        assert_equal(self.get_stored_title(), 'changed')
+
+    def test_nested_units_join(self):
+        with UnitOfWork() as outer:
+            with UnitOfWork() as inner:
+                assert_is(inner, outer)
+                self.project.title = 'changed'
+                self.project.save()
+            assert_not_equal(self.get_stored_title(), 'changed')
+        assert_equal(self.get_stored_title(), 'changed')
+        assert_is_none(get_active_unit())
+
+    def test_decorator(self):
+        @unit_of_work
+        def rename(node):
+            assert_is_not_none(get_active_unit())
+            node.title = 'changed'
+            node.save()
+        rename(self.project)
+        assert_is_none(get_active_unit())
+        assert_equal(self.get_stored_title(), 'changed')
@@ -9,12 +9,14 @@ import webtest
 import furl
 import itsdangerous
 from modularodm import storage
+from pymongo.errors import OperationFailure
 
 from framework.auth import signing
 from framework.auth.core import Auth
 from framework.exceptions import HTTPError
 from framework.sessions.model import Session
 from framework.mongo import set_up_storage
+from framework.transactions import commands, messages
 
 from website import settings
 from website.util import api_url_for, rubeus
@@ -287,6 +289,42 @@ class TestAddonLogs(OsfTestCase):
         self.node.reload()
         assert_equal(len(self.node.logs), nlogs)
 
+    @mock.patch('website.mails.send_mail')
+    @mock.patch('framework.transactions.context.time.sleep')
+    def test_move_mail_sent_once_after_lock_conflict(self, mock_sleep, mock_send_mail):
+        bundle = {
+            'provider': 'github',
+            'materialized': '/pizza',
+            'name': 'pizza',
+            'nid': self.node._id,
+            'path': '/pizza',
+        }
+        url = self.node.api_url_for('create_waterbutler_log')
+        payload = self.build_payload(
+            metadata=None,
+            action='move',
+            source=dict(bundle),
+            destination=dict(bundle),
+            email=True,
+        )
+        commit = commands.commit
+        calls = []
+
+        def conflict_once(database):
+            calls.append(True)
+            if len(calls) == 1:
+                raise OperationFailure(messages.LOCK_ERROR)
+            return commit(database)
+
+        nlogs = len(self.node.logs)
+        with mock.patch('framework.transactions.commands.commit', conflict_once):
+            self.test_app.put_json(url, payload, headers={'Content-Type': 'application/json'})
+
+        assert_equal(len(calls), 2)
+        assert_equal(mock_send_mail.call_count, 1)
+        self.node.reload()
+        assert_equal(len(self.node.logs), nlogs + 1)
+
 
 class TestCheckAuth(OsfTestCase):
 
@@ -447,17 +447,13 @@ class TestArchiverListeners(ArchiverTestCase):
         mock_chain.assert_called_with(archive_signature)
 
     @mock.patch('celery.chain')
-    def test_after_register_archive_runs_only_for_root(self, mock_chain):
+    def test_after_register_archives_whole_tree(self, mock_chain):
         proj = factories.ProjectFactory()
         c1 = factories.ProjectFactory(parent=proj)
         c2 = factories.ProjectFactory(parent=c1)
         reg = factories.RegistrationFactory(project=proj)
         rc1 = reg.nodes[0]
         rc2 = rc1.nodes[0]
-        listeners.after_register(c1, rc1, self.user)
-        mock_chain.assert_not_called()
-        listeners.after_register(c2, rc2, self.user)
-        mock_chain.assert_not_called()
         listeners.after_register(proj, reg, self.user)
         archive_sigs = [archive.si(**kwargs) for kwargs in [dict(job_pk=n.archive_job._id,) for n in [reg, rc1, rc2]]]
         mock_chain.assert_called_with(*archive_sigs)
@@ -470,7 +466,6 @@ class TestArchiverListeners(ArchiverTestCase):
         reg = factories.RegistrationFactory(project=proj)
         r1 = reg.nodes[0]
         proj.add_pointer(other, auth=Auth(self.user))
-        listeners.after_register(c1, r1, self.user)
         listeners.after_register(proj, reg, self.user)
 
         archive_sigs = [archive.si(**kwargs) for kwargs in [dict(job_pk=n.archive_job._id,) for n in [reg, r1]]]
@@ -10,7 +10,7 @@ from website import settings
 import website.search.search as search
 from website.search import elastic_search
 from website.search.util import build_query
-from website.search_migration.migrate import migrate
+from website.search_migration.migrate import migrate, get_checkpoint, save_checkpoint
 
 from tests.base import OsfTestCase
 from tests.test_features import requires_search
@@ -539,6 +539,23 @@ class TestAddContributor(SearchTestCase):
         contribs = search.search_contributor(self.name4.split(' ')[0][:-1])
         assert_equal(len(contribs['users']), 0)
 
+    def test_search_does_not_load_users(self):
+        with mock.patch('website.search.elastic_search.User.load') as mock_load:
+            contribs = search.search_contributor(self.name1)
+        assert_false(mock_load.called)
+        contrib = contribs['users'][0]
+        assert_equal(contrib['id'], self.user._id)
+        assert_equal(contrib['profile_url'], self.user.profile_url)
+        assert_true(contrib['gravatar_url'])
+        assert_true(contrib['registered'])
+        assert_true(contrib['active'])
+
+    def test_search_projects_in_common(self):
+        project = ProjectFactory(creator=self.user3)
+        project.add_contributor(self.user, auth=Auth(self.user3), save=True)
+        contribs = search.search_contributor(self.name1, current_user=self.user3)
+        assert_equal(contribs['users'][0]['n_projects_in_common'], 1)
+
 @requires_search
 class TestProjectSearchResults(SearchTestCase):
     def setUp(self):
@@ -592,6 +609,75 @@ class TestProjectSearchResults(SearchTestCase):
         assert_equal(len(results), 3)
 
 
+@requires_search
+class TestSearchRoundTrips(SearchTestCase):
+
+    def setUp(self):
+        super(TestSearchRoundTrips, self).setUp()
+        self.user = UserFactory(fullname='Ziggy Stardust')
+        self.project = ProjectFactory(title='Spiders From Mars', creator=self.user, is_public=True)
+        self.project.add_tag('glam', Auth(self.user), save=True)
+        self.component = NodeFactory(
+            title='Spiders From Mars component',
+            creator=self.user,
+            project=self.project,
+            is_public=True,
+        )
+
+    def test_search_is_one_request(self):
+        with mock.patch.object(elastic_search.es, 'search', wraps=elastic_search.es.search) as mock_search:
+            results = query('Spiders')
+        assert_equal(mock_search.call_count, 1)
+        assert_equal(results['counts']['total'], 2)
+        assert_in('glam', [tag['key'] for tag in results['tags']])
+
+    def test_doc_type_restricts_hits_not_counts(self):
+        results = search.search(build_query('Spiders'), index=elastic_search.INDEX, doc_type='component')
+        assert_equal(len(results['results']), 1)
+        assert_equal(results['counts']['project'], 1)
+        assert_equal(results['counts']['component'], 1)
+
+    def test_parents_are_loaded_in_bulk(self):
+        with mock.patch('website.search.elastic_search.Node.load') as mock_load:
+            results = query('Spiders')['results']
+        assert_false(mock_load.called)
+        component = [result for result in results if result['is_component']][0]
+        assert_equal(component['parent_title'], self.project.title)
+        assert_equal(component['parent_url'], self.project.url)
+
+
+@requires_search
+class TestBulkUpdate(SearchTestCase):
+
+    def setUp(self):
+        super(TestBulkUpdate, self).setUp()
+        self.project = ProjectFactory(title='Bulk Indexed', is_public=True)
+        self.user = self.project.creator
+        search.delete_index(elastic_search.INDEX)
+        search.create_index(elastic_search.INDEX)
+
+    def refresh(self):
+        elastic_search.es.indices.refresh(index=elastic_search.INDEX)
+
+    def test_bulk_update_indexes_nodes_and_users(self):
+        count = search.bulk_update(nodes=[self.project], users=[self.user])
+        assert_equal(count, 2)
+        self.refresh()
+        assert_equal(len(query(self.project.title)['results']), 1)
+        assert_equal(len(query_user(self.user.fullname)['results']), 1)
+
+    def test_bulk_update_deletes_private_nodes(self):
+        search.bulk_update(nodes=[self.project])
+        self.project.is_public = False
+        search.bulk_update(nodes=[self.project])
+        self.refresh()
+        assert_equal(len(query(self.project.title)['results']), 0)
+
+    def test_bulk_update_ignores_missing_documents(self):
+        self.project.is_public = False
+        assert_equal(search.bulk_update(nodes=[self.project]), 0)
+
+
 def job(**kwargs):
     keys = [
         'title',
@@ -745,3 +831,32 @@ class TestSearchMigration(SearchTestCase):
             var = self.es.indices.get_aliases()
             assert_equal(var[settings.ELASTIC_INDEX + '_v{}'.format(n + 1)]['aliases'].keys()[0], settings.ELASTIC_INDEX)
             assert not var.get(settings.ELASTIC_INDEX + '_v{}'.format(n))
+
+    def test_migration_indexes_documents(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, chunk_size=1)
+        self.es.indices.refresh(index=settings.ELASTIC_INDEX)
+        assert_equal(len(query(self.project.title)['results']), 1)
+        assert_equal(len(query_user(self.user.fullname)['results']), 1)
+
+    def test_migration_clears_checkpoint(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        assert_is_none(get_checkpoint(settings.ELASTIC_INDEX))
+
+    def test_migration_resumes_from_checkpoint(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app)
+        new_index = settings.ELASTIC_INDEX + '_v2'
+        search.create_index(index=new_index)
+        # Pretend every node was indexed before the migration was interrupted
+        save_checkpoint(
+            settings.ELASTIC_INDEX,
+            index=new_index,
+            started=self.project.date_modified,
+            node=self.project._id,
+        )
+        with mock.patch('website.search_migration.migrate.index_chunk') as mock_index_chunk:
+            mock_index_chunk.return_value = (self.user._id, 1)
+            migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, resume=True)
+        kinds = [call[0][0][0] for call in mock_index_chunk.call_args_list]
+        assert_equal(kinds, ['user'])
+        var = self.es.indices.get_aliases()
+        assert_equal(var[new_index]['aliases'].keys()[0], settings.ELASTIC_INDEX)
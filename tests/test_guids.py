@@ -8,10 +8,11 @@ from tests.factories import NodeFactory
 
 from modularodm import Q
 from modularodm import fields
+from modularodm.storage.base import KeyExistsException
 from modularodm.storage.mongostorage import MongoStorage
 
 from framework.mongo import database
-from framework.guid.model import GuidStoredObject
+from framework.guid.model import GuidStoredObject, GuidAllocator, ensure_guids
 
 from website import models
 
@@ -32,6 +33,123 @@ class TestGuidStoredObject(OsfTestCase):
         assert_equal(guids[0].referent, fake_guid)
         assert_equal(guids[0]._id, fake_guid._id)
 
+    def _fake_schema(self):
+        class FakeSchema(GuidStoredObject):
+            _id = fields.StringField()
+        FakeSchema.set_storage(MongoStorage(database, 'fakeschema'))
+        return FakeSchema
+
+    def test_ensure_guids(self):
+        FakeSchema = self._fake_schema()
+        fakes = [FakeSchema(), FakeSchema(_id='fake')]
+        ensure_guids(fakes)
+        assert_true(fakes[0]._id)
+        for fake in fakes:
+            guid = models.Guid.load(fake._id)
+            assert_equal(tuple(guid.to_storage()['referent']), (fake._id, 'fakeschema'))
+
+    @mock.patch('framework.guid.model.settings.GUID_BLOCK_SIZE', 0)
+    @mock.patch('framework.guid.model.guid_allocator', GuidAllocator())
+    @mock.patch('framework.guid.model.generate_guid')
+    def test_ensure_guids_skips_taken_ids(self, mock_generate):
+        models.BlacklistGuid(_id='bad12').save()
+        models.Guid(_id='old12').save()
+        mock_generate.side_effect = ['bad12', 'old12', 'ok123']
+        fake = self._fake_schema()()
+        ensure_guids([fake])
+        assert_equal(fake._id, 'ok123')
+
+    @mock.patch('framework.guid.model.insert_many')
+    def test_ensure_guids_raises_if_keyed_id_taken(self, mock_insert):
+        def insert_first(guids):
+            # Another process inserts the same GUID for another object
+            models.Guid._storage[0].store.insert({'_id': 'fake1', 'referent': ['fake1', 'node']})
+            raise KeyExistsException
+        mock_insert.side_effect = insert_first
+        fake = self._fake_schema()(_id='fake1')
+        with assert_raises(KeyExistsException):
+            ensure_guids([fake])
+        assert_equal(mock_insert.call_count, 1)
+
+    @mock.patch('framework.guid.model.guid_allocator.take')
+    def test_ensure_guid_single_insert(self, mock_take):
+        mock_take.return_value = ['abc23']
+        fake = self._fake_schema()()
+        with mock.patch.object(models.Guid, 'save', autospec=True) as mock_save:
+            fake._ensure_guid()
+        assert_equal(mock_save.call_count, 1)
+        guid = mock_save.call_args[0][0]
+        assert_equal(guid._id, 'abc23')
+        assert_equal(tuple(guid.to_storage()['referent']), ('abc23', 'fakeschema'))
+
+    @mock.patch('framework.guid.model.guid_allocator.take')
+    def test_ensure_guid_retries_taken_id(self, mock_take):
+        models.Guid(_id='old12').save()
+        mock_take.side_effect = [['old12'], ['new12']]
+        fake = self._fake_schema()()
+        fake.save()
+        assert_equal(fake._id, 'new12')
+        assert_equal(models.Guid.load('new12').referent, fake)
+
+    @mock.patch('framework.guid.model.guid_allocator.take')
+    def test_ensure_guids_retries_taken_ids(self, mock_take):
+        models.Guid(_id='old12').save()
+        mock_take.side_effect = [['new12', 'old12'], ['new34']]
+        FakeSchema = self._fake_schema()
+        fakes = [FakeSchema(), FakeSchema()]
+        ensure_guids(fakes)
+        assert_equal([fake._id for fake in fakes], ['new12', 'new34'])
+        for fake in fakes:
+            guid = models.Guid.load(fake._id)
+            assert_equal(tuple(guid.to_storage()['referent']), (fake._id, 'fakeschema'))
+
+
+@mock.patch('framework.guid.model.settings.GUID_BLOCK_SIZE', 0)
+class TestGuidAllocator(OsfTestCase):
+
+    def setUp(self):
+        super(TestGuidAllocator, self).setUp()
+        self.allocator = GuidAllocator()
+
+    @mock.patch('framework.guid.model.settings.GUID_BLOCK_SIZE', 5)
+    @mock.patch('framework.guid.model.settings.GUID_BLOCK_REFILL_AT', 2)
+    def test_take_from_block(self):
+        self.allocator.refill()
+        assert_equal(self.allocator.get_stats()['pooled'], 5)
+        with mock.patch.object(GuidAllocator, '_refill_in_background') as mock_refill:
+            ids = self.allocator.take(2)
+        assert_equal(len(set(ids)), 2)
+        assert_equal(self.allocator.get_stats()['pooled'], 3)
+        assert_true(mock_refill.called)
+
+    @mock.patch('framework.guid.model.generate_guid')
+    def test_block_skips_taken_ids(self, mock_generate):
+        models.BlacklistGuid(_id='bad12').save()
+        models.Guid(_id='old12').save()
+        mock_generate.side_effect = ['bad12', 'old12', 'ok123']
+        assert_equal(self.allocator.take(), ['ok123'])
+        stats = self.allocator.get_stats(keyspace=True)
+        assert_equal(stats['rejected'], 2)
+        assert_equal(stats['keyspace_used'], models.Guid.find().count() + 1)
+
+    def test_collision_rate(self):
+        self.allocator.take(3)
+        self.allocator.record_collision()
+        assert_equal(self.allocator.get_stats()['collision_rate'], 0.25)
+
+    def test_stats_skip_counts_by_default(self):
+        with mock.patch.object(models.Guid, 'find') as mock_find:
+            stats = self.allocator.get_stats()
+        assert_false(mock_find.called)
+        assert_not_in('keyspace_used', stats)
+
+    @mock.patch('framework.guid.model.settings.GUID_BLOCK_SIZE', 5)
+    def test_refill_logs_stats(self):
+        with mock.patch('framework.guid.model.logger.info') as mock_info:
+            self.allocator.refill()
+        assert_true(mock_info.called)
+        assert_in("'pooled': 5", mock_info.call_args[0][0])
+
 
 class TestResolveGuid(OsfTestCase):
 
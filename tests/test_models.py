@@ -32,8 +32,10 @@ from website.profile.utils import serialize_user
 from website.project.signals import contributor_added
 from website.project.model import (
     Comment, Node, NodeLog, Pointer, ensure_schemas, has_anonymous_link,
-    get_pointer_parent, Embargo,
+    get_pointer_parent, Embargo, get_logs_page, make_log_cursor, parse_log_cursor,
 )
+from website.project import cocontributors, forking
+from website.project.permissions import PermissionResolver, get_active_resolver
 from website.util.permissions import CREATOR_PERMISSIONS
 from website.util import web_url_for, api_url_for
 from website.addons.wiki.exceptions import (
@@ -762,6 +764,83 @@ class TestUser(OsfTestCase):
         assert_equal(self.user.n_projects_in_common(user2), 1)
         assert_equal(self.user.n_projects_in_common(user3), 0)
 
+    def test_n_projects_in_common_with(self):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        for _ in range(2):
+            project = ProjectFactory(creator=self.user)
+            project.add_contributor(contributor=user2, auth=self.consolidate_auth)
+            project.save()
+        ProjectFactory(creator=user3)
+
+        counts = self.user.n_projects_in_common_with([user2._id, user3._id])
+        assert_equal(counts, {user2._id: 2, user3._id: 0})
+        assert_equal(counts[user2._id], self.user.n_projects_in_common(user2))
+
+    def test_n_projects_in_common_after_remove_contributor(self):
+        user2 = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        project.add_contributor(contributor=user2, auth=self.consolidate_auth, save=True)
+        project.remove_contributor(user2, auth=self.consolidate_auth)
+        project.save()
+        assert_equal(self.user.n_projects_in_common(user2), 0)
+        assert_equal(user2.n_projects_in_common(self.user), 0)
+
+    def test_n_projects_in_common_after_merge(self):
+        user2 = UserFactory()
+        merged = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        project.add_contributor(contributor=merged, auth=self.consolidate_auth, save=True)
+        user2.merge_user(merged)
+        user2.save()
+        assert_equal(self.user.n_projects_in_common(user2), 1)
+        assert_equal(self.user.n_projects_in_common(merged), 0)
+
+    def test_top_cocontributors(self):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        for contributors in ([user2, user3], [user2]):
+            project = ProjectFactory(creator=self.user)
+            for contributor in contributors:
+                project.add_contributor(contributor=contributor, auth=self.consolidate_auth)
+            project.save()
+        assert_equal(
+            list(cocontributors.iter_top(self.user._id)),
+            [(user2._id, 2), (user3._id, 1)],
+        )
+        assert_equal(
+            list(cocontributors.iter_top(self.user._id, exclude=[user2._id])),
+            [(user3._id, 1)],
+        )
+
+    def test_cocontributor_counts_written_once_per_user(self):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        collection = cocontributors.get_collection()
+        with mock.patch.object(cocontributors, 'get_collection', return_value=mock.Mock(wraps=collection)) as mock_get:
+            project.add_contributors(
+                [
+                    {'user': user2, 'permissions': ['read'], 'visible': True},
+                    {'user': user3, 'permissions': ['read'], 'visible': True},
+                ],
+                auth=self.consolidate_auth,
+                save=True,
+            )
+        assert_equal(mock_get.return_value.update.call_count, 3)
+        assert_equal(
+            cocontributors.get_counts(self.user._id, [user2._id, user3._id]),
+            {user2._id: 1, user3._id: 1},
+        )
+
+    def test_cocontributor_counts_pruned_on_removal(self):
+        user2 = UserFactory()
+        project = ProjectFactory(creator=self.user)
+        project.add_contributor(contributor=user2, auth=self.consolidate_auth, save=True)
+        project.remove_contributor(user2, auth=self.consolidate_auth)
+        assert_equal(cocontributors.get_collection().find_one({'_id': self.user._id})['counts'], {})
+        assert_equal(list(cocontributors.iter_top(self.user._id)), [])
+
     def test_user_get_cookie(self):
         user = UserFactory()
         super_secret_key = 'children need maps'
@@ -1702,6 +1781,51 @@ class TestNodeTraversals(OsfTestCase):
         descendants = list(point1.get_descendants_recursive())
         assert_equal(len(descendants), 1)
 
+    def test_ancestry_of_new_project(self):
+        assert_equal(self.root.ancestor_ids, [])
+        assert_equal(self.root.root_id, self.root._id)
+
+    def test_ancestry_of_components(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        assert_equal(comp1.ancestor_ids, [self.root._id])
+        assert_equal(comp1a.ancestor_ids, [comp1._id, self.root._id])
+        assert_equal(comp1a.root_id, self.root._id)
+        assert_equal(comp1a.parents, [comp1, self.root])
+        assert_equal(comp1a.root, self.root)
+
+    def test_ancestry_of_fork(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        fork = self.root.fork_node(self.consolidate_auth)
+        forked_comp1a = fork.nodes[0].nodes[0]
+        assert_equal(fork.root_id, fork._id)
+        assert_equal(forked_comp1a.ancestor_ids, [fork.nodes[0]._id, fork._id])
+        # The originals are untouched
+        assert_equal(comp1a.ancestor_ids, [comp1._id, self.root._id])
+
+    def test_ancestry_of_component_fork(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        fork = comp1.fork_node(self.consolidate_auth)
+        assert_equal(fork.ancestor_ids, [])
+        assert_equal(fork.root_id, fork._id)
+
+    def test_ancestry_reset_when_removed_from_parent(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        self.root.nodes.remove(comp1)
+        self.root.save()
+        assert_equal(comp1.ancestor_ids, [])
+        assert_equal(comp1.root_id, comp1._id)
+        assert_equal(comp1a.ancestor_ids, [comp1._id])
+        assert_equal(comp1a.root_id, comp1._id)
+
+    def test_parents_falls_back_to_backrefs_when_not_backfilled(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1.root_id = None
+        assert_equal(comp1.parents, [self.root])
+        assert_equal(comp1.root, self.root)
+
 class TestRemoveNode(OsfTestCase):
 
     def setUp(self):
@@ -1865,7 +1989,7 @@ class TestAddonCallbacks(OsfTestCase):
         for addon in self.node.addons:
             callback = addon.after_fork
             callback.assert_called_once_with(
-                self.node, fork, self.user
+                self.node, fork, self.user, save=False
             )
 
     @mock.patch('website.archiver.tasks.archive.si')
@@ -1876,7 +2000,7 @@ class TestAddonCallbacks(OsfTestCase):
         for addon in self.node.addons:
             callback = addon.after_register
             callback.assert_called_once_with(
-                self.node, registration, self.user
+                self.node, registration, self.user, save=False
             )
 
 
@@ -2590,9 +2714,37 @@ class TestProject(OsfTestCase):
 
     def test_date_modified(self):
         self.project.logs.append(NodeLogFactory())
+        self.project.save()
         assert_equal(self.project.date_modified, self.project.logs[-1].date)
         assert_not_equal(self.project.date_modified, self.project.date_created)
 
+    def test_date_modified_through_add_log(self):
+        log_date = self.project.date_created + datetime.timedelta(days=1)
+        self.project.add_log(
+            NodeLog.TAG_ADDED,
+            params={'node': self.project._id, 'tag': 'foo'},
+            auth=self.consolidate_auth,
+            log_date=log_date,
+        )
+        assert_equal(self.project.date_modified, self.project.logs[-1].date)
+        assert_not_equal(self.project.date_modified, self.project.date_created)
+
+    def test_date_modified_is_stored(self):
+        later = ProjectFactory()
+        later.add_log(
+            NodeLog.TAG_ADDED,
+            params={'node': later._id, 'tag': 'foo'},
+            auth=Auth(later.creator),
+            log_date=self.project.date_modified + datetime.timedelta(days=1),
+        )
+        found = Node.find(
+            Q('_id', 'in', [self.project._id, later._id])
+        ).sort('-date_modified')
+        assert_equal([node._id for node in found], [later._id, self.project._id])
+
+    def test_date_modified_of_new_project(self):
+        assert_equal(self.project.date_modified, self.project.logs[-1].date)
+
     def test_replace_contributor(self):
         contrib = UserFactory()
         self.project.add_contributor(contrib, auth=Auth(self.project.creator))
@@ -3000,6 +3152,59 @@ class TestForkNode(OsfTestCase):
         assert_equal(len(fork.contributors), 1)
         assert_equal(fork.get_permissions(user2), ['read', 'write', 'admin'])
 
+    def test_fork_ancestry(self):
+        component = NodeFactory(creator=self.user, parent=self.project)
+        subcomponent = NodeFactory(creator=self.user, parent=component)
+        fork = self.project.fork_node(self.consolidate_auth)
+        component_fork = fork.nodes[0]
+        subcomponent_fork = component_fork.nodes[0]
+        assert_equal(subcomponent_fork.forked_from, subcomponent)
+        assert_equal(fork.ancestor_ids, [])
+        assert_equal(fork.root_id, fork._id)
+        assert_equal(component_fork.ancestor_ids, [fork._id])
+        assert_equal(subcomponent_fork.ancestor_ids, [component_fork._id, fork._id])
+        assert_equal(subcomponent_fork.root_id, fork._id)
+        assert_equal(component_fork.parent_node, fork)
+
+    def test_fork_does_not_save_each_log(self):
+        for i in range(3):
+            self.project.add_tag('tag{0}'.format(i), auth=self.consolidate_auth)
+        with mock.patch.object(NodeLog, 'save') as mock_save:
+            fork = self.project.fork_node(self.consolidate_auth)
+        assert_false(mock_save.called)
+        for log in self.project.logs:
+            stored = NodeLog._storage[0].store.find_one({'_id': log._id})
+            assert_in(fork._id, stored['__backrefs']['logged']['node']['logs'])
+            assert_in(fork._id, log.node__logged)
+        assert_in(fork._id, self.project.node__forked)
+
+    def test_fork_plan_skips_unreadable_children(self):
+        self.project.set_privacy('public')
+        public = NodeFactory(parent=self.project, is_public=True)
+        NodeFactory(parent=self.project)
+        plan = forking.ForkPlan(self.project, Auth(user=UserFactory()))
+        assert_equal(plan.nodes, [self.project, public])
+
+    def test_fork_plan_progress(self):
+        NodeFactory(creator=self.user, parent=self.project)
+        progress = mock.Mock()
+        plan = forking.ForkPlan(self.project, self.consolidate_auth)
+        plan.execute(progress=progress)
+        assert_equal(progress.call_args_list, [mock.call(1, 2), mock.call(2, 2)])
+
+    @mock.patch('website.project.forking.enqueue_task')
+    def test_fork_node_async(self, mock_enqueue):
+        task_id = forking.fork_node_async(self.project, self.consolidate_auth)
+        signature = mock_enqueue.call_args[0][0]
+        assert_equal(signature.args, (self.project._id, self.user._id, 'Fork of '))
+        assert_equal(signature.options['task_id'], task_id)
+
+    @mock.patch('website.project.forking.enqueue_task')
+    def test_fork_node_async_checks_permission(self, mock_enqueue):
+        with assert_raises(PermissionsError):
+            forking.fork_node_async(self.project, Auth(user=UserFactory()))
+        assert_false(mock_enqueue.called)
+
     def test_fork_registration(self):
         self.registration = RegistrationFactory(project=self.project)
         fork = self.registration.fork_node(self.consolidate_auth)
@@ -3142,6 +3347,42 @@ class TestRegisterNode(OsfTestCase):
             assert_not_in(node, self.project.nodes)
             assert_true(node.is_registration)
 
+    def test_registration_ancestry(self):
+        component = NodeFactory(creator=self.user, parent=self.project)
+        subcomponent = NodeFactory(creator=self.user, parent=component)
+        registration = RegistrationFactory(project=self.project)
+        component_registration = registration.nodes[0]
+        subcomponent_registration = component_registration.nodes[0]
+        assert_equal(subcomponent_registration.registered_from, subcomponent)
+        assert_equal(registration.ancestor_ids, [])
+        assert_equal(component_registration.ancestor_ids, [registration._id])
+        assert_equal(
+            subcomponent_registration.ancestor_ids,
+            [component_registration._id, registration._id],
+        )
+        assert_equal(subcomponent_registration.root_id, registration._id)
+        # The whole tree shares one registration date
+        assert_equal(subcomponent_registration.registered_date, registration.registered_date)
+
+    def test_registration_does_not_save_each_log(self):
+        for i in range(3):
+            self.project.add_tag('tag{0}'.format(i), auth=self.consolidate_auth)
+        with mock.patch.object(NodeLog, 'save') as mock_save:
+            with mock.patch('framework.tasks.handlers.enqueue_task'):
+                registration = self.project.register_node(None, self.consolidate_auth, '', '')
+        assert_false(mock_save.called)
+        for log in self.project.logs:
+            assert_in(registration._id, log.node__logged)
+
+    @mock.patch('framework.tasks.handlers.enqueue_task')
+    def test_registration_archive_jobs_for_tree(self, mock_enqueue):
+        component = NodeFactory(creator=self.user, parent=self.project)
+        NodeFactory(creator=self.user, parent=component)
+        registration = self.project.register_node(None, self.consolidate_auth, '', '')
+        for node in [registration] + list(registration.get_descendants_recursive()):
+            assert_equal(node.archive_job.dst_node, node)
+            assert_equal(node.archive_job.src_node, node.registered_from)
+
     def test_private_contributor_registration(self):
 
         # Create some nodes
@@ -3363,6 +3604,152 @@ class TestPermissions(OsfTestCase):
         assert_false(self.project.has_permission(self.project.creator, 'dance'))
 
 
+class TestNodeLogStore(OsfTestCase):
+
+    def setUp(self):
+        super(TestNodeLogStore, self).setUp()
+        self._original_embed = settings.EMBED_NODE_LOG_IDS
+        settings.EMBED_NODE_LOG_IDS = False
+        self.project = ProjectFactory()
+        self.auth = Auth(self.project.creator)
+        self.start = self.project.date_created - datetime.timedelta(days=30)
+        for days in range(1, 5):
+            self._add_log(self.project, days)
+
+    def tearDown(self):
+        super(TestNodeLogStore, self).tearDown()
+        settings.EMBED_NODE_LOG_IDS = self._original_embed
+
+    def _add_log(self, node, days):
+        node.add_log(
+            NodeLog.TAG_ADDED,
+            params={'node': node._id, 'tag': 'tag{0}'.format(days)},
+            auth=self.auth,
+            log_date=self.start + datetime.timedelta(days=days),
+        )
+
+    def test_log_references_node(self):
+        log = self.project.get_recent_logs(1)[0]
+        assert_equal(log.node_id, self.project._id)
+        assert_equal(log.root_id, self.project._id)
+
+    def test_log_ids_not_embedded(self):
+        assert_equal(len(self.project.logs), 0)
+        assert_equal(self.project.log_count, 5)
+
+    def test_get_recent_logs(self):
+        logs = self.project.get_recent_logs(3)
+        assert_equal(logs[0].action, NodeLog.PROJECT_CREATED)
+        assert_equal(
+            [log.params['tag'] for log in logs[1:]],
+            ['tag4', 'tag3'],
+        )
+
+    def test_get_logs_page(self):
+        query = self.project.get_logs_query()
+        first, cursor = get_logs_page(query, size=3)
+        assert_equal(len(first), 3)
+        assert_true(cursor)
+        second, cursor = get_logs_page(query, cursor=cursor, size=3)
+        assert_equal(len(second), 2)
+        assert_is_none(cursor)
+        assert_equal(
+            [log._id for log in first + second],
+            [log._id for log in NodeLog.find(query).sort('-date', '-_id')],
+        )
+
+    def test_get_logs_page_same_date(self):
+        date = self.start + datetime.timedelta(days=10)
+        for _ in range(3):
+            self._add_log(self.project, 10)
+        query = self.project.get_logs_query() & Q('date', 'eq', date)
+        first, cursor = get_logs_page(query, size=2)
+        second, cursor = get_logs_page(query, cursor=cursor, size=2)
+        ids = [log._id for log in first + second]
+        assert_equal(len(set(ids)), 3)
+        assert_is_none(cursor)
+
+    def test_log_cursor_round_trip(self):
+        log = self.project.get_recent_logs(1)[0]
+        assert_equal(parse_log_cursor(make_log_cursor(log)), (log.date, log._id))
+
+    def test_invalid_cursor(self):
+        with assert_raises(ValueError):
+            get_logs_page(self.project.get_logs_query(), cursor='nope')
+
+    def test_fork_inherits_logs(self):
+        fork = self.project.fork_node(self.auth)
+        self._add_log(self.project, 40)
+        fork_log_ids = [log._id for log in fork.get_recent_logs(100)]
+        original_log_ids = [log._id for log in self.project.get_recent_logs(100)]
+        assert_not_in(original_log_ids[0], fork_log_ids)
+        for log_id in original_log_ids[1:]:
+            assert_in(log_id, fork_log_ids)
+        # Inherited logs plus the fork log
+        assert_equal(fork.log_count, len(original_log_ids))
+
+    def test_legacy_embedded_logs_found(self):
+        log = NodeLogFactory()
+        self.project.logs.append(log)
+        self.project.save()
+        assert_in(log, NodeLog.find(self.project.get_logs_query()))
+
+
+class TestPermissionResolver(OsfTestCase):
+
+    def setUp(self):
+        super(TestPermissionResolver, self).setUp()
+        self.admin = UserFactory()
+        self.project = ProjectFactory(creator=self.admin)
+        self.component = NodeFactory(parent=self.project, creator=UserFactory())
+        self.public = ProjectFactory(is_public=True)
+        self.nodes = [self.project, self.component, self.public]
+
+    def test_anonymous(self):
+        resolver = PermissionResolver(Auth(None), self.nodes)
+        assert_equal(
+            [resolver.can_view(node) for node in self.nodes],
+            [False, False, True],
+        )
+        assert_false(any(resolver.can_edit(node) for node in self.nodes))
+
+    def test_admin_parent_can_view_but_not_edit_component(self):
+        resolver = PermissionResolver(Auth(self.admin), self.nodes)
+        assert_true(resolver.can_view(self.component))
+        assert_true(resolver.is_admin_parent(self.component))
+        assert_false(resolver.can_edit(self.component))
+        assert_true(resolver.can_edit(self.project))
+
+    def test_private_link(self):
+        link = PrivateLinkFactory()
+        link.nodes.append(self.component)
+        link.save()
+        resolver = PermissionResolver(Auth(None, private_key=link.key), self.nodes)
+        assert_true(resolver.can_view(self.component))
+        assert_false(resolver.can_view(self.project))
+
+    def test_matches_node_methods(self):
+        for user in (self.admin, self.component.creator, UserFactory()):
+            auth = Auth(user)
+            resolver = PermissionResolver(auth, self.nodes)
+            for node in self.nodes:
+                assert_equal(resolver.can_view(node), node.can_view(auth))
+                assert_equal(resolver.can_edit(node), node.can_edit(auth))
+
+    def test_node_methods_delegate_when_active(self):
+        auth = Auth(self.admin)
+        with PermissionResolver(auth, self.nodes) as resolver:
+            assert_is(get_active_resolver(auth), resolver)
+            assert_is(get_active_resolver(user=self.admin), resolver)
+            with mock.patch.object(resolver, 'can_view', return_value='delegated'):
+                assert_equal(self.component.can_view(auth), 'delegated')
+        assert_is(get_active_resolver(auth), None)
+
+    def test_not_active_for_other_auth(self):
+        with PermissionResolver(Auth(self.admin), self.nodes):
+            assert_is(get_active_resolver(Auth(UserFactory())), None)
+
+
 class TestPointer(OsfTestCase):
 
     def setUp(self):
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Tests for the asynchronous search-indexing queue."""
+
+import datetime
+
+import mock
+from nose.tools import *  # flake8: noqa (PEP8 asserts)
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory, UserFactory
+
+from website import settings
+from website.search import indexing
+
+
+@mock.patch('website.search.indexing.flush_search_queue.apply_async')
+class TestSearchIndexingQueue(OsfTestCase):
+
+    def setUp(self):
+        super(TestSearchIndexingQueue, self).setUp()
+        self.project = ProjectFactory(is_public=True)
+        self.user = self.project.creator
+        settings.SEARCH_INDEX_ASYNC = True
+        self._original_use_celery = settings.USE_CELERY
+        settings.USE_CELERY = True
+        indexing.get_collection().remove()
+
+    def tearDown(self):
+        super(TestSearchIndexingQueue, self).tearDown()
+        settings.SEARCH_INDEX_ASYNC = False
+        settings.USE_CELERY = self._original_use_celery
+
+    def test_save_enqueues_node(self, mock_apply_async):
+        with mock.patch('website.search.search.update_node') as mock_update:
+            self.project.title = 'New title'
+            self.project.save()
+        assert_false(mock_update.called)
+        entry = indexing.get_collection().find_one({'target_id': self.project._id})
+        assert_equal(entry['kind'], indexing.NODE)
+        mock_apply_async.assert_called_once_with(countdown=settings.SEARCH_INDEX_DELAY)
+
+    def test_save_enqueues_user(self, mock_apply_async):
+        self.user.fullname = 'Jane Doe'
+        self.user.save()
+        entry = indexing.get_collection().find_one({'target_id': self.user._id})
+        assert_equal(entry['kind'], indexing.USER)
+
+    def test_repeated_saves_are_coalesced(self, mock_apply_async):
+        for title in ('one', 'two', 'three'):
+            self.project.title = title
+            self.project.save()
+        assert_equal(indexing.get_collection().count(), 1)
+        assert_equal(mock_apply_async.call_count, 1)
+
+    def test_request_dedupes_until_teardown(self, mock_apply_async):
+        with self.context:
+            indexing.search_queue_before_request()
+            indexing.enqueue(indexing.NODE, self.project._id)
+            indexing.enqueue(indexing.NODE, self.project._id)
+            assert_equal(indexing.get_collection().count(), 0)
+            indexing.search_queue_teardown_request()
+        assert_equal(indexing.get_collection().count(), 1)
+
+    def test_failed_request_is_not_pushed(self, mock_apply_async):
+        with self.context:
+            indexing.search_queue_before_request()
+            indexing.enqueue(indexing.NODE, self.project._id)
+            indexing.search_queue_teardown_request(error=Exception())
+        assert_equal(indexing.get_collection().count(), 0)
+
+    @mock.patch('website.search.search.bulk_update')
+    def test_flush(self, mock_bulk_update, mock_apply_async):
+        indexing.push([
+            (indexing.NODE, self.project._id),
+            (indexing.USER, self.user._id),
+        ])
+        assert_equal(indexing.flush(), 2)
+        mock_bulk_update.assert_called_once_with(nodes=[self.project], users=[self.user])
+        assert_equal(indexing.get_collection().count(), 0)
+
+    @mock.patch('website.search.search.bulk_update')
+    def test_flush_batches(self, mock_bulk_update, mock_apply_async):
+        other = ProjectFactory()
+        indexing.push([
+            (indexing.NODE, self.project._id),
+            (indexing.NODE, other._id),
+        ])
+        assert_equal(indexing.flush(batch_size=1), 2)
+        assert_equal(mock_bulk_update.call_count, 2)
+
+    @mock.patch('website.search.search.bulk_update')
+    def test_flush_failure_requeues(self, mock_bulk_update, mock_apply_async):
+        mock_bulk_update.side_effect = Exception('down')
+        indexing.push([(indexing.NODE, self.project._id)])
+        with assert_raises(Exception):
+            indexing.flush()
+        assert_equal(indexing.get_collection().count(), 1)
+
+    def test_queue_stats(self, mock_apply_async):
+        assert_equal(indexing.get_queue_stats(), {'pending': 0, 'lag': 0})
+        indexing.push([(indexing.NODE, self.project._id)])
+        indexing.get_collection().update(
+            {}, {'$set': {'enqueued': datetime.datetime.utcnow() - datetime.timedelta(seconds=30)}}
+        )
+        stats = indexing.get_queue_stats()
+        assert_equal(stats['pending'], 1)
+        assert_greater_equal(stats['lag'], 30)
@@ -11,6 +11,7 @@ from tests.base import DbTestCase
 from flask import make_response
 from pymongo.errors import CollectionInvalid, OperationFailure
 
+from framework.exceptions import HTTPError
 from framework.flask import add_handlers
 from framework.mongo import database
 from framework.mongo import handlers as database_handlers
@@ -95,7 +96,7 @@ class TestTransactionHandlers(DbTestCase):
     def setUp(self):
         super(TestTransactionHandlers, self).setUp()
         self.clear_transactions()
-        self.context = app.test_request_context('/')
+        self.context = app.test_request_context('/', method='POST')
         self.context.push()
 
     def tearDown(self):
@@ -174,11 +175,23 @@ add_handlers(transaction_app, database_handlers.handlers)
 add_handlers(transaction_app, handlers.handlers)
 
 
-@transaction_app.route('/transact/me/bro/', methods=['GET'])
+@transaction_app.route('/transact/me/bro/', methods=['GET', 'POST'])
 def transaction_view():
     return make_response()
 
 
+@transaction_app.route('/read/me/bro/', methods=['POST'])
+@handlers.read_only
+def read_only_view():
+    return make_response()
+
+
+@transaction_app.route('/write/on/get/bro/', methods=['GET'])
+@handlers.auto_transaction
+def auto_transaction_view():
+    return make_response()
+
+
 @handlers.no_auto_transaction
 @transaction_app.route('/dont/transact/me/bro/', methods=['GET'])
 def no_transaction_view():
@@ -200,11 +213,58 @@ class TestSkipTransactions(DbTestCase):
     @mock.patch('framework.transactions.commands.rollback')
     @mock.patch('framework.transactions.commands.begin')
     def test_no_skip(self, mock_begin, mock_rollback, mock_commit):
-        test_app.get('/transact/me/bro/')
+        test_app.post('/transact/me/bro/')
         assert_true(mock_begin.called)
         assert_true(mock_rollback.called)
         assert_true(mock_commit.called)
 
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_skip_safe_method(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/transact/me/bro/')
+        assert_false(mock_begin.called)
+        assert_false(mock_rollback.called)
+        assert_false(mock_commit.called)
+
+    @mock.patch('framework.transactions.handlers.settings.TRANSACTIONS_SKIP_SAFE_METHODS', False)
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_no_skip_safe_method_if_disabled(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/transact/me/bro/')
+        assert_true(mock_begin.called)
+        assert_true(mock_commit.called)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_skip_read_only(self, mock_begin, mock_rollback, mock_commit):
+        test_app.post('/read/me/bro/')
+        assert_false(mock_begin.called)
+        assert_false(mock_commit.called)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_auto_transaction_on_safe_method(self, mock_begin, mock_rollback, mock_commit):
+        test_app.get('/write/on/get/bro/')
+        assert_true(mock_begin.called)
+        assert_true(mock_commit.called)
+
+    @mock.patch('framework.transactions.commands.commit')
+    @mock.patch('framework.transactions.commands.rollback')
+    @mock.patch('framework.transactions.commands.begin')
+    def test_stats(self, mock_begin, mock_rollback, mock_commit):
+        utils.transaction_stats.reset()
+        test_app.get('/transact/me/bro/')
+        test_app.post('/transact/me/bro/')
+        test_app.post('/transact/me/bro/')
+        assert_equal(
+            utils.transaction_stats.to_dict(),
+            {'transaction_view': {'opened': 2, 'skipped': 1}},
+        )
+
     @mock.patch('framework.transactions.commands.commit')
     @mock.patch('framework.transactions.commands.rollback')
     @mock.patch('framework.transactions.commands.begin')
@@ -266,6 +326,163 @@ class TestTransactionIntegration(DbTestCase):
         )
 
 
+@mock.patch('framework.transactions.context.time.sleep')
+@mock.patch('framework.transactions.commands.commit')
+@mock.patch('framework.transactions.commands.rollback')
+@mock.patch('framework.transactions.commands.begin')
+class TestRetryOnConflict(unittest.TestCase):
+
+    def setUp(self):
+        super(TestRetryOnConflict, self).setUp()
+        utils.conflict_stats.reset()
+        self.calls = []
+
+    def make_func(self, *errors):
+        errors = list(errors)
+
+        @context.retry_on_conflict(max_retries=2)
+        def func():
+            self.calls.append(True)
+            if errors:
+                raise errors.pop(0)
+            return 'done'
+        return func
+
+    def get_stats(self):
+        return utils.conflict_stats.to_dict()[__name__ + '.func']
+
+    def test_no_conflict(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func()
+        assert_equal(func(), 'done')
+        assert_equal(len(self.calls), 1)
+        assert_equal(mock_commit.call_count, 1)
+        assert_false(mock_sleep.called)
+
+    def test_retry_after_conflict(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func(
+            OperationFailure(messages.LOCK_ERROR),
+            OperationFailure(messages.LOCK_ERROR),
+        )
+        assert_equal(func(), 'done')
+        assert_equal(len(self.calls), 3)
+        assert_equal(mock_rollback.call_count, 2)
+        assert_equal(mock_sleep.call_count, 2)
+        assert_equal(self.get_stats(), {'conflicts': 2, 'retries': 2, 'give_ups': 0})
+
+    def test_retry_after_conflict_on_commit(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        mock_commit.side_effect = [OperationFailure(messages.LOCK_ERROR), None]
+        func = self.make_func()
+        assert_equal(func(), 'done')
+        assert_equal(len(self.calls), 2)
+
+    def test_give_up(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func(*[OperationFailure(messages.LOCK_ERROR)] * 3)
+        with assert_raises(OperationFailure):
+            func()
+        assert_equal(len(self.calls), 3)
+        assert_equal(self.get_stats(), {'conflicts': 3, 'retries': 2, 'give_ups': 1})
+
+    def test_give_up_in_request(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func(*[OperationFailure(messages.LOCK_ERROR)] * 3)
+        with app.test_request_context('/', method='POST'):
+            with assert_raises(HTTPError) as cm:
+                func()
+        assert_equal(cm.exception.code, handlers.LOCK_ERROR_CODE)
+
+    def test_other_errors_are_not_retried(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func(OperationFailure('not master'))
+        with assert_raises(OperationFailure):
+            func()
+        assert_equal(len(self.calls), 1)
+        assert_equal(mock_rollback.call_count, 1)
+
+    def test_client_error_commits(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func(HTTPError(403))
+        with assert_raises(HTTPError):
+            func()
+        assert_equal(mock_commit.call_count, 1)
+        assert_false(mock_rollback.called)
+
+    def test_skips_request_transaction(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        func = self.make_func()
+        assert_true(getattr(func, handlers.NO_AUTO_TRANSACTION_ATTR))
+
+    def test_on_commit_runs_once_after_conflict_on_commit(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        mock_commit.side_effect = [OperationFailure(messages.LOCK_ERROR), None]
+        callback = mock.Mock()
+
+        @context.retry_on_conflict(max_retries=2)
+        def func():
+            self.calls.append(True)
+            context.on_commit(callback, 'sent')
+            assert_false(callback.called)
+            return 'done'
+
+        assert_equal(func(), 'done')
+        assert_equal(len(self.calls), 2)
+        callback.assert_called_once_with('sent')
+
+    def test_on_commit_dropped_on_give_up(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        callback = mock.Mock()
+
+        @context.retry_on_conflict(max_retries=1)
+        def func():
+            context.on_commit(callback)
+            raise OperationFailure(messages.LOCK_ERROR)
+
+        with assert_raises(OperationFailure):
+            func()
+        assert_false(callback.called)
+
+    def test_on_commit_runs_after_client_error(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        callback = mock.Mock()
+
+        @context.retry_on_conflict()
+        def func():
+            context.on_commit(callback)
+            raise HTTPError(400)
+
+        with assert_raises(HTTPError):
+            func()
+        callback.assert_called_once_with()
+
+    def test_on_commit_outside_transaction(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        callback = mock.Mock(return_value='sent')
+        assert_equal(context.on_commit(callback, 1, key=2), 'sent')
+        callback.assert_called_once_with(1, key=2)
+
+    @mock.patch('framework.transactions.context.settings.TRANSACTION_RETRY_BASE_DELAY', 0.1)
+    @mock.patch('framework.transactions.context.settings.TRANSACTION_RETRY_MAX_DELAY', 0.3)
+    def test_retry_delay(self, mock_begin, mock_rollback, mock_commit, mock_sleep):
+        assert_less_equal(context.get_retry_delay(0), 0.1)
+        assert_less_equal(context.get_retry_delay(5), 0.3)
+
+
+class TestViewsWritingOnGet(unittest.TestCase):
+
+    def test_views_writing_on_get_open_transactions(self):
+        from tests.base import test_app as osf_app
+        view_names = [
+            'node_registration_retraction_approve',
+            'node_registration_retraction_disapprove',
+            'node_registration_embargo_approve',
+            'node_registration_embargo_disapprove',
+            'list_comments',
+            'oauth_callback',
+            'box_oauth_finish',
+            'dropbox_oauth_finish',
+            'figshare_oauth_callback',
+            'github_oauth_callback',
+            'googledrive_oauth_finish',
+        ]
+        views = {}
+        for view in osf_app.view_functions.values():
+            views.setdefault(view.__name__, []).append(view)
+        for name in view_names:
+            assert_in(name, views)
+            for view in views[name]:
+                assert_true(getattr(view, handlers.AUTO_TRANSACTION_ATTR, False), name)
+
+
 if __name__ == '__main__':
     unittest.run()
-
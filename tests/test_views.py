@@ -15,6 +15,7 @@ from nose.tools import *  # noqa PEP8 asserts
 from tests.test_features import requires_search
 
 from modularodm import Q, fields
+from pymongo.errors import OperationFailure
 from dateutil.parser import parse as parse_date
 
 from framework import auth
@@ -23,6 +24,7 @@ from framework.auth import User, Auth
 from framework.auth.utils import impute_names_model
 from framework.auth.exceptions import InvalidTokenError
 from framework.tasks import handlers
+from framework.transactions import commands, messages
 
 from website import mailchimp_utils
 from website.views import _rescale_ratio
@@ -382,6 +384,59 @@ class TestProjectViews(OsfTestCase):
         assert_equal(self.project.get_permissions(self.user2), ['read'])
         assert_equal(self.project.get_permissions(self.user1), ['read', 'write', 'admin'])
 
+    @mock.patch('framework.transactions.context.time.sleep')
+    def test_manage_permissions_retried_after_lock_conflict(self, mock_sleep):
+        url = self.project.api_url + 'contributors/manage/'
+        manage_contributors = Node.manage_contributors
+        calls = []
+
+        def conflict_once(node, *args, **kwargs):
+            calls.append(True)
+            if len(calls) == 1:
+                raise OperationFailure(messages.LOCK_ERROR)
+            return manage_contributors(node, *args, **kwargs)
+
+        with mock.patch.object(Node, 'manage_contributors', conflict_once):
+            self.app.post_json(
+                url,
+                {
+                    'contributors': [
+                        {'id': self.project.creator._id, 'permission': 'admin',
+                            'registered': True, 'visible': True},
+                        {'id': self.user1._id, 'permission': 'read',
+                            'registered': True, 'visible': True},
+                        {'id': self.user2._id, 'permission': 'admin',
+                            'registered': True, 'visible': True},
+                    ]
+                },
+                auth=self.auth,
+            )
+
+        assert_equal(len(calls), 2)
+        self.project.reload()
+        assert_equal(self.project.get_permissions(self.user1), ['read'])
+
+    @mock.patch('framework.status.push_status_message')
+    @mock.patch('framework.transactions.context.time.sleep')
+    def test_remove_contributor_status_pushed_once_after_lock_conflict(self, mock_sleep, mock_push):
+        commit = commands.commit
+        calls = []
+
+        def conflict_once(database):
+            calls.append(True)
+            if len(calls) == 1:
+                raise OperationFailure(messages.LOCK_ERROR)
+            return commit(database)
+
+        url = self.project.api_url_for('project_removecontributor')
+        with mock.patch('framework.transactions.commands.commit', conflict_once):
+            self.app.post_json(url, {'id': self.user2._id}, auth=self.auth)
+
+        assert_equal(len(calls), 2)
+        mock_push.assert_called_once_with('Contributor removed', kind='success', trust=False)
+        self.project.reload()
+        assert_false(self.project.is_contributor(self.user2))
+
     def test_contributor_manage_reorder(self):
 
         # Two users are added as a contributor via a POST request
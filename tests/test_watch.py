@@ -6,12 +6,14 @@ import unittest
 import datetime as dt
 
 from pytz import utc
+from modularodm import Q
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 from framework.auth import Auth
 from framework.exceptions import HTTPError
 from tests.base import OsfTestCase
 from tests.factories import (UserFactory, ProjectFactory,
                              WatchConfigFactory)
+from website.models import NodeLog
 from website.views import paginate
 import math
 
@@ -26,6 +28,7 @@ class TestWatching(OsfTestCase):
         # Clear project logs
         self.project.logs = []
         self.project.save()
+        NodeLog.remove(Q('node_id', 'eq', self.project._id))
         # A log added 100 days ago
         self.project.add_log(
             'project_created',
@@ -65,16 +68,15 @@ class TestWatching(OsfTestCase):
         assert_equal(n_watched_now, n_watched_then - 1)
         assert_false(self.user.is_watching(self.project))
 
-    @unittest.skip("Won't work because the old log's id doesn't encode the "
-                   "correct log date")
     def test_get_recent_log_ids(self):
         self._watch_project(self.project)
         log_ids = list(self.user.get_recent_log_ids())
         assert_equal(self.last_log._id, log_ids[0])
-        # This part won't work
-        # TODO(sloria): Rethink.
         assert_equal(len(log_ids), 1)
 
+    def test_get_recent_log_ids_not_watching(self):
+        assert_equal(list(self.user.get_recent_log_ids()), [])
+
     def test_get_recent_log_ids_since(self):
         self._watch_project(self.project)
         since = dt.datetime.utcnow().replace(tzinfo=utc) - dt.timedelta(days=101)
@@ -17,6 +17,7 @@ from framework.sessions import session
 from framework.sentry import log_exception
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in, must_be_signed
+from framework.transactions.context import on_commit, retry_on_conflict
 
 from website import mails
 from website import settings
@@ -202,6 +203,7 @@ LOG_ACTION_MAP = {
 }
 
 
+@retry_on_conflict()
 @must_be_signed
 @restrict_waterbutler
 @must_be_valid_project
@@ -274,7 +276,8 @@ def create_waterbutler_log(payload, **kwargs):
             )
 
         if payload.get('email') is True or payload.get('errors'):
-            mails.send_mail(
+            on_commit(
+                mails.send_mail,
                 user.username,
                 mails.FILE_OPERATION_FAILED if payload.get('errors')
                 else mails.FILE_OPERATION_SUCCESS,
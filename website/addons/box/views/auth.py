@@ -15,6 +15,7 @@ from framework.flask import redirect  # VOL-aware redirect
 from framework.sessions import session
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in
+from framework.transactions.handlers import auto_transaction
 
 from website.util import api_url_for
 from website.util import web_url_for
@@ -102,6 +103,7 @@ def box_oauth_start(auth, **kwargs):
     return redirect(get_auth_flow(csrf_token))
 
 
+@auto_transaction
 @must_be_logged_in
 def box_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new BoxUserSettings
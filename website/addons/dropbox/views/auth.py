@@ -13,6 +13,7 @@ from framework.sessions import session
 from framework.exceptions import HTTPError
 from framework.auth.decorators import collect_auth
 from framework.auth.decorators import must_be_logged_in
+from framework.transactions.handlers import auto_transaction
 
 from website.util import api_url_for
 from website.util import web_url_for
@@ -84,6 +85,7 @@ def dropbox_oauth_start(auth, **kwargs):
     return redirect(get_auth_flow().start() + '&force_reapprove=true')
 
 
+@auto_transaction
 @collect_auth
 def dropbox_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new DropboxUserSettings
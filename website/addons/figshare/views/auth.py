@@ -9,6 +9,7 @@ from framework.flask import redirect  # VOL-aware redirect
 from framework.exceptions import HTTPError
 from framework.auth.decorators import collect_auth
 from framework.auth.decorators import must_be_logged_in
+from framework.transactions.handlers import auto_transaction
 
 from website import models
 from website.util import web_url_for
@@ -73,6 +74,7 @@ def figshare_oauth_delete_node(auth, node_addon, **kwargs):
     return {}
 
 
+@auto_transaction
 @collect_auth
 def figshare_oauth_callback(auth, **kwargs):
 
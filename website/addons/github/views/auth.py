@@ -8,6 +8,7 @@ from flask import request
 from framework.flask import redirect  # VOL-aware redirect
 from framework.auth.decorators import must_be_logged_in
 from framework.exceptions import HTTPError
+from framework.transactions.handlers import auto_transaction
 
 from website import models
 from website.project.decorators import (
@@ -95,6 +96,7 @@ def create_and_attach_oauth(user_settings, access_token, token_type):
     user_settings.save()
 
 
+@auto_transaction
 def github_oauth_callback(**kwargs):
 
     user = models.User.load(kwargs.get('uid'))
@@ -7,6 +7,7 @@ from framework.flask import redirect  # VOL-aware redirect
 from framework.sessions import session
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_logged_in
+from framework.transactions.handlers import auto_transaction
 
 from website import models
 from website.util import permissions
@@ -52,6 +53,7 @@ def googledrive_oauth_start(auth, **kwargs):
     return redirect(authorization_url)
 
 
+@auto_transaction
 @must_be_logged_in
 def googledrive_oauth_finish(auth, **kwargs):
     """View called when the Oauth flow is completed. Adds a new GoogleDriveUserSettings
@@ -17,7 +17,7 @@ from framework.guid.model import GuidStoredObject
 from website import settings
 from website.addons.base import AddonNodeSettingsBase
 from website.addons.wiki import utils as wiki_utils
-from website.addons.wiki.settings import WIKI_CHANGE_DATE
+from website.addons.wiki.settings import WIKI_CHANGE_DATE, WIKI_RENDERER_VERSION
 from website.project.signals import write_permissions_revoked
 
 from .exceptions import (
@@ -107,6 +107,11 @@ class NodeWikiPage(GuidStoredObject):
     user = fields.ForeignField('user')
     node = fields.ForeignField('node')
 
+    # Rendered HTML and text by the id of the node rendering the page, since
+    # forks and registrations share pages but link to their own wiki pages:
+    # {<node id>: {'renderer': 1, 'html': ..., 'text': ...}}
+    rendered = fields.DictionaryField()
+
     @property
     def deep_url(self):
         return '{}wiki/{}/'.format(self.node.deep_url, self.page_name)
@@ -119,8 +124,7 @@ class NodeWikiPage(GuidStoredObject):
     def rendered_before_update(self):
         return self.date < WIKI_CHANGE_DATE
 
-    def html(self, node):
-        """The cleaned HTML of the page"""
+    def _render(self, node):
         sanitized_content = render_content(self.content, node=node)
         try:
             return linkify(
@@ -131,10 +135,39 @@ class NodeWikiPage(GuidStoredObject):
             logger.warning('Returning unlinkified content.')
             return sanitized_content
 
+    def _get_rendered(self, node):
+        """Return the stored rendering of the page for ``node``, rendering
+        and storing it first if it is missing or was made by an older
+        renderer. Versions never change, so a rendering stays valid until
+        `WIKI_RENDERER_VERSION` changes.
+        """
+        rendered = (self.rendered or {}).get(node._id)
+        if rendered and rendered.get('renderer') == WIKI_RENDERER_VERSION:
+            return rendered
+        html = self._render(node)
+        rendered = {
+            'renderer': WIKI_RENDERER_VERSION,
+            'html': html,
+            'text': sanitize(html, tags=[], strip=True),
+        }
+        self.rendered[node._id] = rendered
+        if self._is_loaded:
+            # Write the rendering alone; saving the page would also
+            # reindex its node
+            self._storage[0].store.update(
+                {'_id': self._id},
+                {'$set': {'rendered.{0}'.format(node._id): rendered}},
+                manipulate=False,
+            )
+        return rendered
+
+    def html(self, node):
+        """The cleaned HTML of the page"""
+        return self._get_rendered(node)['html']
+
     def raw_text(self, node):
         """ The raw text of the page, suitable for using in a test search"""
-
-        return sanitize(self.html(node), tags=[], strip=True)
+        return self._get_rendered(node)['text']
 
     def get_draft(self, node):
         """
@@ -7,3 +7,7 @@ SHAREJS_URL = '{}:{}'.format(SHAREJS_HOST, SHAREJS_PORT)
 
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098)
+
+# Rendered HTML is stored with each wiki page version; increment to render
+# pages again after changing the Markdown extensions or WIKI_WHITELIST
+WIKI_RENDERER_VERSION = 1
@@ -686,6 +686,55 @@ class TestWikiLinks(OsfTestCase):
         assert_equal(expected, wiki.html(node))
 
 
+
+class TestWikiRendering(OsfTestCase):
+
+    def setUp(self):
+        super(TestWikiRendering, self).setUp()
+        self.project = ProjectFactory()
+        self.wiki = NodeWikiFactory(content='# Title\n\n[[wiki2]]', node=self.project)
+
+    def test_rendering_is_stored(self):
+        html = self.wiki.html(self.project)
+        stored = NodeWikiPage._storage[0].store.find_one({'_id': self.wiki._id})
+        rendered = stored['rendered'][self.project._id]
+        assert_equal(rendered['html'], html)
+        assert_equal(rendered['renderer'], settings.WIKI_RENDERER_VERSION)
+        assert_equal(self.wiki.raw_text(self.project), rendered['text'])
+
+    @mock.patch('website.addons.wiki.model.render_content')
+    def test_stored_rendering_is_served(self, mock_render):
+        self.wiki.rendered = {
+            self.project._id: {
+                'renderer': settings.WIKI_RENDERER_VERSION,
+                'html': '<h1>Stored</h1>',
+                'text': 'Stored',
+            },
+        }
+        self.wiki.save()
+        assert_equal(self.wiki.html(self.project), '<h1>Stored</h1>')
+        assert_equal(self.wiki.raw_text(self.project), 'Stored')
+        assert_false(mock_render.called)
+
+    def test_renderer_change_renders_again(self):
+        self.wiki.rendered = {
+            self.project._id: {'renderer': 0, 'html': 'old', 'text': 'old'},
+        }
+        self.wiki.save()
+        assert_in('Title', self.wiki.html(self.project))
+
+    def test_rendering_by_node(self):
+        fork = self.project.fork_node(Auth(self.project.creator))
+        assert_in(
+            fork.web_url_for('project_wiki_view', wname='wiki2'),
+            self.wiki.html(fork),
+        )
+        assert_in(
+            self.project.web_url_for('project_wiki_view', wname='wiki2'),
+            self.wiki.html(self.project),
+        )
+
+
 class TestWikiUuid(OsfTestCase):
 
     def setUp(self):
@@ -8,16 +8,20 @@ import json
 from modularodm import storage
 from werkzeug.contrib.fixers import ProxyFix
 import framework
+from framework import analytics
 from framework.flask import app, add_handlers
 from framework.logging import logger
 from framework.mongo import set_up_storage
 from framework.addons.utils import render_addon_capabilities
 from framework.sentry import sentry
+from framework.mongo import cache as object_cache
+from framework.guid import cache as guid_cache
 from framework.mongo import handlers as mongo_handlers
 from framework.tasks import handlers as task_handlers
 from framework.transactions import handlers as transaction_handlers
 
 import website.models
+from website.search import indexing as search_indexing
 from website.routes import make_url_map
 from website.addons.base import init_addon
 from website.project.model import ensure_schemas, Node
@@ -47,7 +51,10 @@ def attach_handlers(app, settings):
     """Add callback handlers to ``app`` in the correct order."""
     # Add callback handlers to application
     add_handlers(app, mongo_handlers.handlers)
+    add_handlers(app, object_cache.handlers)
+    add_handlers(app, guid_cache.handlers)
     add_handlers(app, task_handlers.handlers)
+    add_handlers(app, search_indexing.handlers)
     add_handlers(app, transaction_handlers.handlers)
 
     # Attach handler for checking view-only link keys.
@@ -92,6 +99,17 @@ def do_set_backends(settings):
         storage.MongoStorage,
         addons=settings.ADDONS_AVAILABLE,
     )
+    if settings.SESSION_DB_NAME:
+        framework.sessions.set_up_storage()
+    ensure_indices()
+
+
+def ensure_indices():
+    """Create the indices of collections that no model is stored in; model
+    indices are created by `set_up_storage`.
+    """
+    analytics.ensure_activity_indices()
+
 
 def init_app(settings_module='website.settings', set_backends=True, routes=True,
         attach_request_handlers=True):
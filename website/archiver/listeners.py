@@ -25,16 +25,15 @@ def node_and_primary_descendants(node):
 
 @project_signals.after_create_registration.connect
 def after_register(src, dst, user):
-    """Blinker listener for registration initiations. Enqueqes a chain
-    of archive tasks for the current node and its descendants
+    """Blinker listener for registration initiations, sent once per
+    registered tree. Enqueues a chain of archive tasks for the registration
+    and its primary descendants
 
     :param src: Node being registered
-    :param dst: registration Node
+    :param dst: Registration at the root of the registered tree
     :param user: registration initiator
     """
     archiver_utils.before_archive(dst, user)
-    if dst.root != dst:  # if not top-level registration
-        return
     archive_tasks = [archive.si(job_pk=t.archive_job._id) for t in node_and_primary_descendants(dst)]
     handlers.enqueue_task(
         celery.chain(*archive_tasks)
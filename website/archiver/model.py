@@ -164,7 +164,10 @@ class ArchiveJob(StoredObject):
         target.save()
         self.target_addons.append(target)
 
-    def set_targets(self):
+    def get_target_names(self):
+        """Return the names of the targets to archive, one for each complete
+        storage add-on of the source node.
+        """
         addons = []
         for addon in [self.src_node.get_addon(name)
                       for name in settings.ADDONS_ARCHIVABLE
@@ -178,7 +181,10 @@ class ArchiveJob(StoredObject):
                     addons.append(addon.config.short_name + '-published')
                 else:
                     addons.append(addon.config.short_name)
-        for addon in addons:
+        return addons
+
+    def set_targets(self):
+        for addon in self.get_target_names():
             self._set_target(addon)
         self.save()
 
@@ -1,11 +1,12 @@
 from framework.auth import Auth
+from framework.mongo import insert_many
 
 from website.archiver import (
     StatResult, AggregateStatResult,
     ARCHIVER_NETWORK_ERROR,
     ARCHIVER_SIZE_EXCEEDED,
 )
-from website.archiver.model import ArchiveJob
+from website.archiver.model import ArchiveJob, ArchiveTarget
 
 from website import mails
 from website import settings
@@ -155,13 +156,31 @@ def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
 
 
 def before_archive(node, user):
-    link_archive_provider(node, user)
-    job = ArchiveJob(
-        src_node=node.registered_from,
-        dst_node=node,
-        initiator=user
-    )
-    job.set_targets()
+    """Link the archive provider to a registration and to its primary
+    descendants that are not archiving yet, and create their archive jobs
+    and targets with one write per model.
+
+    :param node: Registration at the root of the tree to archive
+    :param user: Registration initiator
+    """
+    nodes = [node] + list(node.get_descendants_recursive(lambda n: n.primary))
+    jobs, targets = [], []
+    for each in nodes:
+        if each.archive_job is not None:
+            continue
+        link_archive_provider(each, user)
+        job = ArchiveJob(
+            src_node=each.registered_from,
+            dst_node=each,
+            initiator=user
+        )
+        for name in job.get_target_names():
+            target = ArchiveTarget(name=name)
+            targets.append(target)
+            job.target_addons.append(target)
+        jobs.append(job)
+    insert_many(targets)
+    insert_many(jobs)
 
 
 def add_archive_success_logs(node, user):
@@ -1,6 +1,8 @@
 from babel import dates, core, Locale
 from mako.lookup import Template
 
+from framework.mongo import load_many
+
 from website import mails
 from website import models as website_models
 from website.notifications import constants
@@ -30,8 +32,7 @@ def email_transactional(recipient_ids, uid, event, user, node, timestamp, **cont
     context['user'] = user
     subject = Template(EMAIL_SUBJECT_MAP[event]).render(**context)
 
-    for user_id in recipient_ids:
-        recipient = website_models.User.load(user_id)
+    for recipient in load_many(website_models.User, recipient_ids):
         email = recipient.username
         context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
         message = mails.render_message(template, **context)
@@ -58,8 +59,7 @@ def email_digest(recipient_ids, uid, event, user, node, timestamp, **context):
     context['user'] = user
     node_lineage_ids = get_node_lineage(node) if node else []
 
-    for user_id in recipient_ids:
-        recipient = website_models.User.load(user_id)
+    for recipient in load_many(website_models.User, recipient_ids):
         context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
         message = mails.render_message(template, **context)
 
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Index of how many projects each pair of users contribute to together.
+
+Each user has a document in the ``cocontributors`` collection mapping each of
+their co-contributors to the number of projects they share ::
+
+    {'_id': <user>, 'counts': {<other>: 3, ...}}
+
+`Node.save` updates the counts whenever a node's contributor list changes, so
+adding, removing and merging contributors are all reflected. Each change
+writes one document per affected user. Like ``User.node__contributed``, every
+node counts, including deleted nodes and registrations.
+"""
+
+import collections
+import itertools
+
+from framework.mongo import database
+
+
+def get_collection():
+    return database['cocontributors']
+
+
+def _increment(pairs, amount):
+    """Add ``amount`` to the counts of ``pairs``, with one update per user.
+    Return a dictionary mapping each updated user to the ids of their
+    updated co-contributors.
+    """
+    increments = collections.defaultdict(collections.Counter)
+    for user_id, other_id in pairs:
+        increments[user_id][other_id] += amount
+        increments[other_id][user_id] += amount
+    collection = get_collection()
+    for user_id, counts in increments.iteritems():
+        collection.update(
+            {'_id': user_id},
+            {'$inc': {
+                'counts.{0}'.format(other_id): count
+                for other_id, count in counts.iteritems()
+            }},
+            upsert=True,
+            manipulate=False,
+        )
+    return increments
+
+
+def _prune(other_ids_by_user):
+    """Remove the counts of users who no longer share a project, out of the
+    given co-contributors of each user.
+    """
+    collection = get_collection()
+    found = collection.find(
+        {'_id': {'$in': list(other_ids_by_user)}},
+        {'counts': True},
+    )
+    for each in found:
+        counts = each.get('counts') or {}
+        keys = [
+            'counts.{0}'.format(other_id)
+            for other_id in other_ids_by_user[each['_id']]
+            if counts.get(other_id, 0) <= 0
+        ]
+        if keys:
+            # Only if no count was incremented meanwhile
+            query = {key: {'$lte': 0} for key in keys}
+            query['_id'] = each['_id']
+            collection.update(query, {'$unset': dict.fromkeys(keys, True)})
+
+
+def _pairs(changed, unchanged):
+    """Unordered pairs that involve at least one of ``changed``."""
+    return itertools.chain(
+        itertools.product(changed, unchanged),
+        itertools.combinations(changed, 2),
+    )
+
+
+def update_contributors(old_ids, new_ids):
+    """Record that a node's contributors changed from ``old_ids`` to
+    ``new_ids``.
+    """
+    old_ids, new_ids = set(old_ids), set(new_ids)
+    added = sorted(new_ids - old_ids)
+    removed = sorted(old_ids - new_ids)
+    kept = sorted(old_ids & new_ids)
+    if added:
+        _increment(_pairs(added, kept), 1)
+    if removed:
+        _prune(_increment(_pairs(removed, kept), -1))
+
+
+def get_counts(user_id, other_ids):
+    """Return a dictionary mapping each of ``other_ids`` to the number of
+    projects it shares with ``user_id``.
+    """
+    counts = dict.fromkeys(other_ids, 0)
+    if not other_ids:
+        return counts
+    found = get_collection().find_one(
+        {'_id': user_id},
+        {'counts.{0}'.format(other_id): True for other_id in other_ids},
+    )
+    counts.update((found or {}).get('counts') or {})
+    return counts
+
+
+def iter_top(user_id, exclude=None):
+    """Yield (user id, count) for the co-contributors of ``user_id``, most
+    shared projects first.
+
+    :param exclude: Ids of users to skip
+    """
+    exclude = set(exclude or [])
+    found = get_collection().find_one({'_id': user_id}, {'counts': True})
+    pairs = sorted(
+        (
+            (other_id, count)
+            for other_id, count in ((found or {}).get('counts') or {}).iteritems()
+            if count > 0 and other_id not in exclude
+        ),
+        key=lambda pair: (-pair[1], pair[0]),
+    )
+    for pair in pairs:
+        yield pair
+
+
+def rebuild(nodes):
+    """Recompute the index from scratch from ``nodes``.
+
+    :param nodes: Iterable of raw node documents with a ``contributors`` field
+    """
+    get_collection().remove()
+    for node in nodes:
+        update_contributors([], node.get('contributors') or [])
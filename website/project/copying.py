@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Plans for copying whole project trees with bulk writes.
+
+Forks and registrations copy a node, its children and their pointers. Doing
+so node by node saves each copy, then saves every object it refers to (each
+of its logs, tags and contributors) to record the back-reference, and saves
+each parent again once its children are copied. A `CopyPlan` instead
+collects the nodes to copy up front, one tree level at a time, so that
+subclasses can build every copy in memory and insert them with one write per
+model (see `framework.mongo.utils.insert_many`).
+"""
+
+from framework.mongo import insert_many, prefetch
+from framework.mongo.utils import get_unused_keys
+
+from website.project.permissions import PermissionResolver
+
+
+class CopyPlan(object):
+    """Base class for copies of a node and of its descendants. Deleted
+    children are skipped, and pointers are copied without copying the nodes
+    they point to.
+
+    :param Node node: Node to copy
+    :param Auth auth: Consolidated authorization
+    """
+
+    def __init__(self, node, auth):
+        self.auth = auth
+        self.original = node.load(node._primary_key)
+        # Nodes to copy, parents before children
+        self.nodes = []
+        # Children (nodes and pointers) to copy, in order, by node id
+        self.children = {}
+        # Status messages of add-ons, filled in by `execute`
+        self.messages = []
+        self._plan()
+
+    def include(self, node, resolver):
+        """Whether to copy the child ``node``. Subclasses may also raise to
+        refuse the whole copy.
+
+        :param PermissionResolver resolver: Resolver for the nodes of the
+            level of ``node``
+        """
+        return True
+
+    def _plan(self):
+        resolver = PermissionResolver(self.auth)
+        level = [self.original]
+        while level:
+            self.nodes.extend(level)
+            prefetch(level, 'nodes.node')
+            candidates = [
+                child
+                for node in level
+                for child in node.nodes
+                if child is not None and child.primary
+            ]
+            resolver.prefetch(candidates)
+            next_level = []
+            for node in level:
+                children = []
+                for child in node.nodes:
+                    if child is None:
+                        continue
+                    if not child.primary:
+                        if child.node is not None and not child.node.is_deleted:
+                            children.append(child)
+                        continue
+                    if child.is_deleted or not self.include(child, resolver):
+                        continue
+                    next_level.append(child)
+                    children.append(child)
+                self.children[node._id] = children
+            level = next_level
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def pre_order(self, node=None):
+        """Yield the nodes to copy, each parent followed by its children."""
+        node = node or self.original
+        yield node
+        for child in self.children[node._id]:
+            if child.primary:
+                for each in self.pre_order(child):
+                    yield each
+
+    def post_order(self, node=None):
+        """Yield the nodes to copy, children before their parents."""
+        node = node or self.original
+        for child in self.children[node._id]:
+            if child.primary:
+                for each in self.post_order(child):
+                    yield each
+        yield node
+
+    def copy_pointers(self):
+        """Clone the pointers among the children, with unused keys.
+
+        :return: Dictionary mapping the id of each pointer to its copy
+        """
+        from website.project.model import Pointer
+
+        pointers = {}
+        for node in self.nodes:
+            for child in self.children[node._id]:
+                if not child.primary:
+                    pointer = child.clone()
+                    pointer.node = child.node
+                    pointers[child._id] = pointer
+        keys = get_unused_keys(
+            lambda: Pointer._storage[0]._generate_random_id(5),
+            len(pointers),
+            Pointer,
+        )
+        for pointer, key in zip(pointers.values(), keys):
+            pointer._id = key
+        return pointers
+
+    def link(self, copies, pointers):
+        """Append the copies of children to the copies of their parents, in
+        order, and set the ancestry of each copy.
+
+        :param dict copies: Copies of the planned nodes, by original id
+        :param dict pointers: Copies of pointers; see `copy_pointers`
+        :return: Copy of the planned node
+        """
+        root = copies[self.original._id]
+        root.ancestor_ids = []
+        root.root_id = root._id
+        for node in self.nodes:
+            copy = copies[node._id]
+            for child in self.children[node._id]:
+                if child.primary:
+                    child_copy = copies[child._id]
+                    child_copy.ancestor_ids = [copy._id] + list(copy.ancestor_ids)
+                    child_copy.root_id = root._id
+                    copy.nodes.append(child_copy)
+                else:
+                    copy.nodes.append(pointers[child._id])
+        return root
+
+    def run_addon_callbacks(self, name, original, copy):
+        """Call the add-on callback ``name`` (e.g. ``'after_fork'``) of each
+        add-on of ``original``, and insert the settings clones they leave
+        unsaved together. Messages are added to `messages`.
+        """
+        clones = []
+        for addon in original.get_addons():
+            clone, message = getattr(addon, name)(original, copy, self.auth.user, save=False)
+            if clone is not None and not clone._is_loaded:
+                clones.append(clone)
+            if message:
+                self.messages.append(message)
+        insert_many(clones)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Fork whole project trees with bulk writes.
+
+A `ForkPlan` collects the nodes the user may fork up front (see
+`website.project.copying`), builds all forks in memory, and inserts the
+forks, their GUIDs, pointers and logs with one write per model before running
+the ``after_fork`` callbacks of add-ons. The forked nodes are the same as
+those of the recursive fork.
+
+Large trees can be forked by a Celery worker instead; see `fork_node_async`.
+"""
+
+import uuid
+import datetime
+
+from framework.auth import Auth
+from framework.analytics import increment_user_activity_counters
+from framework.analytics import tasks as piwik_tasks
+from framework.exceptions import PermissionsError
+from framework.guid.model import ensure_guids
+from framework.mongo import insert_many
+from framework.tasks import app
+from framework.tasks.handlers import enqueue_task
+from framework.transactions.context import transaction
+
+from website import settings
+from website.exceptions import NodeStateError
+from website.project import cocontributors
+from website.project.copying import CopyPlan
+from website.util.permissions import CREATOR_PERMISSIONS, READ
+
+
+def check_can_fork(node, user):
+    """:raises: PermissionsError if ``user`` may not fork ``node``"""
+    # Non-contributors can't fork private nodes
+    if not (node.is_public or node.has_permission(user, READ)):
+        raise PermissionsError('{0!r} does not have permission to fork node {1!r}'.format(user, node._id))
+
+
+class ForkPlan(CopyPlan):
+    """Fork of a node and of the descendants the user may read, planned
+    before anything is written ::
+
+        fork = ForkPlan(node, auth).execute()
+
+    :param Node node: Node to fork
+    :param Auth auth: Consolidated authorization
+    :param str title: Text to prepend to the title of the fork
+    :raises: PermissionsError if the user cannot read ``node``
+    """
+
+    def __init__(self, node, auth, title='Fork of '):
+        check_can_fork(node, auth.user)
+        if node.is_deleted:
+            raise NodeStateError('Cannot fork deleted node.')
+        self.title = title
+        super(ForkPlan, self).__init__(node, auth)
+
+    def include(self, node, resolver):
+        # Omit the children the user cannot read
+        return node.is_public or resolver.has_permission(node, READ)
+
+    def _clone(self, original, when):
+        user = self.auth.user
+        # Note: Cloning a node copies its `wiki_pages_current` and
+        # `wiki_pages_versions` fields, but does not clone the underlying
+        # database objects to which these dictionaries refer. This means that
+        # the cloned node must pass itself to its wiki objects to build the
+        # correct URLs to that content.
+        forked = original.clone()
+
+        forked.logs = original.logs
+        forked.inherit_logs(original, when)
+        forked.tags = original.tags
+
+        title = self.title if original is self.original else ''
+        forked.title = title + forked.title
+        forked.is_fork = True
+        forked.is_registration = False
+        forked.forked_date = when
+        forked.forked_from = original
+        forked.creator = user
+        forked.piwik_site_id = None
+
+        # Forks default to private status
+        forked.is_public = False
+
+        # Clear permissions before adding users
+        forked.permissions = {}
+        forked.visible_contributor_ids = []
+
+        forked.add_contributor(
+            contributor=user,
+            permissions=CREATOR_PERMISSIONS,
+            log=False,
+            save=False
+        )
+        return forked
+
+    def execute(self, progress=None):
+        """Write the forks and run the ``after_fork`` callbacks of add-ons.
+
+        :param progress: Optional callable, passed the number of nodes whose
+            add-ons have been forked and the total number of nodes
+        :return: Fork of the planned node
+        """
+        from website.project.model import Node, NodeLog
+
+        user = self.auth.user
+        when = datetime.datetime.utcnow()
+        total = len(self.nodes)
+
+        forks = {}
+        log_params = {}
+        for original in self.nodes:
+            forked = self._clone(original, when)
+            forks[original._id] = forked
+            log_params[original._id] = {
+                'parent_node': original.parent_id,
+                'node': original._primary_key,
+                'registration': forked._primary_key,
+            }
+        ensure_guids(forks.values())
+
+        pointers = self.copy_pointers()
+        root = self.link(forks, pointers)
+        logs = []
+        for original in self.nodes:
+            forked = forks[original._id]
+            log = NodeLog(
+                action=NodeLog.NODE_FORKED,
+                user=user,
+                params=log_params[original._id],
+                node_id=forked._id,
+                root_id=root._id,
+                date=when,
+            )
+            logs.append(log)
+            if settings.EMBED_NODE_LOG_IDS:
+                forked.logs.append(log)
+            forked.date_modified = when
+            forked.adjust_permissions()
+
+        insert_many(logs + pointers.values() + [forks[original._id] for original in self.nodes])
+
+        for original in self.nodes:
+            forked = forks[original._id]
+            cocontributors.update_contributors([], forked.contributors._to_primary_keys())
+            if settings.PIWIK_HOST:
+                piwik_tasks.update_node(forked._id, set(Node._fields.keys()))
+            increment_user_activity_counters(user._primary_key, NodeLog.NODE_FORKED, when)
+
+        # After fork callbacks, children first
+        done = 0
+        for original in self.post_order():
+            self.run_addon_callbacks('after_fork', original, forks[original._id])
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+        return root
+
+
+@app.task(bind=True)
+@transaction()
+def fork_node_task(self, node_id, user_id, title='Fork of '):
+    from website import models
+
+    def report(done, total):
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    node = models.Node.load(node_id)
+    plan = ForkPlan(node, Auth(user=models.User.load(user_id)), title=title)
+    return plan.execute(progress=report)._id
+
+
+def fork_node_async(node, auth, title='Fork of '):
+    """Fork ``node`` in a Celery worker once the current request ends.
+
+    :raises: PermissionsError if the user cannot read ``node``
+    :return: Id of the task; see `get_fork_progress`
+    """
+    check_can_fork(node, auth.user)
+    if node.is_deleted:
+        raise NodeStateError('Cannot fork deleted node.')
+    task_id = str(uuid.uuid4())
+    enqueue_task(fork_node_task.si(node._id, auth.user._id, title).set(task_id=task_id))
+    return task_id
+
+
+def get_fork_progress(task_id):
+    """Return the state of a fork started by `fork_node_async`, the number
+    of nodes done and in total, and the id of the fork once it is finished.
+    """
+    result = app.AsyncResult(task_id)
+    info = result.info if isinstance(result.info, dict) else {}
+    return {
+        'state': result.state,
+        'done': info.get('done', 0),
+        'total': info.get('total'),
+        'fork_id': result.result if result.successful() else None,
+    }
@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
 import re
-import urllib
 import logging
 import datetime
+import calendar
 import urlparse
 from collections import OrderedDict
 import warnings
 
 import pytz
+import pymongo
 from flask import request
 from django.core.urlresolvers import reverse
 
@@ -22,6 +23,7 @@ from api.base.utils import absolute_reverse
 from framework import status
 from framework.mongo import ObjectId
 from framework.mongo import StoredObject
+from framework.mongo import load_many
 from framework.addons import AddonModelMixin
 from framework.auth import get_user, User, Auth
 from framework.auth import signals as auth_signals
@@ -29,7 +31,7 @@ from framework.exceptions import PermissionsError
 from framework.guid.model import GuidStoredObject
 from framework.auth.utils import privacy_info_handle
 from framework.analytics import tasks as piwik_tasks
-from framework.mongo.utils import to_mongo, to_mongo_key, unique_on
+from framework.mongo.utils import to_mongo_key, unique_on
 from framework.analytics import (
     get_basic_counters, increment_user_activity_counters
 )
@@ -53,6 +55,10 @@ from website.util.permissions import CREATOR_PERMISSIONS
 from website.project.metadata.schemas import OSF_META_SCHEMAS
 from website.util.permissions import DEFAULT_CONTRIBUTOR_PERMISSIONS
 from website.project import signals as project_signals
+from website.project import cocontributors
+from website.project import forking
+from website.project import registering
+from website.project.permissions import PermissionResolver, get_active_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -259,6 +265,50 @@ class Comment(GuidStoredObject):
             self.save()
 
 
+def make_log_cursor(log):
+    """Return an opaque keyset-pagination cursor pointing at ``log``."""
+    timestamp = calendar.timegm(log.date.utctimetuple()) * 10 ** 6 + log.date.microsecond
+    return '{0}-{1}'.format(timestamp, log._id)
+
+
+def parse_log_cursor(cursor):
+    """Parse a cursor from `make_log_cursor`.
+
+    :return: Tuple of (date, log id)
+    :raises: ValueError if the cursor is malformed
+    """
+    timestamp, log_id = cursor.split('-', 1)
+    timestamp = int(timestamp)
+    date = datetime.datetime.utcfromtimestamp(timestamp // 10 ** 6).replace(
+        microsecond=timestamp % 10 ** 6
+    )
+    return date, log_id
+
+
+def get_logs_page(query, cursor=None, size=10):
+    """Keyset pagination over logs matching ``query``, newest first. Pages are
+    addressed by the `(date, _id)` of the last log of the previous page, so
+    neither a count nor a skip is needed.
+
+    :param query: Query for `NodeLog`
+    :param str cursor: Cursor returned for the previous page, or ``None`` for
+        the first page
+    :param int size: Page size
+    :return: Tuple of (list of logs, cursor for the next page or ``None``)
+    :raises: ValueError if the cursor is malformed
+    """
+    if cursor:
+        date, log_id = parse_log_cursor(cursor)
+        query = query & (
+            Q('date', 'lt', date) |
+            (Q('date', 'eq', date) & Q('_id', 'lt', log_id))
+        )
+    logs = list(NodeLog.find(query).sort('-date', '-_id').limit(size + 1))
+    if len(logs) > size:
+        return logs[:size], make_log_cursor(logs[size - 1])
+    return logs, None
+
+
 @unique_on(['params.node', '_id'])
 class NodeLog(StoredObject):
 
@@ -269,6 +319,30 @@ class NodeLog(StoredObject):
     params = fields.DictionaryField()
     should_hide = fields.BooleanField(default=False)
 
+    # The node this log was written to and the root of that node's tree at the
+    # time of writing. Lets logs be listed without the ids embedded in
+    # `Node.logs`; see `Node.get_logs_query`.
+    node_id = fields.StringField(index=True)
+    root_id = fields.StringField(index=True)
+
+    __indices__ = [
+        {
+            'key_or_list': [
+                ('node_id', pymongo.ASCENDING),
+                ('date', pymongo.DESCENDING),
+                ('_id', pymongo.DESCENDING),
+            ],
+        },
+        {
+            # Logs written before `node_id` are found through the backrefs
+            # maintained by `Node.logs`
+            'key_or_list': [
+                ('__backrefs.logged.node.logs', pymongo.ASCENDING),
+                ('date', pymongo.DESCENDING),
+            ],
+        },
+    ]
+
     was_connected_to = fields.ForeignField('node', list=True)
 
     user = fields.ForeignField('user', backref='created')
@@ -520,6 +594,11 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     #: Whether this is a pointer or not
     primary = True
 
+    # Keep loaded nodes in the object cache; see `framework.mongo.cache`
+    _cached_across_requests = True
+    # Deep URL only depends on the primary key; see `framework.guid.cache`
+    _stable_deep_url = True
+
     # Node fields that trigger an update to Solr on save
     SOLR_UPDATE_FIELDS = {
         'title',
@@ -562,6 +641,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     _id = fields.StringField(primary=True)
 
     date_created = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow, index=True)
+    # Date of the most recent log; set by `add_log`, and by `save` when logs
+    # are appended to `logs` directly
+    date_modified = fields.DateTimeField(index=True)
 
     # Privacy
     is_public = fields.BooleanField(default=False, index=True)
@@ -620,7 +702,18 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     # Tags for internal use
     system_tags = fields.StringField(list=True)
 
+    # Logs inherited by reference from the nodes this node was forked,
+    # registered or templated from, up to the date it was created:
+    # [{'node_id': <Node._id>, 'until': <datetime>}, ...]
+    log_sources = fields.DictionaryField(list=True)
+
     nodes = fields.AbstractForeignField(list=True, backref='parent')
+
+    # Ancestry index: ids of this node's ancestors, nearest parent first, and
+    # the id of the top-level node of its tree. Kept current on save; ``None``
+    # root_id means the node has not been backfilled yet.
+    ancestor_ids = fields.StringField(list=True, index=True)
+    root_id = fields.StringField(index=True)
     forked_from = fields.ForeignField('node', backref='forked', index=True)
     registered_from = fields.ForeignField('node', backref='registrations', index=True)
 
@@ -732,6 +825,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             raise ValueError('Must pass either `auth` or `user`')
         if auth and user:
             raise ValueError('Cannot pass both `auth` and `user`')
+        if auth:
+            resolver = get_active_resolver(auth)
+            if resolver is not None:
+                return resolver.can_edit(self)
         user = user or auth.user
         if auth:
             is_api_node = auth.api_node == self
@@ -748,16 +845,24 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                 yield contrib
 
     def is_admin_parent(self, user):
+        resolver = get_active_resolver(user=user)
+        if resolver is not None:
+            return resolver.is_admin_parent(self)
         if self.has_permission(user, 'admin', check_parent=False):
             return True
-        if self.parent_node:
-            return self.parent_node.is_admin_parent(user)
-        return False
+        return any(
+            parent.has_permission(user, 'admin', check_parent=False)
+            for parent in self.parents
+        )
 
     def can_view(self, auth):
         if not auth and not self.is_public:
             return False
 
+        resolver = get_active_resolver(auth)
+        if resolver is not None:
+            return resolver.can_view(self)
+
         return (
             self.is_public or
             (auth.user and self.has_permission(auth.user, 'read')) or
@@ -909,16 +1014,92 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def visible_contributors(self):
-        return [
-            User.load(_id)
-            for _id in self.visible_contributor_ids
-        ]
+        return load_many(User, self.visible_contributor_ids)
 
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """List of ancestors, nearest parent first. Stops at the first deleted
+        ancestor, matching `parent_node`.
+        """
+        if self.root_id is None:
+            # Ancestry not backfilled yet; walk the backrefs
+            if self.parent_node:
+                return [self.parent_node] + self.parent_node.parents
+            return []
+        ancestors = self._load_ancestors()
+        parents = []
+        for ancestor_id in self.ancestor_ids:
+            ancestor = ancestors.get(ancestor_id)
+            if ancestor is None or ancestor.is_deleted:
+                break
+            parents.append(ancestor)
+        return parents
+
+    def _load_ancestors(self):
+        """Load all ancestors with at most one query, reusing any that are
+        already in the identity map.
+
+        :return: Dict mapping node id to `Node`
+        """
+        ancestors = {}
+        missing = []
+        for ancestor_id in self.ancestor_ids:
+            cached = Node._load_from_cache(ancestor_id)
+            if cached is not None:
+                ancestors[ancestor_id] = cached
+            else:
+                missing.append(ancestor_id)
+        if missing:
+            for ancestor in Node.find(Q('_id', 'in', missing)):
+                ancestors[ancestor._id] = ancestor
+        return ancestors
+
+    def get_ancestry(self):
+        """Compute ancestry from the parent backref.
+
+        :return: Tuple of (ancestor ids, root id)
+        """
+        if not self.node__parent:
+            return [], self._id
+        parent = self.node__parent[0]
+        if parent.root_id is None:
+            ancestor_ids, root_id = parent.get_ancestry()
+        else:
+            ancestor_ids, root_id = parent.ancestor_ids, parent.root_id
+        return [parent._id] + list(ancestor_ids), root_id
+
+    def update_ancestry(self, save=True):
+        """Recompute `ancestor_ids` and `root_id` from the parent backref.
+        Saving propagates the change to descendants.
+
+        :return: Whether the ancestry changed
+        """
+        ancestor_ids, root_id = self.get_ancestry()
+        if self.root_id == root_id and list(self.ancestor_ids) == ancestor_ids:
+            return False
+        self.ancestor_ids = ancestor_ids
+        self.root_id = root_id
+        if save:
+            self.save()
+        return True
+
+    def _update_child_ancestry(self, check_removed=True):
+        """Push this node's ancestry down to its primary children, and reset
+        the ancestry of nodes that are no longer children of this node.
+        """
+        ancestor_ids = [self._id] + list(self.ancestor_ids)
+        for child in self.nodes_primary:
+            if child.root_id == self.root_id and list(child.ancestor_ids) == ancestor_ids:
+                continue
+            child.ancestor_ids = ancestor_ids
+            child.root_id = self.root_id
+            child.save()
+        if not check_removed:
+            return
+        child_ids = set(self.node_ids)
+        for former in Node.find(Q('ancestor_ids', 'eq', self._id)):
+            if former.ancestor_ids[0] == self._id and former._id not in child_ids:
+                former.update_ancestry()
 
     @property
     def admin_contributor_ids(self, contributors=None):
@@ -935,7 +1116,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     @property
     def admin_contributors(self):
         return sorted(
-            [User.load(_id) for _id in self.admin_contributor_ids],
+            load_many(User, self.admin_contributor_ids),
             key=lambda user: user.family_name,
         )
 
@@ -1045,6 +1226,29 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                      auth=auth)
         return updated
 
+    def _get_stored_contributor_ids(self):
+        """Contributor ids as last saved, used to find which contributors a
+        save adds or removes.
+        """
+        stored = self._get_cached_data(self._stored_key)
+        if stored is None:
+            stored = self._storage[0].store.find_one(
+                {'_id': self._stored_key}, {'contributors': True}
+            ) or {}
+        return stored.get('contributors') or []
+
+    def _update_date_modified_from_logs(self):
+        """Move `date_modified` to the date of the last log if logs were
+        appended to `logs` directly rather than through `add_log`.
+        """
+        stored = self._get_cached_data(self._stored_key) or {}
+        log_ids = self.logs._to_primary_keys()
+        if not log_ids or stored.get('logs') == log_ids:
+            return
+        last_date = self.logs[-1].date
+        if last_date and last_date > self.date_modified:
+            self.date_modified = last_date
+
     def save(self, *args, **kwargs):
         update_piwik = kwargs.pop('update_piwik', True)
         self.adjust_permissions()
@@ -1065,8 +1269,31 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         else:
             suppress_log = False
 
+        if self.date_modified is None:
+            self.date_modified = self.get_last_log_date()
+        elif not first_save:
+            self._update_date_modified_from_logs()
+
+        if first_save:
+            # Clones copy the ancestry of their source; a new node starts as
+            # the root of its own tree until it is appended to a parent.
+            self._ensure_guid()
+            self.ancestor_ids = []
+            self.root_id = self._id
+
+        old_contributor_ids = [] if first_save else self._get_stored_contributor_ids()
+
         saved_fields = super(Node, self).save(*args, **kwargs)
 
+        if 'contributors' in saved_fields:
+            cocontributors.update_contributors(
+                old_contributor_ids,
+                self.contributors._to_primary_keys(),
+            )
+
+        if self.root_id is not None and {'nodes', 'ancestor_ids', 'root_id'}.intersection(saved_fields):
+            self._update_child_ancestry(check_removed=not first_save and 'nodes' in saved_fields)
+
         if first_save and is_original and not suppress_log:
             # TODO: This logic also exists in self.use_as_template()
             for addon in settings.ADDONS_AVAILABLE:
@@ -1135,6 +1362,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             attributes = dict()
 
         new = self.clone()
+        new.inherit_logs(self, datetime.datetime.utcnow())
 
         # clear permissions, which are not cleared by the clone method
         new.permissions = {}
@@ -1342,12 +1570,25 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                     if include(descendant):
                         yield descendant
 
+    def get_aggregate_logs_query(self, auth):
+        """Query for the logs of this node and of every descendant that
+        ``auth`` can view.
+        """
+        descendants = list(self.get_descendants_recursive())
+        resolver = PermissionResolver(auth, descendants)
+        nodes = [self] + [n.resolve() for n in descendants if resolver.can_view(n)]
+        ids = [n._id for n in nodes]
+        query = (
+            Q('node_id', 'in', ids) |
+            Q('__backrefs.logged.node.logs', 'in', ids)
+        )
+        for node in nodes:
+            for source_query in node._get_log_source_queries():
+                query = query | source_query
+        return query
+
     def get_aggregate_logs_queryset(self, auth):
-        ids = [self._id] + [n._id
-                            for n in self.get_descendants_recursive()
-                            if n.can_view(auth)]
-        query = Q('__backrefs.logged.node.logs', 'in', ids)
-        return NodeLog.find(query).sort('-_id')
+        return NodeLog.find(self.get_aggregate_logs_query(auth)).sort('-date', '-_id')
 
     @property
     def nodes_pointer(self):
@@ -1457,23 +1698,57 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         # Return forked content
         return forked
 
+    def _get_log_source_queries(self):
+        return [
+            Q('node_id', 'eq', source['node_id']) & Q('date', 'lte', source['until'])
+            for source in self.log_sources
+        ]
+
+    def get_logs_query(self):
+        """Query for this node's logs: logs written to it, logs linked through
+        the embedded `logs` list, and logs inherited from `log_sources`.
+        """
+        query = (
+            Q('node_id', 'eq', self._id) |
+            Q('__backrefs.logged.node.logs', 'eq', self._id)
+        )
+        for source_query in self._get_log_source_queries():
+            query = query | source_query
+        return query
+
+    def inherit_logs(self, original, until):
+        """Share the logs of ``original`` written up to ``until`` without
+        copying their ids. Used by forks, registrations and templates.
+        """
+        self.log_sources = [
+            {'node_id': source['node_id'], 'until': min(source['until'], until)}
+            for source in original.log_sources
+        ] + [{'node_id': original._id, 'until': until}]
+
+    @property
+    def log_count(self):
+        if settings.EMBED_NODE_LOG_IDS:
+            return len(self.logs)
+        return NodeLog.find(self.get_logs_query()).count()
+
     def get_recent_logs(self, n=10):
         """Return a list of the n most recent logs, in reverse chronological
         order.
 
         :param int n: Number of logs to retrieve
         """
-        return list(reversed(self.logs)[:n])
+        if settings.EMBED_NODE_LOG_IDS:
+            return list(reversed(self.logs)[:n])
+        return get_logs_page(self.get_logs_query(), size=n)[0]
 
-    @property
-    def date_modified(self):
-        '''The most recent datetime when this node was modified, based on
-        the logs.
-        '''
+    def get_last_log_date(self):
+        """The date of the most recent log, or the creation date if the node
+        has no logs. Used to compute `date_modified` for nodes that predate it.
+        """
         try:
-            return self.logs[-1].date
+            return self.get_recent_logs(1)[0].date
         except IndexError:
-            return self.date_created
+            return self.date_created or datetime.datetime.utcnow()
 
     def set_title(self, title, auth, save=False):
         """Set the title of this Node and log it.
@@ -1527,6 +1802,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     def update_search(self):
         from website import search
+        from website.search import indexing
+        if indexing.is_async():
+            indexing.enqueue(indexing.NODE, self._id)
+            return
         try:
             search.search.update_node(self)
         except search.exceptions.SearchUnavailableError as e:
@@ -1607,164 +1886,32 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         return True
 
     def fork_node(self, auth, title='Fork of '):
-        """Recursively fork a node.
+        """Recursively fork a node. Children the user cannot read are
+        omitted; see `website.project.forking`.
 
         :param Auth auth: Consolidated authorization
         :param str title: Optional text to prepend to forked title
         :return: Forked node
         """
-        user = auth.user
-
-        # Non-contributors can't fork private nodes
-        if not (self.is_public or self.has_permission(user, 'read')):
-            raise PermissionsError('{0!r} does not have permission to fork node {1!r}'.format(user, self._id))
-
-        when = datetime.datetime.utcnow()
-
-        original = self.load(self._primary_key)
-
-        if original.is_deleted:
-            raise NodeStateError('Cannot fork deleted node.')
-
-        # Note: Cloning a node copies its `wiki_pages_current` and
-        # `wiki_pages_versions` fields, but does not clone the underlying
-        # database objects to which these dictionaries refer. This means that
-        # the cloned node must pass itself to its wiki objects to build the
-        # correct URLs to that content.
-        forked = original.clone()
-
-        forked.logs = self.logs
-        forked.tags = self.tags
-
-        # Recursively fork child nodes
-        for node_contained in original.nodes:
-            if not node_contained.is_deleted:
-                forked_node = None
-                try:  # Catch the potential PermissionsError above
-                    forked_node = node_contained.fork_node(auth=auth, title='')
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-                if forked_node is not None:
-                    forked.nodes.append(forked_node)
-
-        forked.title = title + forked.title
-        forked.is_fork = True
-        forked.is_registration = False
-        forked.forked_date = when
-        forked.forked_from = original
-        forked.creator = user
-        forked.piwik_site_id = None
-
-        # Forks default to private status
-        forked.is_public = False
-
-        # Clear permissions before adding users
-        forked.permissions = {}
-        forked.visible_contributor_ids = []
-
-        forked.add_contributor(
-            contributor=user,
-            permissions=CREATOR_PERMISSIONS,
-            log=False,
-            save=False
-        )
-
-        forked.add_log(
-            action=NodeLog.NODE_FORKED,
-            params={
-                'parent_node': original.parent_id,
-                'node': original._primary_key,
-                'registration': forked._primary_key,
-            },
-            auth=auth,
-            log_date=when,
-            save=False,
-        )
-
-        forked.save()
-        # After fork callback
-        for addon in original.get_addons():
-            _, message = addon.after_fork(original, forked, user)
-            if message:
-                status.push_status_message(message, kind='info', trust=True)
-
+        plan = forking.ForkPlan(self, auth, title=title)
+        forked = plan.execute()
+        for message in plan.messages:
+            status.push_status_message(message, kind='info', trust=True)
         return forked
 
-    def register_node(self, schema, auth, template, data, parent=None):
-        """Make a frozen copy of a node.
+    def register_node(self, schema, auth, template, data):
+        """Make a frozen copy of a node and of its children; see
+        `website.project.registering`.
 
         :param schema: Schema object
         :param auth: All the auth information including user, API key.
         :param template: Template name
         :param data: Form data
-        :param parent Node: parent registration of registration to be created
         """
-        # NOTE: Admins can register child nodes even if they don't have write access them
-        if not self.can_edit(auth=auth) and not self.is_admin_parent(user=auth.user):
-            raise PermissionsError(
-                'User {} does not have permission '
-                'to register this node'.format(auth.user._id)
-            )
-        if self.is_folder:
-            raise NodeStateError("Folders may not be registered")
-
-        template = urllib.unquote_plus(template)
-        template = to_mongo(template)
-
-        when = datetime.datetime.utcnow()
-
-        original = self.load(self._primary_key)
-
-        # Note: Cloning a node copies its `wiki_pages_current` and
-        # `wiki_pages_versions` fields, but does not clone the underlying
-        # database objects to which these dictionaries refer. This means that
-        # the cloned node must pass itself to its wiki objects to build the
-        # correct URLs to that content.
-        if original.is_deleted:
-            raise NodeStateError('Cannot register deleted node.')
-
-        registered = original.clone()
-
-        registered.is_registration = True
-        registered.registered_date = when
-        registered.registered_user = auth.user
-        registered.registered_schema = schema
-        registered.registered_from = original
-        if not registered.registered_meta:
-            registered.registered_meta = {}
-        registered.registered_meta[template] = data
-
-        registered.contributors = self.contributors
-        registered.forked_from = self.forked_from
-        registered.creator = self.creator
-        registered.logs = self.logs
-        registered.tags = self.tags
-        registered.piwik_site_id = None
-
-        registered.save()
-
-        if parent:
-            registered.parent_node = parent
-
-        # After register callback
-        for addon in original.get_addons():
-            _, message = addon.after_register(original, registered, auth.user)
-            if message:
-                status.push_status_message(message, kind='info', trust=False)
-
-        for node_contained in original.nodes:
-            if not node_contained.is_deleted:
-                child_registration = node_contained.register_node(
-                    schema, auth, template, data, parent=registered
-                )
-                if child_registration and not child_registration.primary:
-                    registered.nodes.append(child_registration)
-
-        registered.save()
-
-        if settings.ENABLE_ARCHIVER:
-            project_signals.after_create_registration.send(self, dst=registered, user=auth.user)
-
+        plan = registering.RegistrationPlan(self, auth, schema, template, data)
+        registered = plan.execute()
+        for message in plan.messages:
+            status.push_status_message(message, kind='info', trust=False)
         return registered
 
     def remove_tag(self, tag, auth, save=True):
@@ -1806,16 +1953,23 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     def add_log(self, action, params, auth, foreign_user=None, log_date=None, save=True):
         user = auth.user if auth else None
         params['node'] = params.get('node') or params.get('project')
+        if self._primary_key is None:
+            # Unsaved clones (forks) need an id to attach logs to
+            self._ensure_guid()
         log = NodeLog(
             action=action,
             user=user,
             foreign_user=foreign_user,
             params=params,
+            node_id=self._id,
+            root_id=self.root_id if self._is_loaded else self._id,
         )
         if log_date:
             log.date = log_date
         log.save()
-        self.logs.append(log)
+        if settings.EMBED_NODE_LOG_IDS:
+            self.logs.append(log)
+        self.date_modified = log.date
         if save:
             self.save()
         if user:
@@ -1891,8 +2045,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if doi:
             csl['DOI'] = doi
 
-        if self.logs:
-            csl['issued'] = datetime_to_csl(self.logs[-1].date)
+        if self.date_modified:
+            csl['issued'] = datetime_to_csl(self.date_modified)
 
         return csl
 
@@ -1943,6 +2097,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def root(self):
+        if self.root_id is not None:
+            parents = self.parents
+            return parents[-1] if parents else self
         if self.parent_node:
             return self.parent_node.root
         else:
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Batch permission checks across many nodes.
+
+Checking `Node.can_view` one node at a time loads each node's ancestors and
+private links separately. A `PermissionResolver` prefetches everything needed
+for a collection of nodes in a few bulk queries and answers read, write and
+admin checks from memory. While a resolver is active (see
+`PermissionResolver.__enter__`), `Node.can_view`, `Node.can_edit` and
+`Node.is_admin_parent` delegate to it for matching auth.
+"""
+
+from weakref import WeakKeyDictionary
+
+from modularodm import Q
+
+from framework.mongo import get_cache_key
+
+from website.util.permissions import READ, WRITE, ADMIN
+
+
+# Stack of active resolvers per request
+_active = WeakKeyDictionary()
+
+
+def get_active_resolver(auth=None, user=None):
+    """Return the innermost active resolver that answers for ``auth`` (or for
+    ``user``), or ``None``.
+    """
+    for resolver in reversed(_active.get(get_cache_key(), [])):
+        if auth is not None and resolver.matches(auth):
+            return resolver
+        if user is not None and auth is None and resolver.auth.user == user:
+            return resolver
+    return None
+
+
+class PermissionResolver(object):
+    """Answer permission checks for ``auth`` across a collection of nodes.
+
+    Results are computed once per node and reused, so activate a resolver
+    only around code that does not change permissions, e.g. ::
+
+        with PermissionResolver(auth, nodes) as resolver:
+            visible = [node for node in nodes if resolver.can_view(node)]
+
+    :param Auth auth: Consolidated authorization
+    :param nodes: Nodes (or pointers) to prefetch
+    """
+
+    def __init__(self, auth, nodes=None):
+        self.auth = auth
+        self._nodes = {}
+        self._ancestors = {}
+        self._link_node_ids = None
+        self._results = {}
+        if nodes:
+            self.prefetch(nodes)
+
+    def __enter__(self):
+        _active.setdefault(get_cache_key(), []).append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stack = _active.get(get_cache_key(), [])
+        if self in stack:
+            stack.remove(self)
+
+    @property
+    def user(self):
+        return self.auth.user if self.auth else None
+
+    def matches(self, auth):
+        return (
+            auth is self.auth or (
+                self.auth is not None and
+                auth.user == self.auth.user and
+                auth.private_key == self.auth.private_key and
+                auth.api_node == self.auth.api_node
+            )
+        )
+
+    def prefetch(self, nodes):
+        """Load the ancestors of ``nodes`` and the nodes shared through the
+        active private link, if any, with one query each.
+        """
+        from website.project.model import Node
+
+        missing = set()
+        for node in nodes:
+            node = node.resolve() if node is not None else None
+            if node is None or node._id in self._nodes:
+                continue
+            self._nodes[node._id] = node
+            for ancestor_id in node.ancestor_ids or []:
+                if ancestor_id in self._ancestors:
+                    continue
+                cached = Node._load_from_cache(ancestor_id)
+                if cached is not None:
+                    self._ancestors[ancestor_id] = cached
+                else:
+                    missing.add(ancestor_id)
+        if missing:
+            for ancestor in Node.find(Q('_id', 'in', list(missing))):
+                self._ancestors[ancestor._id] = ancestor
+        self._load_private_link()
+
+    def _load_private_link(self):
+        from website.project.model import PrivateLink
+
+        if self._link_node_ids is not None:
+            return
+        self._link_node_ids = set()
+        private_key = self.auth.private_key if self.auth else None
+        if not private_key:
+            return
+        links = PrivateLink.find(
+            Q('key', 'eq', private_key) &
+            Q('is_deleted', 'eq', False)
+        )
+        for link in links:
+            self._link_node_ids.update(link.nodes._to_primary_keys())
+
+    def _parents(self, node):
+        if node.root_id is None:
+            # Ancestry not backfilled yet; let the node walk its backrefs
+            return node.parents
+        missing = [
+            ancestor_id for ancestor_id in node.ancestor_ids
+            if ancestor_id not in self._ancestors
+        ]
+        if missing:
+            self.prefetch([node])
+        parents = []
+        for ancestor_id in node.ancestor_ids:
+            ancestor = self._ancestors.get(ancestor_id)
+            if ancestor is None or ancestor.is_deleted:
+                break
+            parents.append(ancestor)
+        return parents
+
+    def _memoize(self, check, node, compute):
+        key = (check, node._id)
+        if key not in self._results:
+            self._results[key] = compute(node)
+        return self._results[key]
+
+    def _has_own_permission(self, node, permission):
+        user = self.user
+        return user is not None and permission in node.permissions.get(user._id, [])
+
+    def is_admin_parent(self, node):
+        node = node.resolve()
+        return self._memoize(ADMIN, node, lambda node: (
+            self._has_own_permission(node, ADMIN) or
+            any(
+                self._has_own_permission(parent, ADMIN)
+                for parent in self._parents(node)
+            )
+        ))
+
+    def has_permission(self, node, permission):
+        """Mirror `Node.has_permission`: read access is inherited from admins
+        of ancestor nodes, other permissions are not.
+        """
+        node = node.resolve()
+        if self._has_own_permission(node, permission):
+            return True
+        if permission == READ and self.user is not None:
+            return self.is_admin_parent(node)
+        return False
+
+    def can_view(self, node):
+        node = node.resolve()
+        self._load_private_link()
+        return self._memoize(READ, node, lambda node: (
+            node.is_public or
+            self.has_permission(node, READ) or
+            node._id in self._link_node_ids
+        ))
+
+    def can_edit(self, node):
+        node = node.resolve()
+        return self._memoize(WRITE, node, lambda node: bool(
+            self.has_permission(node, WRITE) or
+            (self.auth is not None and self.auth.api_node == node)
+        ))
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Register whole project trees with bulk writes.
+
+A `RegistrationPlan` collects the nodes to register up front (see
+`website.project.copying`), builds all registrations in memory, and inserts
+the registrations, their GUIDs and pointers with one write per model before
+running the ``after_register`` callbacks of add-ons. Every registration of the
+tree shares the same registration date.
+"""
+
+import urllib
+import datetime
+
+from framework.exceptions import PermissionsError
+from framework.analytics import tasks as piwik_tasks
+from framework.guid.model import ensure_guids
+from framework.mongo import insert_many
+from framework.mongo.utils import to_mongo
+
+from website import settings
+from website.exceptions import NodeStateError
+from website.project import cocontributors
+from website.project import signals as project_signals
+from website.project.copying import CopyPlan
+
+
+def check_can_register(node, auth, can_edit, is_admin_parent):
+    """:raises: PermissionsError or NodeStateError if ``node`` may not be
+    registered
+    """
+    # NOTE: Admins can register child nodes even if they don't have write access them
+    if not can_edit and not is_admin_parent:
+        raise PermissionsError(
+            'User {} does not have permission '
+            'to register this node'.format(auth.user._id)
+        )
+    if node.is_folder:
+        raise NodeStateError("Folders may not be registered")
+
+
+class RegistrationPlan(CopyPlan):
+    """Registration of a node and of its descendants, planned before anything
+    is written ::
+
+        registration = RegistrationPlan(node, auth, schema, template, data).execute()
+
+    :param Node node: Node to register
+    :param Auth auth: Consolidated authorization
+    :param schema: Schema object
+    :param str template: Template name
+    :param data: Form data
+    :raises: PermissionsError if the user may not register ``node`` or one of
+        its children
+    """
+
+    def __init__(self, node, auth, schema, template, data):
+        check_can_register(
+            node, auth,
+            node.can_edit(auth=auth), node.is_admin_parent(user=auth.user),
+        )
+        if node.is_deleted:
+            raise NodeStateError('Cannot register deleted node.')
+        self.schema = schema
+        self.template = to_mongo(urllib.unquote_plus(template))
+        self.data = data
+        super(RegistrationPlan, self).__init__(node, auth)
+
+    def include(self, node, resolver):
+        check_can_register(
+            node, self.auth,
+            resolver.can_edit(node), resolver.is_admin_parent(node),
+        )
+        return True
+
+    def _clone(self, original, when):
+        # Note: Cloning a node copies its `wiki_pages_current` and
+        # `wiki_pages_versions` fields, but does not clone the underlying
+        # database objects to which these dictionaries refer. This means that
+        # the cloned node must pass itself to its wiki objects to build the
+        # correct URLs to that content.
+        registered = original.clone()
+
+        registered.is_registration = True
+        registered.registered_date = when
+        registered.registered_user = self.auth.user
+        registered.registered_schema = self.schema
+        registered.registered_from = original
+        if not registered.registered_meta:
+            registered.registered_meta = {}
+        registered.registered_meta[self.template] = self.data
+
+        registered.contributors = original.contributors
+        registered.forked_from = original.forked_from
+        registered.creator = original.creator
+        registered.logs = original.logs
+        registered.inherit_logs(original, when)
+        registered.date_modified = original.date_modified
+        registered.tags = original.tags
+        registered.piwik_site_id = None
+        return registered
+
+    def execute(self):
+        """Write the registrations and run the ``after_register`` callbacks
+        of add-ons.
+
+        :return: Registration of the planned node
+        """
+        from website.project.model import Node
+
+        when = datetime.datetime.utcnow()
+
+        registrations = {}
+        for original in self.nodes:
+            registrations[original._id] = self._clone(original, when)
+        ensure_guids(registrations.values())
+
+        pointers = self.copy_pointers()
+        root = self.link(registrations, pointers)
+        insert_many(pointers.values() + [registrations[original._id] for original in self.nodes])
+
+        for original in self.nodes:
+            registered = registrations[original._id]
+            cocontributors.update_contributors([], registered.contributors._to_primary_keys())
+            if registered.is_public and not registered.is_folder:
+                registered.update_search()
+            if settings.PIWIK_HOST:
+                piwik_tasks.update_node(registered._id, set(Node._fields.keys()))
+
+        # After register callbacks, parents first
+        for original in self.pre_order():
+            self.run_addon_callbacks('after_register', original, registrations[original._id])
+
+        if settings.ENABLE_ARCHIVER:
+            project_signals.after_create_registration.send(
+                self.original, dst=root, user=self.auth.user,
+            )
+
+        return root
@@ -7,14 +7,16 @@ from flask import request
 from modularodm import Q
 
 from framework.exceptions import HTTPError
+from framework.guid.cache import guid_cache, load_referent
 from framework.auth.decorators import must_be_logged_in
 from framework.auth.utils import privacy_info_handle
 from framework.forms.utils import sanitize
+from framework.transactions.handlers import auto_transaction
 
 from website import settings
 from website.notifications.emails import notify
 from website.filters import gravatar
-from website.models import Guid, Comment
+from website.models import Comment
 from website.project.decorators import must_be_contributor_or_public
 from datetime import datetime
 from website.project.model import has_anonymous_link
@@ -24,10 +26,10 @@ def resolve_target(node, guid):
 
     if not guid:
         return node
-    target = Guid.load(guid)
-    if target is None:
+    referent_key = guid_cache.get_referent_key(guid)
+    if referent_key is None:
         raise HTTPError(http.BAD_REQUEST)
-    return target.referent
+    return load_referent(referent_key)
 
 
 def collect_discussion(target, users=None):
@@ -185,6 +187,7 @@ def is_reply(target):
     return isinstance(target, Comment)
 
 
+@auto_transaction
 @must_be_contributor_or_public
 def list_comments(auth, node, **kwargs):
     anonymous = has_anonymous_link(node, auth)
@@ -2,7 +2,6 @@
 import time
 import itertools
 import httplib as http
-from collections import Counter
 
 from flask import request
 from modularodm.exceptions import ValidationValueError
@@ -18,7 +17,8 @@ from framework.auth.signals import user_registered
 from framework.auth.core import generate_confirm_token
 from framework.auth.decorators import collect_auth, must_be_logged_in
 from framework.auth.forms import PasswordForm, SetEmailAndPasswordForm
-from framework.transactions.handlers import no_auto_transaction
+from framework.mongo.unit_of_work import unit_of_work
+from framework.transactions.context import on_commit, retry_on_conflict
 
 from website import mails
 from website import language
@@ -26,6 +26,7 @@ from website import security
 from website import settings
 from website.models import Node
 from website.profile import utils
+from website.project import cocontributors
 from website.project.model import has_anonymous_link
 from website.util import web_url_for, is_json_request
 from website.project.signals import unreg_contributor_added, contributor_added
@@ -146,19 +147,14 @@ def get_most_in_common_contributors(auth, node, **kwargs):
     except (TypeError, ValueError):
         n_contribs = settings.MAX_MOST_IN_COMMON_LENGTH
 
-    contrib_counts = Counter(contrib_id
-        for node in auth.user.node__contributed
-        for contrib_id in node.contributors._to_primary_keys()
-        if contrib_id not in node_contrib_ids)
+    contrib_counts = cocontributors.iter_top(auth.user._id, exclude=node_contrib_ids)
 
     active_contribs = itertools.ifilter(
-        lambda c: User.load(c[0]).is_active,
-        contrib_counts.most_common()
+        lambda c: c[0] is not None and c[0].is_active,
+        ((User.load(_id), count) for _id, count in contrib_counts)
     )
 
-    limited = itertools.islice(active_contribs, n_contribs)
-
-    contrib_objs = [(User.load(_id), count) for _id, count in limited]
+    contrib_objs = list(itertools.islice(active_contribs, n_contribs))
 
     contribs = [
         utils.add_contributor_json(most_contrib, auth.user)
@@ -226,6 +222,7 @@ def project_before_remove_contributor(auth, node, **kwargs):
     return {'prompts': prompts}
 
 
+@retry_on_conflict()
 @must_be_valid_project  # returns project
 @must_be_contributor
 @must_not_be_registration
@@ -252,9 +249,9 @@ def project_removecontributor(auth, node, **kwargs):
 
     if outcome:
         if auth.user == contributor:
-            status.push_status_message('Removed self from project', kind='success', trust=False)
+            on_commit(status.push_status_message, 'Removed self from project', kind='success', trust=False)
             return {'redirectUrl': web_url_for('dashboard')}
-        status.push_status_message('Contributor removed', kind='success', trust=False)
+        on_commit(status.push_status_message, 'Contributor removed', kind='success', trust=False)
         return {}
 
     raise HTTPError(
@@ -333,6 +330,7 @@ def finalize_invitation(node, contributor, auth):
 @must_be_valid_project
 @must_have_permission(ADMIN)
 @must_not_be_registration
+@unit_of_work
 def project_contributors_post(auth, node, **kwargs):
     """ Add contributors to a node. """
 
@@ -365,7 +363,7 @@ def project_contributors_post(auth, node, **kwargs):
     return {'status': 'success'}, 201
 
 
-@no_auto_transaction
+@retry_on_conflict()
 @must_be_valid_project  # injects project
 @must_have_permission(ADMIN)
 @must_not_be_registration
@@ -391,7 +389,8 @@ def project_manage_contributors(auth, node, **kwargs):
     # If user has removed herself from project, alert; redirect to user
     # dashboard if node is private, else node dashboard
     if not node.is_contributor(auth.user):
-        status.push_status_message(
+        on_commit(
+            status.push_status_message,
             'You have removed yourself as a contributor from this project',
             kind='success',
             trust=False
@@ -402,7 +401,8 @@ def project_manage_contributors(auth, node, **kwargs):
     # Else if user has revoked her admin permissions, alert and stay on
     # current page
     if not node.has_permission(auth.user, ADMIN):
-        status.push_status_message(
+        on_commit(
+            status.push_status_message,
             'You have removed your administrative privileges for this project',
             kind='success',
             trust=False
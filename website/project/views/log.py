@@ -11,7 +11,7 @@ from framework.transactions.handlers import no_auto_transaction
 
 
 from website.views import serialize_log, validate_page_num
-from website.project.model import NodeLog
+from website.project.model import NodeLog, get_logs_page
 from website.project.model import has_anonymous_link
 from website.project.decorators import must_be_valid_project
 
@@ -55,6 +55,30 @@ def _get_logs(node, count, auth, page=0):
 
     return logs, total, pages
 
+
+def _get_logs_page(node, count, auth, cursor=None):
+    """Keyset-paginated variant of `_get_logs`; does not count logs.
+
+    :return list: List of serialized logs,
+            str: cursor of the next page, or None if this is the last page
+
+    """
+    try:
+        logs, next_cursor = get_logs_page(
+            node.get_aggregate_logs_query(auth),
+            cursor=cursor,
+            size=count,
+        )
+    except ValueError:
+        raise HTTPError(http.BAD_REQUEST, data=dict(
+            message_long='Invalid value for "cursor".'
+        ))
+    anonymous = has_anonymous_link(node, auth)
+    return [
+        serialize_log(log, auth=auth, anonymous=anonymous)
+        for log in logs
+    ], next_cursor
+
 @no_auto_transaction
 @collect_auth
 @must_be_valid_project(retractions_valid=True)
@@ -81,6 +105,12 @@ def get_logs(auth, node, **kwargs):
     else:
         count = 10
 
+    # Clients passing `cursor` (empty for the first page) get keyset
+    # pagination, which skips counting the logs
+    if 'cursor' in request.args:
+        logs, next_cursor = _get_logs_page(node, count, auth, request.args['cursor'])
+        return {'logs': logs, 'next_cursor': next_cursor}
+
     # Serialize up to `count` logs in reverse chronological order; skip
     # logs that the current user / API key cannot access
     logs, total, pages = _get_logs(node, count, auth, page)
@@ -16,6 +16,7 @@ from framework.status import push_status_message
 from framework.mongo.utils import to_mongo
 from framework.forms.utils import process_payload, unprocess_payload
 from framework.auth.decorators import must_be_signed
+from framework.transactions.handlers import auto_transaction
 
 from website.archiver import ARCHIVER_SUCCESS, ARCHIVER_FAILURE
 
@@ -164,6 +165,7 @@ def _send_retraction_email(node, user):
             registration_link=registration_link
         )
 
+@auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_retraction_approve(auth, node, token, **kwargs):
@@ -198,6 +200,7 @@ def node_registration_retraction_approve(auth, node, token, **kwargs):
     status.push_status_message('Your approval has been accepted.', kind='success', trust=False)
     return redirect(node.web_url_for('view_project'))
 
+@auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 @must_be_public_registration
@@ -232,6 +235,7 @@ def node_registration_retraction_disapprove(auth, node, token, **kwargs):
     status.push_status_message('Your disapproval has been accepted and the retraction has been cancelled.', kind='success', trust=False)
     return redirect(node.web_url_for('view_project'))
 
+@auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_embargo_approve(auth, node, token, **kwargs):
@@ -265,6 +269,7 @@ def node_registration_embargo_approve(auth, node, token, **kwargs):
     status.push_status_message('Your approval has been accepted.', kind='success', trust=False)
     return redirect(node.web_url_for('view_project'))
 
+@auto_transaction
 @must_be_valid_project
 @must_have_permission(ADMIN)
 def node_registration_embargo_disapprove(auth, node, token, **kwargs):
@@ -3,7 +3,6 @@
 from __future__ import division
 
 import re
-import copy
 import math
 import logging
 import unicodedata
@@ -18,6 +17,8 @@ from elasticsearch import (
     helpers,
 )
 
+from modularodm import Q
+
 from framework import sentry
 
 from website import settings
@@ -85,36 +86,42 @@ def requires_search(func):
     return wrapped
 
 
-@requires_search
-def get_counts(count_query, clean=True):
-    count_query['aggregations'] = {
-        'counts': {
-            'terms': {
-                'field': '_type',
-            }
+AGGREGATIONS = {
+    'counts': {
+        'terms': {
+            'field': '_type',
         }
-    }
+    },
+    'tag_cloud': {
+        'terms': {'field': 'tags'}
+    },
+}
 
-    res = es.search(index=INDEX, doc_type=None, search_type='count', body=count_query)
 
-    counts = {x['key']: x['doc_count'] for x in res['aggregations']['counts']['buckets'] if x['key'] in ALIASES.keys()}
+def get_counts(aggregations):
+    counts = {x['key']: x['doc_count'] for x in aggregations['counts']['buckets'] if x['key'] in ALIASES.keys()}
 
     counts['total'] = sum([val for val in counts.values()])
     return counts
 
 
-@requires_search
-def get_tags(query, index):
-    query['aggregations'] = {
-        'tag_cloud': {
-            'terms': {'field': 'tags'}
-        }
-    }
+def get_tags(aggregations):
+    return aggregations['tag_cloud']['buckets']
 
-    results = es.search(index=index, doc_type=None, body=query)
-    tags = results['aggregations']['tag_cloud']['buckets']
 
-    return tags
+def build_search_body(query, doc_type=None):
+    """Add the count and tag aggregations to ``query``. Counts and tags cover
+    every document type, so hits are restricted to ``doc_type`` with a post
+    filter, which applies after aggregations are computed.
+    """
+    body = dict(query)
+    body['aggregations'] = AGGREGATIONS
+    if doc_type and doc_type != '_all':
+        type_filter = {'terms': {'_type': doc_type.split(',')}}
+        if body.get('post_filter'):
+            type_filter = {'and': [body['post_filter'], type_filter]}
+        body['post_filter'] = type_filter
+    return body
 
 
 @requires_search
@@ -132,45 +139,36 @@ def search(query, index=None, doc_type='_all'):
         typeAliases: the doc_types that exist in the search database
     """
     index = index or INDEX
-    tag_query = copy.deepcopy(query)
-    count_query = copy.deepcopy(query)
-
-    for key in ['from', 'size', 'sort']:
-        try:
-            del tag_query[key]
-            del count_query[key]
-        except KeyError:
-            pass
-
-    tags = get_tags(tag_query, index)
-    counts = get_counts(count_query, index)
 
-    # Run the real query and get the results
-    raw_results = es.search(index=index, doc_type=doc_type, body=query)
+    # Hits, counts and tags in one request
+    raw_results = es.search(index=index, doc_type=None, body=build_search_body(query, doc_type))
 
     results = [hit['_source'] for hit in raw_results['hits']['hits']]
     return_value = {
         'results': format_results(results),
-        'counts': counts,
-        'tags': tags,
+        'counts': get_counts(raw_results['aggregations']),
+        'tags': get_tags(raw_results['aggregations']),
         'typeAliases': ALIASES
     }
     return return_value
 
 
 def format_results(results):
+    parents = load_parents(
+        result['parent_id'] for result in results
+        if result.get('category') in {'project', 'component', 'registration'} and result.get('parent_id')
+    )
     ret = []
     for result in results:
         if result.get('category') == 'user':
             result['url'] = '/profile/' + result['id']
         elif result.get('category') in {'project', 'component', 'registration'}:
-            result = format_result(result, result.get('parent_id'))
+            result = format_result(result, parents.get(result.get('parent_id')))
         ret.append(result)
     return ret
 
 
-def format_result(result, parent_id=None):
-    parent_info = load_parent(parent_id)
+def format_result(result, parent_info=None):
     formatted_result = {
         'contributors': result['contributors'],
         'wiki_link': result['url'] + 'wiki/',
@@ -197,12 +195,9 @@ def format_result(result, parent_id=None):
     return formatted_result
 
 
-def load_parent(parent_id):
-    parent = Node.load(parent_id)
-    if parent is None:
-        return None
+def serialize_parent(parent):
     parent_info = {}
-    if parent is not None and parent.is_public:
+    if parent.is_public:
         parent_info['title'] = parent.title
         parent_info['url'] = parent.url
         parent_info['is_registration'] = parent.is_registration
@@ -215,6 +210,20 @@ def load_parent(parent_id):
     return parent_info
 
 
+def load_parents(parent_ids):
+    """Load the parents of a page of results with one query.
+
+    :return: Dictionary mapping parent ids to parent info
+    """
+    parent_ids = list(set(parent_ids))
+    if not parent_ids:
+        return {}
+    return {
+        parent._id: serialize_parent(parent)
+        for parent in Node.find(Q('_id', 'in', parent_ids))
+    }
+
+
 COMPONENT_CATEGORIES = set([k for k in Node.CATEGORY_MAP.keys() if not k == 'project'])
 
 def get_doctype_from_node(node):
@@ -227,8 +236,10 @@ def get_doctype_from_node(node):
         return node.category
 
 
-@requires_search
-def update_node(node, index=None):
+def get_node_action(node, index=None):
+    """Return the bulk action that brings the search document of ``node`` up
+    to date, or ``None`` if the node should be skipped.
+    """
     index = index or INDEX
     from website.addons.wiki.model import NodeWikiPage
 
@@ -243,53 +254,76 @@ def update_node(node, index=None):
             parent_id = node.parent_id
         except IndexError:
             # Skip orphaned components
-            return
+            return None
     if node.is_deleted or not node.is_public or node.archiving:
-        delete_doc(elastic_document_id, node)
-    else:
-        try:
-            normalized_title = six.u(node.title)
-        except TypeError:
-            normalized_title = node.title
-        normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
-
-        elastic_document = {
-            'id': elastic_document_id,
-            'contributors': [
-                {
-                    'fullname': x.fullname,
-                    'url': x.profile_url if x.is_active else None
-                }
-                for x in node.visible_contributors
-                if x is not None
-            ],
-            'title': node.title,
-            'normalized_title': normalized_title,
-            'category': category,
-            'public': node.is_public,
-            'tags': [tag._id for tag in node.tags if tag],
-            'description': node.description,
-            'url': node.url,
-            'is_registration': node.is_registration,
-            'is_retracted': node.is_retracted,
-            'pending_retraction': node.pending_retraction,
-            'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
-            'pending_embargo': node.pending_embargo,
-            'registered_date': node.registered_date,
-            'wikis': {},
-            'parent_id': parent_id,
-            'date_created': node.date_created,
-            'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
+        return {
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': 'registration' if node.is_registration else node.project_or_component,
+            '_id': elastic_document_id,
         }
 
-        if not node.is_retracted:
-            for wiki in [
-                NodeWikiPage.load(x)
-                for x in node.wiki_pages_current.values()
-            ]:
-                elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
+    try:
+        normalized_title = six.u(node.title)
+    except TypeError:
+        normalized_title = node.title
+    normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
+
+    elastic_document = {
+        'id': elastic_document_id,
+        'contributors': [
+            {
+                'fullname': x.fullname,
+                'url': x.profile_url if x.is_active else None
+            }
+            for x in node.visible_contributors
+            if x is not None
+        ],
+        'title': node.title,
+        'normalized_title': normalized_title,
+        'category': category,
+        'public': node.is_public,
+        'tags': [tag._id for tag in node.tags if tag],
+        'description': node.description,
+        'url': node.url,
+        'is_registration': node.is_registration,
+        'is_retracted': node.is_retracted,
+        'pending_retraction': node.pending_retraction,
+        'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
+        'pending_embargo': node.pending_embargo,
+        'registered_date': node.registered_date,
+        'wikis': {},
+        'parent_id': parent_id,
+        'date_created': node.date_created,
+        'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
+    }
+
+    if not node.is_retracted:
+        for wiki in [
+            NodeWikiPage.load(x)
+            for x in node.wiki_pages_current.values()
+        ]:
+            elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
 
-        es.index(index=index, doc_type=category, id=elastic_document_id, body=elastic_document, refresh=True)
+    return {
+        '_op_type': 'index',
+        '_index': index,
+        '_type': category,
+        '_id': elastic_document_id,
+        '_source': elastic_document,
+    }
+
+
+@requires_search
+def update_node(node, index=None):
+    index = index or INDEX
+    action = get_node_action(node, index=index)
+    if action is None:
+        return
+    if action['_op_type'] == 'delete':
+        delete_doc(action['_id'], node, index=index)
+    else:
+        es.index(index=index, doc_type=action['_type'], id=action['_id'], body=action['_source'], refresh=True)
 
 
 def bulk_update_contributors(nodes, index=INDEX):
@@ -320,15 +354,18 @@ def bulk_update_contributors(nodes, index=INDEX):
     return helpers.bulk(es, actions)
 
 
-@requires_search
-def update_user(user, index=None):
+def get_user_action(user, index=None):
+    """Return the bulk action that brings the search document of ``user`` up
+    to date.
+    """
     index = index or INDEX
     if not user.is_active:
-        try:
-            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
-        except NotFoundError:
-            pass
-        return
+        return {
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': 'user',
+            '_id': user._id,
+        }
 
     names = dict(
         fullname=user.fullname,
@@ -362,9 +399,61 @@ def update_user(user, index=None):
         'degree': user.schools[0]['degree'] if user.schools else '',
         'social': user.social_links,
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
+        # Served to the add-contributor modal without loading the user
+        'gravatar_url': gravatar(
+            user,
+            use_ssl=True,
+            size=settings.GRAVATAR_SIZE_ADD_CONTRIBUTOR,
+        ),
+        'profile_url': user.profile_url,
+        'registered': user.is_registered,
+        'active': user.is_active,
     }
 
-    es.index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
+    return {
+        '_op_type': 'index',
+        '_index': index,
+        '_type': 'user',
+        '_id': user._id,
+        '_source': user_doc,
+    }
+
+
+@requires_search
+def update_user(user, index=None):
+    index = index or INDEX
+    action = get_user_action(user, index=index)
+    if action['_op_type'] == 'delete':
+        try:
+            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+        except NotFoundError:
+            pass
+    else:
+        es.index(index=index, doc_type='user', body=action['_source'], id=user._id, refresh=True)
+
+
+@requires_search
+def bulk_update(nodes=None, users=None, index=None):
+    """Index or delete the documents of ``nodes`` and ``users`` in one bulk
+    request. Unlike `update_node` and `update_user`, the index is not
+    refreshed; documents become searchable at the next scheduled refresh.
+
+    :return: Number of documents updated
+    """
+    index = index or INDEX
+    actions = [get_node_action(node, index=index) for node in nodes or []]
+    actions.extend(get_user_action(user, index=index) for user in users or [])
+    actions = [action for action in actions if action is not None]
+    if not actions:
+        return 0
+    success, errors = helpers.bulk(es, actions, raise_on_error=False)
+    for error in errors:
+        op_type, result = error.items()[0]
+        # Deleting a document that was never indexed is fine
+        if op_type == 'delete' and result.get('status') == 404:
+            continue
+        logger.error('Failed to update search document: {0}'.format(error))
+    return success
 
 
 @requires_search
@@ -461,44 +550,37 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
     pages = math.ceil(results['counts'].get('user', 0) / size)
     validate_page_num(page, pages)
 
-    users = []
-    for doc in docs:
-        # TODO: use utils.serialize_user
-        user = User.load(doc['id'])
-
-        if current_user:
-            n_projects_in_common = current_user.n_projects_in_common(user)
-        else:
-            n_projects_in_common = 0
-
-        if user is None:
-            logger.error('Could not load user {0}'.format(doc['id']))
-            continue
-        if user.is_active:  # exclude merged, unregistered, etc.
-            current_employment = None
-            education = None
-
-            if user.jobs:
-                current_employment = user.jobs[0]['institution']
+    # Documents indexed before the contributor fields were added are
+    # rebuilt from their users
+    stale_ids = [doc['id'] for doc in docs if 'gravatar_url' not in doc]
+    if stale_ids:
+        stale = {
+            user._id: get_user_action(user)
+            for user in User.find(Q('_id', 'in', stale_ids))
+        }
+        docs = [
+            stale[doc['id']].get('_source', {'active': False}) if doc['id'] in stale else doc
+            for doc in docs
+        ]
 
-            if user.schools:
-                education = user.schools[0]['institution']
+    if current_user:
+        n_projects_in_common = current_user.n_projects_in_common_with([doc['id'] for doc in docs])
+    else:
+        n_projects_in_common = {}
 
+    users = []
+    for doc in docs:
+        if doc.get('active'):  # exclude merged, unregistered, etc.
             users.append({
                 'fullname': doc['user'],
                 'id': doc['id'],
-                'employment': current_employment,
-                'education': education,
-                'n_projects_in_common': n_projects_in_common,
-                'gravatar_url': gravatar(
-                    user,
-                    use_ssl=True,
-                    size=settings.GRAVATAR_SIZE_ADD_CONTRIBUTOR,
-                ),
-                'profile_url': user.profile_url,
-                'registered': user.is_registered,
-                'active': user.is_active
-
+                'employment': doc['job'] or None,
+                'education': doc['school'] or None,
+                'n_projects_in_common': n_projects_in_common.get(doc['id'], 0),
+                'gravatar_url': doc['gravatar_url'],
+                'profile_url': doc['profile_url'],
+                'registered': doc['registered'],
+                'active': doc['active'],
             })
 
     return {
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Queue of nodes and users whose search documents are out of date.
+
+Saving a node or user enqueues its id instead of indexing it during the
+request. Ids are collected on ``g`` while the request runs and written to the
+``searchqueue`` collection once it succeeds. Enqueueing an id that is already
+pending only touches its entry, so repeated saves within
+`SEARCH_INDEX_DELAY` seconds are indexed once. `flush_search_queue` then
+indexes pending entries in batches through the bulk API.
+
+Indexing stays synchronous when `SEARCH_INDEX_ASYNC` or `USE_CELERY` is off,
+e.g. in tests.
+"""
+
+import logging
+import datetime
+
+from flask import g
+from modularodm import Q
+
+from framework.mongo import database
+from framework.tasks import app
+
+from website import settings
+
+
+logger = logging.getLogger(__name__)
+
+NODE = 'node'
+USER = 'user'
+
+
+def get_collection():
+    return database['searchqueue']
+
+
+def is_async():
+    return bool(settings.SEARCH_INDEX_ASYNC and settings.USE_CELERY)
+
+
+def enqueue(kind, target_id):
+    """Mark the search document of a node or user as out of date. Within a
+    request, the id is pushed when the request ends; otherwise it is pushed
+    immediately.
+
+    :param str kind: `NODE` or `USER`
+    :param str target_id: Primary key of the node or user
+    """
+    try:
+        g._search_queue.add((kind, target_id))
+    except (AttributeError, RuntimeError):
+        push([(kind, target_id)])
+
+
+def _upsert(kind, target_id, enqueued):
+    """Add an entry unless it is already pending.
+
+    :return: True if the entry was created
+    """
+    result = get_collection().update(
+        {'_id': '{0}:{1}'.format(kind, target_id)},
+        {
+            '$set': {'kind': kind, 'target_id': target_id},
+            '$setOnInsert': {'enqueued': enqueued},
+        },
+        upsert=True,
+        manipulate=False,
+    )
+    return not result.get('updatedExisting')
+
+
+def push(entries):
+    """Write ``entries`` to the queue and schedule a flush if any of them was
+    not already pending.
+
+    :param entries: Iterable of (kind, id) tuples
+    """
+    now = datetime.datetime.utcnow()
+    created = False
+    for kind, target_id in entries:
+        if _upsert(kind, target_id, now):
+            created = True
+    if created:
+        flush_search_queue.apply_async(countdown=settings.SEARCH_INDEX_DELAY)
+
+
+def get_queue_stats():
+    """Return the number of pending entries and the lag, in seconds, of the
+    oldest one.
+    """
+    collection = get_collection()
+    oldest = list(collection.find({}, {'enqueued': 1}).sort('enqueued', 1).limit(1))
+    lag = 0
+    if oldest:
+        lag = (datetime.datetime.utcnow() - oldest[0]['enqueued']).total_seconds()
+    return {
+        'pending': collection.count(),
+        'lag': lag,
+    }
+
+
+def _load(entries):
+    from website import models
+
+    node_ids = [entry['target_id'] for entry in entries if entry['kind'] == NODE]
+    user_ids = [entry['target_id'] for entry in entries if entry['kind'] == USER]
+    nodes = list(models.Node.find(Q('_id', 'in', node_ids))) if node_ids else []
+    users = list(models.User.find(Q('_id', 'in', user_ids))) if user_ids else []
+    return nodes, users
+
+
+def flush(batch_size=None):
+    """Index every pending entry, oldest first, one bulk request per batch.
+    Entries are removed before their objects are loaded, so a save made while
+    a batch is indexed enqueues its object again.
+
+    :return: Number of entries flushed
+    """
+    from website.search import search
+
+    collection = get_collection()
+    batch_size = batch_size or settings.SEARCH_INDEX_BATCH_SIZE
+    count = 0
+    while True:
+        entries = list(collection.find().sort('enqueued', 1).limit(batch_size))
+        if not entries:
+            break
+        collection.remove({'_id': {'$in': [entry['_id'] for entry in entries]}})
+        try:
+            nodes, users = _load(entries)
+            search.bulk_update(nodes=nodes, users=users)
+        except Exception:
+            # Put the batch back so that a retry picks it up
+            for entry in entries:
+                _upsert(entry['kind'], entry['target_id'], entry['enqueued'])
+            raise
+        lag = (datetime.datetime.utcnow() - entries[0]['enqueued']).total_seconds()
+        logger.info('Indexed {0} search documents; lag {1:.1f}s'.format(len(entries), lag))
+        count += len(entries)
+    return count
+
+
+@app.task(bind=True, ignore_result=True, max_retries=5, default_retry_delay=60)
+def flush_search_queue(self):
+    try:
+        flush()
+    except Exception as error:
+        raise self.retry(exc=error)
+
+
+def search_queue_before_request():
+    g._search_queue = set()
+
+
+def search_queue_teardown_request(error=None):
+    # Changes made by a failed request were rolled back
+    if error is not None:
+        return
+    pending = getattr(g, '_search_queue', None)
+    if pending:
+        push(pending)
+        pending.clear()
+
+
+handlers = {
+    'before_request': search_queue_before_request,
+    'teardown_request': search_queue_teardown_request,
+}
@@ -47,6 +47,12 @@ def update_user(user, index=None):
     search_engine.update_user(user, index=index)
 
 
+@requires_search
+def bulk_update(nodes=None, users=None, index=None):
+    index = index or settings.ELASTIC_INDEX
+    return search_engine.bulk_update(nodes=nodes, users=users, index=index)
+
+
 @requires_search
 def delete_all():
     search_engine.delete_all()
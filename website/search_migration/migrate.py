@@ -3,59 +3,196 @@
 '''Migration script for Search-enabled Models.'''
 from __future__ import absolute_import
 
+import time
 import logging
+import datetime
+import itertools
+import multiprocessing
 
-from elasticsearch import helpers
+from elasticsearch import Elasticsearch, helpers
 from modularodm.query.querydialect import DefaultQueryDialect as Q
 
 from website import settings
 from framework.auth import User
+from framework.mongo import database
 from website.models import Node
 from website.app import init_app
 import website.search.search as search
 from scripts import utils as script_utils
-from website.search.elastic_search import es
+from website.search import elastic_search
 
 
 logger = logging.getLogger(__name__)
 
-def migrate_nodes(index):
-    logger.info("Migrating nodes to index: {}".format(index))
-    n_iter = 0
-    nodes = Node.find(Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False))
-    for node in nodes:
-        search.update_node(node, index=index)
-        n_iter += 1
+NODE = 'node'
+USER = 'user'
 
-    logger.info('Nodes migrated: {}'.format(n_iter))
+CHUNK_SIZE = 500
 
+# Only public, undeleted nodes are indexed; inactive users are skipped when
+# their documents are built
+MODELS = (
+    (NODE, Node, {'is_public': True, 'is_deleted': False}),
+    (USER, User, {}),
+)
 
-def migrate_users(index):
-    logger.info("Migrating users to index: {}".format(index))
-    n_migr = 0
-    n_iter = 0
-    for user in User.find():
-        if user.is_active:
-            search.update_user(user, index=index)
-            n_migr += 1
-        n_iter += 1
 
-    logger.info('Users iterated: {0}\nUsers migrated: {1}'.format(n_iter, n_migr))
+def get_checkpoints():
+    return database['searchmigration']
 
 
-def migrate(delete, index=None, app=None):
+def get_checkpoint(index):
+    return get_checkpoints().find_one({'_id': index})
+
+
+def save_checkpoint(index, **kwargs):
+    get_checkpoints().update({'_id': index}, {'$set': kwargs}, upsert=True)
+
+
+def iter_id_chunks(model, query, chunk_size=CHUNK_SIZE, after=None):
+    """Stream primary keys of ``model`` matching the raw ``query`` in
+    ascending order, ``chunk_size`` at a time, starting after ``after``.
+    """
+    collection = model._storage[0].store
+    while True:
+        spec = dict(query)
+        if after is not None:
+            spec['_id'] = {'$gt': after}
+        ids = [
+            each['_id']
+            for each in collection.find(spec, {'_id': True}).sort('_id', 1).limit(chunk_size)
+        ]
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
+
+
+def _init_worker():
+    # Connections to Elasticsearch must not be shared with the parent process
+    elastic_search.es = Elasticsearch(
+        settings.ELASTIC_URI,
+        request_timeout=settings.ELASTIC_TIMEOUT
+    )
+
+
+def index_chunk(args):
+    """Build the documents for one chunk of ids and write them to ``index``.
+
+    :return: Tuple of (last id of the chunk, number of documents written)
+    """
+    kind, ids, index = args
+    if kind == NODE:
+        actions = [
+            elastic_search.get_node_action(node, index=index)
+            for node in Node.find(Q('_id', 'in', ids))
+        ]
+    else:
+        actions = [
+            elastic_search.get_user_action(user, index=index)
+            for user in User.find(Q('_id', 'in', ids))
+            if user.is_active
+        ]
+    # The index is new, so there is nothing to delete
+    actions = [
+        action for action in actions
+        if action is not None and action['_op_type'] == 'index'
+    ]
+    if actions:
+        helpers.bulk(elastic_search.es, actions)
+    # Keep memory flat over millions of documents
+    Node._clear_caches()
+    User._clear_caches()
+    return ids[-1], len(actions)
+
+
+def migrate_model(kind, model, query, index, checkpoint_key, pool=None, chunk_size=CHUNK_SIZE, after=None):
+    """Index every object of ``model`` matching ``query``, one chunk per task,
+    recording the last completed id after each chunk so that an interrupted
+    run can resume.
+
+    :return: Number of documents written
+    """
+    logger.info('Migrating {0}s to index: {1}'.format(kind, index))
+    tasks = (
+        (kind, ids, index)
+        for ids in iter_id_chunks(model, query, chunk_size=chunk_size, after=after)
+    )
+    # `imap` yields in submission order, so every id up to the checkpoint
+    # has been written
+    results = pool.imap(index_chunk, tasks) if pool else itertools.imap(index_chunk, tasks)
+    started = time.time()
+    count = 0
+    for last_id, written in results:
+        count += written
+        save_checkpoint(checkpoint_key, **{kind: last_id})
+        elapsed = time.time() - started
+        logger.info('{0} {1}s indexed ({2:.1f} docs/sec)'.format(
+            count, kind, count / elapsed if elapsed else 0
+        ))
+    logger.info('{0}s migrated: {1}'.format(kind.capitalize(), count))
+    return count
+
+
+def catch_up(index, since):
+    """Reindex nodes modified while the rebuild was running, since saves made
+    during the rebuild went to the old index.
+    """
+    nodes = Node.find(Q('date_modified', 'gte', since))
+    logger.info('Reindexing {0} nodes modified during the migration'.format(nodes.count()))
+    search.bulk_update(nodes=nodes, index=index)
+
+
+def migrate(delete, index=None, app=None, processes=1, chunk_size=CHUNK_SIZE, resume=False):
+    """Build a new version of ``index`` and point the ``index`` alias at it.
+
+    :param bool delete: Delete the previous version afterwards
+    :param int processes: Number of worker processes building and writing
+        documents, or ``None`` for one per CPU. With 1, documents are built in
+        this process.
+    :param bool resume: Continue an interrupted migration from its checkpoint
+    """
     index = index or settings.ELASTIC_INDEX
     app = app or init_app("website.settings", set_backends=True, routes=True)
 
     script_utils.add_file_logger(logger, __file__)
     ctx = app.test_request_context()
     ctx.push()
-    new_index = set_up_index(index)
 
-    migrate_nodes(new_index)
-    migrate_users(new_index)
+    checkpoint = get_checkpoint(index) if resume else None
+    if checkpoint:
+        new_index = checkpoint['index']
+        logger.info('Resuming migration to {0}'.format(new_index))
+    else:
+        started = datetime.datetime.utcnow()
+        new_index = set_up_index(index)
+        get_checkpoints().remove({'_id': index})
+        save_checkpoint(index, index=new_index, started=started)
+        checkpoint = get_checkpoint(index)
+
+    pool = None
+    if processes != 1:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    start_time = time.time()
+    count = 0
+    try:
+        for kind, model, query in MODELS:
+            count += migrate_model(
+                kind, model, query, new_index, index,
+                pool=pool, chunk_size=chunk_size, after=checkpoint.get(kind),
+            )
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    elapsed = time.time() - start_time
+    logger.info('Indexed {0} documents in {1:.0f}s ({2:.1f} docs/sec)'.format(
+        count, elapsed, count / elapsed if elapsed else 0
+    ))
 
+    catch_up(new_index, checkpoint['started'])
     set_up_alias(index, new_index)
+    get_checkpoints().remove({'_id': index})
 
     if delete:
         delete_old(new_index)
@@ -64,6 +201,9 @@ def migrate(delete, index=None, app=None):
 
 
 def set_up_index(idx):
+    es = elastic_search.es
+    if not es.indices.exists(idx):
+        search.create_index(index=idx)
     alias = es.indices.get_aliases(index=idx)
 
     if not alias or not alias.keys() or idx in alias.keys():
@@ -86,12 +226,19 @@ def set_up_index(idx):
 
 
 def set_up_alias(old_index, index):
-    alias = es.indices.get_aliases(index=old_index)
-    if alias:
-        logger.info("Removing old aliases to {}".format(old_index))
-        es.indices.delete_alias(index=old_index, name='_all', ignore=404)
+    """Point the ``old_index`` alias at ``index``, removing it from every
+    other index in the same request so that searches never see a missing
+    alias.
+    """
+    es = elastic_search.es
+    actions = [
+        {'remove': {'index': name, 'alias': old_index}}
+        for name in es.indices.get_aliases(index=old_index)
+        if name != index
+    ]
+    actions.append({'add': {'index': index, 'alias': old_index}})
     logger.info("Creating new alias from {0} to {1}".format(old_index, index))
-    es.indices.put_alias(old_index, index)
+    es.indices.update_aliases(body={'actions': actions})
 
 
 def delete_old(index):
@@ -102,7 +249,7 @@ def delete_old(index):
     else:
         old_index = index.split('_v')[0] + '_v' + str(old_version)
         logger.info("Deleting {}".format(old_index))
-        es.indices.delete(index=old_index, ignore=404)
+        elastic_search.es.indices.delete(index=old_index, ignore=404)
 
 
 if __name__ == '__main__':
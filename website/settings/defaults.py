@@ -65,6 +65,12 @@ SEARCH_ENGINE = 'elastic'  # Can be 'elastic', or None
 ELASTIC_URI = 'localhost:9200'
 ELASTIC_TIMEOUT = 10
 ELASTIC_INDEX = 'website'
+# Index nodes and users from a Celery task instead of during the request.
+# Requires USE_CELERY; indexing is synchronous otherwise
+SEARCH_INDEX_ASYNC = True
+# Seconds to wait before indexing, so that repeated saves are indexed once
+SEARCH_INDEX_DELAY = 5
+SEARCH_INDEX_BATCH_SIZE = 500
 SHARE_ELASTIC_URI = ELASTIC_URI
 SHARE_ELASTIC_INDEX = 'share'
 # For old indices
@@ -126,6 +132,83 @@ DB_NAME = 'osf20130903'
 DB_USER = None
 DB_PASS = None
 
+# Share one MongoClient per worker process instead of connecting per request
+DB_POOL = True
+DB_MAX_POOL_SIZE = 100
+DB_CONNECT_TIMEOUT_MS = 20000
+DB_SOCKET_TIMEOUT_MS = None
+# Seconds between pings of the pooled client
+DB_POOL_HEALTH_CHECK_INTERVAL = 30
+
+# Do not open TokuMX transactions for GET, HEAD and OPTIONS requests unless
+# their view is marked `auto_transaction`
+TRANSACTIONS_SKIP_SAFE_METHODS = True
+# Views and tasks decorated with `retry_on_conflict` retry up to
+# TRANSACTION_RETRY_MAX times when TokuMX does not grant a lock, after a random
+# delay of up to TRANSACTION_RETRY_BASE_DELAY * 2 ** retry seconds, capped at
+# TRANSACTION_RETRY_MAX_DELAY
+TRANSACTION_RETRY_MAX = 3
+TRANSACTION_RETRY_BASE_DELAY = 0.05
+TRANSACTION_RETRY_MAX_DELAY = 1
+
+# Sessions
+# Seconds of inactivity after which MongoDB expires a session (TTL index)
+SESSION_TIMEOUT = 60 * 60 * 24 * 30
+# Unchanged sessions are written at most this often (seconds) to extend
+# their expiry
+SESSION_REFRESH_INTERVAL = 60 * 60
+# Recently used sessions kept in each process. Entries are trusted for
+# SESSION_CACHE_TTL seconds, so a change made by another process may take
+# that long to be seen here
+SESSION_CACHE_SIZE = 1000
+SESSION_CACHE_TTL = 5
+# Database holding sessions; if SESSION_DB_NAME is None, sessions are stored
+# in the main database
+SESSION_DB_HOST = None
+SESSION_DB_PORT = None
+SESSION_DB_NAME = None
+
+# Cache objects of models that set `_cached_across_requests` (users and nodes)
+# across requests; see framework/mongo/cache.py. OBJECT_CACHE_SIZE objects of
+# each model are kept per process, each for at most OBJECT_CACHE_TTL seconds.
+# If None, objects are only cached if OBJECT_CACHE_BACKEND is set
+OBJECT_CACHE_ENABLED = None
+OBJECT_CACHE_SIZE = 5000
+OBJECT_CACHE_TTL = 10
+# Dotted path of a callable returning a client with `get` and `set` methods
+# (e.g. a memcached client) shared by all processes, so that saves invalidate
+# cached objects everywhere immediately. If None, each process only sees its
+# own saves, and the changes of others after OBJECT_CACHE_TTL seconds; only
+# set OBJECT_CACHE_ENABLED without a backend for single-process deployments
+OBJECT_CACHE_BACKEND = None
+
+# GUIDs
+# Each process reserves GUIDs that are neither blacklisted nor taken in blocks
+# of GUID_BLOCK_SIZE, and reserves the next block in the background once
+# fewer than GUID_BLOCK_REFILL_AT are left; see framework/guid/model.py. If
+# GUID_BLOCK_SIZE is 0, GUIDs are reserved as they are needed
+GUID_BLOCK_SIZE = 200
+GUID_BLOCK_REFILL_AT = 50
+# Referents of GUID_CACHE_SIZE recently resolved GUIDs are kept per process,
+# with the redirect targets of nodes and users, so that resolving them needs no
+# query; other referents (e.g. wiki pages, files) are still loaded on every
+# redirect unless the object cache is on. Up to GUID_CACHE_MISS_SIZE GUIDs that
+# do not exist are remembered for GUID_CACHE_MISS_TTL seconds. The
+# GUID_CACHE_WARM_SIZE GUIDs resolved most are loaded before a web worker
+# serves its first request; see framework/guid/cache.py
+GUID_CACHE_SIZE = 10000
+GUID_CACHE_MISS_SIZE = 1000
+GUID_CACHE_MISS_TTL = 30
+GUID_CACHE_WARM_SIZE = 1000
+
+# Analytics
+# Accumulate page counter increments in each process and write them once
+# ANALYTICS_FLUSH_SIZE pages are pending or ANALYTICS_FLUSH_INTERVAL seconds
+# have passed. If False, counters are written on every update
+ANALYTICS_BUFFER_COUNTERS = True
+ANALYTICS_FLUSH_INTERVAL = 10
+ANALYTICS_FLUSH_SIZE = 100
+
 # Cache settings
 SESSION_HISTORY_LENGTH = 5
 SESSION_HISTORY_IGNORE_RULES = [
@@ -188,6 +271,8 @@ CELERY_IMPORTS = (
     'framework.tasks.signals',
     'framework.email.tasks',
     'framework.analytics.tasks',
+    'website.search.indexing',
+    'website.project.forking',
     'website.mailchimp_utils',
     'scripts.send_digest'
 )
@@ -238,6 +323,10 @@ ALL_MY_REGISTRATIONS_NAME = 'All my registrations'
 # and uploads in order to save disk space.
 DISK_SAVING_MODE = False
 
+# Append new log ids to `Node.logs`. Set to False to store logs only by
+# `NodeLog.node_id`, so node documents stop growing with every log
+EMBED_NODE_LOG_IDS = True
+
 # Add Contributors (most in common)
 MAX_MOST_IN_COMMON_LENGTH = 15
 
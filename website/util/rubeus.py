@@ -8,6 +8,7 @@ import hurry.filesize
 from modularodm import Q
 
 from framework.auth.decorators import Auth
+from framework.mongo import prefetch
 
 from website.util import paths
 from website.util import sanitize
@@ -259,7 +260,20 @@ class NodeProjectCollector(object):
     def to_hgrid(self):
         """Return the Rubeus.JS representation of the node's children, not including addons
         """
-        root = self._collect_components(self.node, visited=None)
+        # TODO: Remove circular import
+        from website.project.permissions import PermissionResolver
+        # Children and grandchildren are all permission-checked while
+        # serializing, and the contributors of children are listed
+        prefetch([self.node], 'nodes.node', 'nodes.contributors', 'nodes.nodes.node')
+        children = [child for child in self.node.nodes if child is not None]
+        grandchildren = [
+            grandchild
+            for child in children
+            for grandchild in child.nodes
+            if grandchild is not None
+        ]
+        with PermissionResolver(self.auth, [self.node] + children + grandchildren):
+            root = self._collect_components(self.node, visited=None)
         # This will be important when we mix files and projects together: self._collect_addons(self.node) +
         if self.node.is_dashboard:
             root.insert(0, self.collect_all_projects_smart_folder())
@@ -290,7 +304,7 @@ class NodeProjectCollector(object):
                     'url': contributor.url,
                 })
         try:
-            user = node.logs[-1].user
+            user = node.get_recent_logs(1)[0].user
             modified_by = user.family_name or user.given_name
         except (AttributeError, IndexError):
             modified_by = ''
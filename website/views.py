@@ -16,17 +16,18 @@ from framework.exceptions import HTTPError
 from framework.auth.forms import SignInForm
 from framework.forms import utils as form_utils
 from framework.guid.model import GuidStoredObject
+from framework.guid.cache import guid_cache, load_referent
 from framework.auth.forms import RegistrationForm
 from framework.auth.forms import ResetPasswordForm
 from framework.auth.forms import ForgotPasswordForm
 from framework.auth.decorators import collect_auth
 from framework.auth.decorators import must_be_logged_in
 
-from website.models import Guid
 from website.models import Node
 from website.util import rubeus
 from website.util import sanitize
 from website.project import model
+from website.project.permissions import PermissionResolver
 from website.util import web_url_for
 from website.util import permissions
 from website.project import new_dashboard
@@ -45,10 +46,11 @@ def _rescale_ratio(auth, nodes):
     """
     if not nodes:
         return 0
+    resolver = PermissionResolver(auth, nodes)
     counts = [
-        len(node.logs)
+        node.log_count
         for node in nodes
-        if node.can_view(auth)
+        if resolver.can_view(node)
     ]
     if counts:
         return float(max(counts))
@@ -269,6 +271,23 @@ def watched_logs_get(**kwargs):
             message_long='Invalid value for "size".'
         ))
 
+    # Clients passing `cursor` (empty for the first page) get keyset
+    # pagination, which skips counting the logs
+    if 'cursor' in request.args:
+        query = user.get_recent_logs_query()
+        if query is None:
+            return {'logs': [], 'next_cursor': None}
+        try:
+            logs, next_cursor = model.get_logs_page(query, cursor=request.args['cursor'], size=size)
+        except ValueError:
+            raise HTTPError(http.BAD_REQUEST, data=dict(
+                message_long='Invalid value for "cursor".'
+            ))
+        return {
+            'logs': [serialize_log(log) for log in logs],
+            'next_cursor': next_cursor,
+        }
+
     total = sum(1 for x in user.get_recent_log_ids())
     paginated_logs, pages = paginate(user.get_recent_log_ids(), total, page, size)
     logs = (model.NodeLog.load(id) for id in paginated_logs)
@@ -336,32 +355,37 @@ def resolve_guid(guid, suffix=None):
     :param str suffix: Remainder of URL after the GUID
     :return: Return value of proxied view function
     """
-    # Look up GUID
-    guid_object = Guid.load(guid)
-    if guid_object:
+    # Look up GUID; see `framework.guid.cache`
+    referent_key = guid_cache.get_referent_key(guid)
+    if referent_key is not None:
+        deep_url = guid_cache.get_deep_url(guid)
+        if deep_url:
+            return proxy_url(_build_guid_url(deep_url, suffix))
+
+        referent = load_referent(referent_key)
 
         # verify that the object is a GuidStoredObject descendant. If a model
         #   was once a descendant but that relationship has changed, it's
         #   possible to have referents that are instances of classes that don't
         #   have a redirect_mode attribute or otherwise don't behave as
         #   expected.
-        if not isinstance(guid_object.referent, GuidStoredObject):
+        if not isinstance(referent, GuidStoredObject):
             sentry.log_message(
                 'Guid `{}` resolved to non-guid object'.format(guid)
             )
             raise HTTPError(http.NOT_FOUND)
-        referent = guid_object.referent
         if referent is None:
             logger.error('Referent of GUID {0} not found'.format(guid))
             raise HTTPError(http.NOT_FOUND)
         if not referent.deep_url:
             raise HTTPError(http.NOT_FOUND)
+        if getattr(referent, '_stable_deep_url', False):
+            guid_cache.set_deep_url(guid, referent.deep_url)
         url = _build_guid_url(referent.deep_url, suffix)
         return proxy_url(url)
 
     # GUID not found; try lower-cased and redirect if exists
-    guid_object_lower = Guid.load(guid.lower())
-    if guid_object_lower:
+    if guid.lower() != guid and guid_cache.get_referent_key(guid.lower()) is not None:
         return redirect(
             _build_guid_url(guid.lower(), suffix)
         )